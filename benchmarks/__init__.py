@@ -0,0 +1,4 @@
+"""Benchmarks de desempenho de cada etapa da análise, com dados sintéticos.
+
+Execução: ``python -m benchmarks`` (veja ``python -m benchmarks --help``).
+"""
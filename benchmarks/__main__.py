@@ -0,0 +1,119 @@
+"""Executa os benchmarks, grava os resultados e compara com execuções anteriores.
+
+Exemplos::
+
+    python -m benchmarks                          # todos os benchmarks
+    python -m benchmarks -f Drawdown -a 10 2000   # só Drawdown, com 10 e 2000 ativos
+    python -m benchmarks --comparar a1b2c3d       # compara com o resultado do commit a1b2c3d
+
+Os resultados ficam em ``.benchmarks/<commit>.json``.
+"""
+
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from . import etapas
+from .comum import medir
+
+DIRETORIO = '.benchmarks'
+
+
+def _commit():
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                               text=True, check=True)
+        return saida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sem-git'
+
+
+def _classes(filtro):
+    for nome, classe in inspect.getmembers(etapas, inspect.isclass):
+        if classe.__module__ == etapas.__name__ and (not filtro or filtro in nome):
+            yield nome, classe
+
+
+def executar(filtro=None, ativos=None, repeticoes=5):
+    """Roda os benchmarks e devolve ``{nome: {'mediana': s, 'minimo': s}}``."""
+    resultados = {}
+    for nome, classe in _classes(filtro):
+        params = getattr(classe, 'params', [[None]])
+        nomes_params = getattr(classe, 'param_names', [])
+        if ativos and 'ativos' in nomes_params:
+            i = nomes_params.index('ativos')
+            params = list(params)
+            params[i] = [n for n in params[i] if n in ativos]
+        metodos = [m for m in dir(classe) if m.startswith('time_')]
+        for combinacao in itertools.product(*params):
+            instancia = classe()
+            try:
+                if hasattr(instancia, 'setup'):
+                    instancia.setup(*combinacao)
+            except NotImplementedError:
+                continue
+            for metodo in metodos:
+                chave = f"{nome}.{metodo}({', '.join(map(str, combinacao))})"
+                tempos = medir(lambda: getattr(instancia, metodo)(*combinacao), repeticoes)
+                resultados[chave] = {'mediana': float(np.median(tempos)), 'minimo': float(min(tempos))}
+                print(f'{chave:<70} {resultados[chave]["mediana"] * 1e3:12.3f} ms', flush=True)
+    return resultados
+
+
+def gravar(resultados, commit):
+    os.makedirs(DIRETORIO, exist_ok=True)
+    caminho = os.path.join(DIRETORIO, f'{commit}.json')
+    with open(caminho, 'w') as f:
+        json.dump({'commit': commit, 'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'maquina': platform.node(), 'python': platform.python_version(),
+                   'resultados': resultados}, f, indent=1)
+    return caminho
+
+
+def comparar(atual, referencia, limite=1.10):
+    """Imprime a razão atual/referência e devolve as chaves que pioraram mais que ``limite``."""
+    caminho = referencia if os.path.exists(referencia) else os.path.join(DIRETORIO, f'{referencia}.json')
+    with open(caminho) as f:
+        anteriores = json.load(f)['resultados']
+    regressoes = []
+    for chave, valor in atual.items():
+        if chave not in anteriores:
+            continue
+        razao = valor['mediana'] / anteriores[chave]['mediana']
+        marca = '  <-- regressão' if razao > limite else ''
+        print(f'{chave:<70} {razao:8.2f}x{marca}')
+        if razao > limite:
+            regressoes.append(chave)
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    parser.add_argument('-f', '--filtro', help='roda só as classes cujo nome contém o texto')
+    parser.add_argument('-a', '--ativos', type=int, nargs='+', help='tamanhos de universo a rodar')
+    parser.add_argument('-r', '--repeticoes', type=int, default=5)
+    parser.add_argument('--comparar', help='commit (ou arquivo .json) de referência')
+    parser.add_argument('--limite', type=float, default=1.10,
+                        help='razão de tempo a partir da qual há regressão (padrão 1.10)')
+    parser.add_argument('--nao-gravar', action='store_true', help='não grava os resultados')
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.filtro, args.ativos, args.repeticoes)
+    if not args.nao_gravar:
+        print('resultados gravados em', gravar(resultados, _commit()))
+    if args.comparar:
+        regressoes = comparar(resultados, args.comparar, args.limite)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Dados sintéticos e medição de tempo compartilhados pelos benchmarks."""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# Tamanhos do universo de ativos e número de pregões usados por padrão
+ATIVOS = (10, 100, 500, 2000)
+PREGOES = 1500
+
+
+def precos_sinteticos(n_datas=PREGOES, n_ativos=10, seed=0):
+    """Preços (datas x ativos) de um modelo de um fator, sem acesso à rede.
+
+    Devolve também a série de preços do "mercado" (o fator), no papel do Ibovespa.
+    """
+    rng = np.random.default_rng(seed)
+    fator = rng.normal(0.0003, 0.012, n_datas)
+    betas = rng.uniform(0.5, 1.5, n_ativos)
+    retornos = fator[:, None] * betas + rng.normal(0.0002, 0.015, (n_datas, n_ativos))
+    datas = pd.bdate_range('2010-01-01', periods=n_datas, name='Date')
+    tickers = [f'ATV{i:04d}.SA' for i in range(n_ativos)]
+    precos = pd.DataFrame(100 * np.exp(np.cumsum(retornos, axis=0)), index=datas, columns=tickers)
+    mercado = pd.Series(1000 * np.exp(np.cumsum(fator)), index=datas, name='IBOV')
+    return precos, mercado
+
+
+def setores_sinteticos(tickers, n_setores=5):
+    """``sector_mapper`` com os tickers distribuídos em ``n_setores`` setores."""
+    return {t: f'SETOR{i % n_setores}' for i, t in enumerate(tickers)}
+
+
+def medir(funcao, repeticoes=5, minimo=0.2):
+    """Tempos (s) de ``repeticoes`` rodadas; cada rodada repete ``funcao`` até ``minimo`` segundos."""
+    inicio = time.perf_counter()
+    funcao()
+    uma = max(time.perf_counter() - inicio, 1e-9)
+    numero = max(1, int(minimo / uma))
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / numero)
+    return tempos
@@ -0,0 +1,303 @@
+"""Benchmarks de cada etapa do notebook, no formato do asv.
+
+Cada classe tem ``params``/``param_names``, um ``setup`` que monta os dados
+sintéticos e métodos ``time_*`` que medem uma etapa. Um ``setup`` que levanta
+``NotImplementedError`` pula aquela combinação de parâmetros, como no asv.
+"""
+
+import copy
+
+import numpy as np
+from scipy.stats import norm
+
+from portfolio_risk import (CovarianciaIncremental, RestricoesGrupos, decimar, estatisticas_drawdown,
+                            limites_ativos, momentos, regressao_capm, var_es, var_es_matriz,
+                            var_es_parametrico, var_monte_carlo)
+
+from .comum import ATIVOS, PREGOES, precos_sinteticos, setores_sinteticos
+
+NIVEIS = np.array([0.90, 0.95, 0.99])
+
+
+class Retornos:
+    """Retornos diários e logarítmicos (In[17] e In[19])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        self.precos, _ = precos_sinteticos(PREGOES, n)
+
+    def time_pct_change(self, n):
+        self.precos.pct_change()
+
+    def time_log_retornos(self, n):
+        np.log(self.precos / self.precos.shift(1))
+
+
+class VaRHistorico:
+    """VaR por simulação histórica (In[60]) para todos os ativos."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        precos, _ = precos_sinteticos(PREGOES, n)
+        self.retornos = precos.pct_change().iloc[1:].to_numpy()
+
+    def time_percentil_por_nivel(self, n):
+        for nivel in NIVEIS:
+            np.percentile(self.retornos, (1 - nivel) * 100, axis=0)
+
+    def time_var_es_por_ativo(self, n):
+        for j in range(self.retornos.shape[1]):
+            var_es(self.retornos[:, j], NIVEIS)
+
+    def time_var_es_matriz(self, n):
+        var_es_matriz(self.retornos, NIVEIS)
+
+
+class VaRParametrico:
+    """VaR paramétrico (In[62]–In[63]): normal, Cornish-Fisher e t de Student."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        precos, _ = precos_sinteticos(PREGOES, n)
+        retornos = precos.pct_change().iloc[1:]
+        self.retornos = retornos.to_numpy()
+        self.media = retornos.mean().to_numpy()
+        self.volatilidade = retornos.std(ddof=0).to_numpy()
+        self.momentos = momentos(self.retornos)
+
+    def time_norm_ppf_por_ativo_e_nivel(self, n):
+        for m, v in zip(self.media, self.volatilidade):
+            for nivel in NIVEIS:
+                norm.ppf(1 - nivel, m, v)
+
+    def time_norm_ppf_vetorizado(self, n):
+        norm.ppf(1 - NIVEIS[:, None], self.media, self.volatilidade)
+
+    def time_momentos(self, n):
+        momentos(self.retornos)
+
+    def time_normal(self, n):
+        var_es_parametrico(niveis=NIVEIS, estatisticas=self.momentos)
+
+    def time_cornish_fisher(self, n):
+        var_es_parametrico(niveis=NIVEIS, distribuicao='cornish_fisher', estatisticas=self.momentos)
+
+    def time_t(self, n):
+        var_es_parametrico(niveis=NIVEIS, distribuicao='t', estatisticas=self.momentos)
+
+
+class MonteCarlo:
+    """VaR e ES por simulação de Monte Carlo (In[65]–In[69])."""
+
+    params = [[100_000, 1_000_000], [1, 21]]
+    param_names = ['caminhos', 'horizonte']
+
+    def time_var_monte_carlo(self, caminhos, horizonte):
+        var_monte_carlo(0.0005, 0.02, horizonte, caminhos, seed=0)
+
+    def time_var_monte_carlo_fluxo(self, caminhos, horizonte):
+        var_monte_carlo(0.0005, 0.02, horizonte, caminhos, seed=0, exato=False)
+
+
+class Drawdown:
+    """Drawdown, pico, vale e recuperação (In[31]–In[34])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        self.precos, _ = precos_sinteticos(PREGOES, n)
+
+    def time_estatisticas_drawdown(self, n):
+        estatisticas_drawdown(self.precos)
+
+
+class Decimacao:
+    """Redução das séries dos gráficos de retornos e drawdown (In[21] e In[38])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        precos, _ = precos_sinteticos(PREGOES, n)
+        self.retornos = precos.pct_change().iloc[1:]
+
+    def time_lttb(self, n):
+        decimar(self.retornos, 1200, 'lttb')
+
+    def time_minmax(self, n):
+        decimar(self.retornos, 1200, 'minmax')
+
+
+class Beta:
+    """Beta por regressão contra o mercado (In[49]–In[58])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        precos, mercado = precos_sinteticos(PREGOES, n)
+        self.retornos = precos.pct_change().iloc[1:]
+        self.mercado = mercado.pct_change().iloc[1:]
+
+    def time_regressao_capm(self, n):
+        regressao_capm(self.retornos, self.mercado)
+
+    def time_regressao_capm_movel(self, n):
+        regressao_capm(self.retornos, self.mercado, janela=252)
+
+
+class BetaStatsmodels:
+    """Referência: um ``sm.OLS`` por ativo, como no notebook."""
+
+    params = [[10, 100]]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        try:
+            import statsmodels.api as sm
+        except ImportError:
+            raise NotImplementedError('statsmodels não instalado')
+        self.sm = sm
+        precos, mercado = precos_sinteticos(PREGOES, n)
+        self.retornos = precos.pct_change().iloc[1:]
+        self.mercado = mercado.pct_change().iloc[1:]
+
+    def time_ols_por_ativo(self, n):
+        exog = self.sm.add_constant(self.mercado)
+        for coluna in self.retornos:
+            self.sm.OLS(self.retornos[coluna], exog).fit()
+
+
+class LedoitWolf:
+    """Covariância encolhida de Ledoit-Wolf (In[94])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        from pypfopt import risk_models
+
+        self.risk_models = risk_models
+        self.precos, _ = precos_sinteticos(PREGOES, n)
+        self.incremental = CovarianciaIncremental.de_precos(self.precos.iloc[:-1])
+        self.novo_dia = self.precos.iloc[-1]
+
+    def time_ledoit_wolf(self, n):
+        self.risk_models.CovarianceShrinkage(self.precos).ledoit_wolf()
+
+    def time_incremental_novo_dia(self, n):
+        # A cópia (O(N²), como a atualização) mantém o estado do setup intacto
+        copy.deepcopy(self.incremental).atualizar_precos(self.novo_dia).ledoit_wolf()
+
+
+class Otimizacao:
+    """Objetivos do ``EfficientFrontier`` (In[96]–In[134])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+    timeout = 600
+
+    def setup(self, n):
+        from pypfopt import EfficientFrontier, expected_returns, risk_models
+
+        self.EfficientFrontier = EfficientFrontier
+        precos, mercado = precos_sinteticos(PREGOES, n)
+        self.mu = expected_returns.capm_return(precos, market_prices=mercado.to_frame())
+        self.cov = risk_models.CovarianceShrinkage(precos).ledoit_wolf()
+        self.setores = setores_sinteticos(precos.columns)
+
+        mv = EfficientFrontier(self.mu, self.cov)
+        mv.min_volatility()
+        retorno_min, vol_min, _ = mv.portfolio_performance()
+        # Alvos sempre viáveis: acima da mínima volatilidade e abaixo do maior retorno
+        self.vol_alvo = 1.5 * vol_min
+        self.retorno_alvo = (retorno_min + self.mu.max()) / 2
+
+    def time_min_volatility(self, n):
+        self.EfficientFrontier(self.mu, self.cov).min_volatility()
+
+    def time_max_sharpe(self, n):
+        self.EfficientFrontier(self.mu, self.cov).max_sharpe(risk_free_rate=0.0)
+
+    def time_efficient_risk(self, n):
+        self.EfficientFrontier(self.mu, self.cov).efficient_risk(self.vol_alvo)
+
+    def time_efficient_return(self, n):
+        self.EfficientFrontier(self.mu, self.cov).efficient_return(self.retorno_alvo)
+
+    def time_restricao_setorial(self, n):
+        ef = self.EfficientFrontier(self.mu, self.cov)
+        ef.add_sector_constraints(self.setores, {'SETOR0': 0.05}, {'SETOR1': 0.10})
+        ef.max_sharpe(risk_free_rate=0.0)
+
+    def time_restricao_grupos(self, n):
+        ef = self.EfficientFrontier(self.mu, self.cov)
+        RestricoesGrupos({'setor': self.setores}, ef.tickers,
+                         {'setor': {'SETOR0': 0.05}}, {'setor': {'SETOR1': 0.10}}).aplicar(ef)
+        ef.max_sharpe(risk_free_rate=0.0)
+
+
+class LimitesAtivos:
+    """Teto de peso para metade dos ativos (In[134]): uma closure por ativo ou vetores."""
+
+    params = [[10, 100, 500]]
+    param_names = ['ativos']
+    timeout = 600
+
+    def setup(self, n):
+        from pypfopt import EfficientFrontier, expected_returns, risk_models
+
+        self.EfficientFrontier = EfficientFrontier
+        precos, mercado = precos_sinteticos(PREGOES, n)
+        self.mu = expected_returns.capm_return(precos, market_prices=mercado.to_frame())
+        self.cov = risk_models.CovarianceShrinkage(precos).ledoit_wolf()
+        self.tetos = {t: 2 / n for t in precos.columns[: n // 2]}
+
+    def time_lambda_por_ativo(self, n):
+        ef = self.EfficientFrontier(self.mu, self.cov)
+        for ticker, teto in self.tetos.items():
+            i = ef.tickers.index(ticker)
+            ef.add_constraint(lambda w, i=i, teto=teto: w[i] <= teto)
+        ef.min_volatility()
+
+    def time_limites_vetoriais(self, n):
+        limites = np.column_stack(limites_ativos(self.cov.columns, superior=self.tetos))
+        self.EfficientFrontier(self.mu, self.cov, weight_bounds=limites).min_volatility()
+
+
+class RestricoesSetoriais:
+    """Montagem das restrições por grupo com três níveis de classificação (In[132])."""
+
+    params = [ATIVOS]
+    param_names = ['ativos']
+
+    def setup(self, n):
+        import cvxpy as cp
+
+        precos, _ = precos_sinteticos(PREGOES, n)
+        self.tickers = list(precos.columns)
+        setor = setores_sinteticos(self.tickers)
+        self.niveis = {
+            'setor': setor,
+            'subsetor': {t: f'{s}.{i % 5}' for i, (t, s) in enumerate(setor.items())},
+            'emissor': {t: f'EMISSOR{i // 3}' for i, t in enumerate(self.tickers)},
+        }
+        self.superior = {nivel: {g: 0.3 for g in set(mapa.values())} for nivel, mapa in self.niveis.items()}
+        self.w = cp.Variable(n)
+
+    def time_restricao_por_grupo(self, n):
+        # Como o add_sector_constraints: duas restrições por grupo, montadas em Python
+        for nivel, mapa in self.niveis.items():
+            for grupo, limite in self.superior[nivel].items():
+                selecao = [mapa[t] == grupo for t in self.tickers]
+                self.w[selecao].sum() <= limite
+
+    def time_restricoes_grupos(self, n):
+        RestricoesGrupos(self.niveis, self.tickers, superior=self.superior).restricao(self.w)
@@ -0,0 +1,62 @@
+"""Análise de risco e otimização de portfólio com Python.
+
+Funções reaproveitáveis extraídas do notebook do projeto. Os módulos só são
+importados no primeiro acesso a um de seus nomes, e as dependências pesadas
+(cvxpy, scipy, PyPortfolioOpt, yfinance, plotly) só dentro das funções que as
+usam: ``import portfolio_risk`` não carrega nenhuma delas.
+"""
+
+import importlib
+
+# Nome público -> módulo onde ele está definido
+_NOMES = {
+    'CachePrecos': 'cache', 'baixar_yahoo': 'cache',
+    'FonteArquivos': 'dados', 'FonteCache': 'dados', 'FonteYahoo': 'dados',
+    'alinhar': 'dados', 'calcular_retornos': 'dados', 'carregar_precos': 'dados',
+    'ErroTransitorio': 'busca', 'FonteConcorrente': 'busca', 'LimiteTaxa': 'busca',
+    'ProvedorArquivos': 'busca', 'ProvedorSincrono': 'busca', 'baixar_historico': 'busca',
+    'fator_covariancia': 'montecarlo', 'gerar_blocos': 'montecarlo',
+    'simular_retornos': 'montecarlo', 'simular_retornos_carteira': 'montecarlo',
+    'var_monte_carlo': 'montecarlo', 'var_monte_carlo_carteira': 'montecarlo',
+    'HistogramaFluxo': 'quantis', 'TDigest': 'quantis', 'var_es_fluxo': 'quantis',
+    'DISTRIBUICOES': 'parametrico', 'momentos': 'parametrico',
+    'var_es_parametrico': 'parametrico', 'var_es_parametrico_carteira': 'parametrico',
+    'NIVEIS': 'var', 'retornos_carteiras': 'var', 'var_es': 'var', 'var_es_matriz': 'var',
+    'metricas_moveis': 'janelas',
+    'estatisticas_drawdown': 'drawdown', 'riqueza': 'drawdown', 'serie_drawdown': 'drawdown',
+    'regressao_capm': 'capm',
+    'varrer_fronteira': 'fronteira',
+    'CacheEstimativas': 'memo', 'hash_dados': 'memo',
+    'CovarianciaIncremental': 'covariancia',
+    'RetornosCompactos': 'compacto',
+    'RestricoesGrupos': 'restricoes', 'aplicar_limites': 'restricoes', 'limites_ativos': 'restricoes',
+    'matriz_grupos': 'restricoes', 'vetor_limites': 'restricoes',
+    'gerar_divisoes': 'backtest', 'resumo_erros': 'backtest', 'walk_forward': 'backtest',
+    'otimizar': 'relatorio', 'otimizar_estimativas': 'relatorio', 'relatorio_ativos': 'relatorio',
+    'gravar_relatorios': 'lote', 'ler_configuracao': 'lote', 'relatorios_lote': 'lote',
+    'decimar': 'graficos', 'grafico_distribuicao': 'graficos', 'grafico_drawdown': 'graficos',
+    'grafico_histograma': 'graficos', 'grafico_retornos': 'graficos', 'grafico_series': 'graficos',
+    'lttb': 'graficos', 'minmax': 'graficos',
+    'CacheTTL': 'servico', 'ServicoRisco': 'servico', 'servir': 'servico',
+}
+
+_MODULOS = {'backtest', 'busca', 'cache', 'capm', 'cli', 'compacto', 'covariancia', 'dados',
+            'drawdown', 'fronteira', 'graficos', 'instrumentacao', 'janelas', 'lote', 'memo',
+            'montecarlo', 'parametrico', 'quantis', 'relatorio', 'restricoes', 'servico', 'var'}
+
+__all__ = sorted(_NOMES)
+
+
+def __getattr__(nome):
+    if nome in _NOMES:
+        valor = getattr(importlib.import_module('.' + _NOMES[nome], __name__), nome)
+    elif nome in _MODULOS:
+        valor = importlib.import_module('.' + nome, __name__)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_NOMES) | _MODULOS)
@@ -0,0 +1,142 @@
+"""Backtest walk-forward dos estimadores de retorno esperado.
+
+O notebook compara ``mean_historical_return``, ``ema_historical_return`` e
+``capm_return`` em uma única divisão treino/teste (In[77]–In[83]). Aqui cada
+estimador é avaliado em muitas divisões móveis ou expansivas. A matriz de
+retornos é calculada uma vez e compartilhada, somente leitura, com os
+processos do pool por memória compartilhada; o resultado é um painel de erros
+por divisão, estimador e ativo.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .dados import calcular_retornos
+from .instrumentacao import medido
+
+ESTIMADORES = ('mean_historical_return', 'ema_historical_return', 'capm_return')
+
+# Estado de cada processo do pool, preenchido por _iniciar_processo
+_RETORNOS = None
+_ESTIMADORES = None
+_SHM = None
+
+
+def gerar_divisoes(n_datas, treino=500, teste=250, passo=21, expansivo=False):
+    """Lista de divisões ``(inicio_treino, fim_treino, fim_teste)`` em posições de linha.
+
+    Com ``expansivo=True`` o treino sempre começa na primeira data; caso
+    contrário é uma janela móvel de ``treino`` pregões. O teste são os
+    ``teste`` pregões seguintes ao treino.
+    """
+    divisoes = []
+    for fim_treino in range(treino, n_datas - teste + 1, passo):
+        inicio = 0 if expansivo else fim_treino - treino
+        divisoes.append((inicio, fim_treino, fim_treino + teste))
+    return divisoes
+
+
+def _funcoes(estimadores):
+    from pypfopt import expected_returns
+
+    funcoes = {}
+    for estimador in estimadores:
+        if callable(estimador):
+            funcoes[estimador.__name__] = estimador
+        else:
+            funcoes[estimador] = partial(getattr(expected_returns, estimador), returns_data=True)
+    return funcoes
+
+
+def _iniciar_processo(nome, forma, indice, colunas, estimadores):
+    global _RETORNOS, _ESTIMADORES, _SHM
+    _SHM = shared_memory.SharedMemory(name=nome)
+    matriz = np.ndarray(forma, dtype='float64', buffer=_SHM.buf)
+    matriz.flags.writeable = False
+    _RETORNOS = pd.DataFrame(matriz, index=indice, columns=colunas, copy=False)
+    _ESTIMADORES = _funcoes(estimadores)
+
+
+def _avaliar_divisao(numero, inicio, fim_treino, fim_teste):
+    from pypfopt import expected_returns
+
+    treino = _RETORNOS.iloc[inicio:fim_treino]
+    teste = _RETORNOS.iloc[fim_treino:fim_teste]
+    # Alvo: retorno anualizado efetivamente realizado no período de teste
+    realizado = expected_returns.mean_historical_return(teste, returns_data=True)
+    partes = []
+    for nome, funcao in _ESTIMADORES.items():
+        previsto = funcao(treino).reindex(realizado.index)
+        partes.append(pd.DataFrame({
+            'divisao': numero,
+            'inicio_treino': treino.index[0],
+            'fim_treino': treino.index[-1],
+            'fim_teste': teste.index[-1],
+            'estimador': nome,
+            'ativo': realizado.index,
+            'previsto': previsto.to_numpy(),
+            'realizado': realizado.to_numpy(),
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def _avaliar_local(retornos, estimadores, argumentos):
+    global _RETORNOS, _ESTIMADORES
+    anteriores = _RETORNOS, _ESTIMADORES
+    _RETORNOS, _ESTIMADORES = retornos, _funcoes(estimadores)
+    try:
+        return list(map(_avaliar_divisao, *argumentos))
+    finally:
+        _RETORNOS, _ESTIMADORES = anteriores
+
+
+def _avaliar_pool(retornos, estimadores, argumentos, n_processos):
+    # Os retornos vão uma única vez para a memória compartilhada; cada processo
+    # só mapeia o bloco, sem cópia nem serialização por tarefa
+    matriz = np.ascontiguousarray(retornos.to_numpy(dtype='float64'))
+    shm = shared_memory.SharedMemory(create=True, size=max(matriz.nbytes, 1))
+    try:
+        np.ndarray(matriz.shape, dtype='float64', buffer=shm.buf)[:] = matriz
+        iniciar = (shm.name, matriz.shape, retornos.index, retornos.columns, tuple(estimadores))
+        with ProcessPoolExecutor(max_workers=n_processos, initializer=_iniciar_processo,
+                                 initargs=iniciar) as pool:
+            return list(pool.map(_avaliar_divisao, *argumentos, chunksize=4))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@medido('backtest.walk_forward')
+def walk_forward(precos, estimadores=ESTIMADORES, treino=500, teste=250, passo=21,
+                 expansivo=False, n_processos=None):
+    """Painel de erros de previsão de cada estimador em cada divisão walk-forward.
+
+    ``estimadores`` são nomes de funções de ``pypfopt.expected_returns`` ou
+    funções ``f(retornos) -> Series`` definidas no nível de módulo (para poderem
+    ir aos processos). O resultado tem uma linha por (divisão, estimador,
+    ativo) com o retorno previsto no treino, o realizado no teste e o
+    ``erro_abs``; ``resumo_erros`` agrega o MAE.
+    """
+    retornos = calcular_retornos(precos)
+    divisoes = gerar_divisoes(len(retornos), treino, teste, passo, expansivo)
+    if not divisoes:
+        raise ValueError('histórico curto demais para uma divisão treino/teste')
+
+    argumentos = list(zip(*[(i,) + d for i, d in enumerate(divisoes)]))
+    if n_processos == 1:
+        paineis = _avaliar_local(retornos, estimadores, argumentos)
+    else:
+        paineis = _avaliar_pool(retornos, estimadores, argumentos, n_processos)
+
+    painel = pd.concat(paineis, ignore_index=True)
+    painel['erro_abs'] = (painel['previsto'] - painel['realizado']).abs()
+    return painel
+
+
+def resumo_erros(painel):
+    """MAE de cada estimador por divisão (linhas) e estimador (colunas)."""
+    return painel.pivot_table(index='divisao', columns='estimador', values='erro_abs', aggfunc='mean')
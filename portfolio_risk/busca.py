@@ -0,0 +1,234 @@
+"""Download concorrente de preços, com limite de requisições e novas tentativas.
+
+No notebook cada ``yf.download`` (In[14], In[44], In[74], In[91]) espera o
+anterior terminar, e a primeira falha de rede interrompe a célula. Aqui os
+tickers são buscados ao mesmo tempo em asyncio, com:
+
+- no máximo ``concorrencia`` downloads em andamento (semáforo);
+- no máximo ``taxa`` requisições por segundo, com rajadas de até
+  ``capacidade`` (balde de fichas, ``LimiteTaxa``);
+- novas tentativas com espera exponencial e variação aleatória.
+
+Os downloads vêm de um provedor: qualquer objeto com o método assíncrono
+``baixar(ticker, inicio, fim)`` que devolva um DataFrame indexado por data com
+uma coluna por campo, como ``baixar_historico``. ``ProvedorSincrono``
+adapta uma função comum (rodando-a em uma thread) e ``ProvedorArquivos`` lê
+arquivos locais, com latência e falhas simuladas, para testes sem rede.
+
+``FonteConcorrente`` tem o método ``series`` das fontes de ``dados``::
+
+    fonte = FonteConcorrente(ProvedorSincrono(), concorrencia=16, taxa=5)
+    precos = carregar_precos(tickers, '2017-01-01', '2024-01-01', fonte=fonte)
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import pandas as pd
+
+from .dados import FonteArquivos
+from .instrumentacao import medido
+
+
+class ErroTransitorio(Exception):
+    """Falha que pode não se repetir (rede, limite do servidor); vale tentar de novo."""
+
+
+def baixar_historico(ticker, inicio, fim):
+    """Como ``cache.baixar_yahoo``, mas por ``yf.Ticker(...).history``.
+
+    ``yf.download`` usa estado global do yfinance e não pode rodar em várias
+    threads ao mesmo tempo (``baixar_yahoo`` o serializa); ``Ticker.history``
+    não compartilha estado entre tickers e aceita downloads simultâneos.
+    """
+    import yfinance as yf
+
+    dados = yf.Ticker(ticker).history(start=inicio, end=fim, auto_adjust=False, actions=False)
+    if getattr(dados.index, 'tz', None) is not None:
+        # O histórico vem no fuso da bolsa; as demais fontes usam datas sem fuso
+        dados.index = dados.index.tz_localize(None).normalize()
+    dados.index.name = 'Date'
+    return dados
+
+
+class LimiteTaxa:
+    """Balde de fichas: ``taxa`` fichas por segundo, acumulando no máximo ``capacidade``.
+
+    Pode ser compartilhado por vários laços de eventos (cada ``series`` síncrono
+    roda o seu): o saldo é protegido por uma trava de thread.
+    """
+
+    def __init__(self, taxa, capacidade=None):
+        if taxa <= 0:
+            raise ValueError('taxa deve ser positiva')
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade if capacidade is not None else max(taxa, 1))
+        self._fichas = self.capacidade
+        self._instante = time.monotonic()
+        self._trava = threading.Lock()
+
+    def _reservar(self):
+        # Consome a ficha já, mesmo a descoberto, e devolve quanto esperar por ela:
+        # quem chega depois fica atrás na fila, na ordem de chegada
+        with self._trava:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade,
+                               self._fichas + (agora - self._instante) * self.taxa) - 1
+            self._instante = agora
+            return max(0.0, -self._fichas / self.taxa)
+
+    async def adquirir(self):
+        """Espera até haver uma ficha e a consome."""
+        espera = self._reservar()
+        if espera:
+            await asyncio.sleep(espera)
+
+
+class ProvedorSincrono:
+    """Provedor a partir de uma função ``baixar(ticker, inicio, fim)``, executada em uma thread.
+
+    O padrão é ``baixar_historico``, seguro para threads simultâneas. Um
+    resultado vazio conta como falha transitória (o Yahoo às vezes devolve uma
+    tabela vazia em vez de um erro quando limita as requisições) e é tentado
+    de novo; ``vazio_falha=False`` o devolve como está.
+    """
+
+    def __init__(self, baixar=baixar_historico, vazio_falha=True):
+        self._baixar = baixar
+        self.vazio_falha = vazio_falha
+
+    async def baixar(self, ticker, inicio, fim):
+        dados = await asyncio.to_thread(self._baixar, ticker, inicio, fim)
+        if self.vazio_falha and (dados is None or dados.empty):
+            raise ErroTransitorio(f'{ticker}: resposta vazia')
+        return dados
+
+
+class ProvedorArquivos:
+    """Provedor local sobre um diretório no formato de ``dados.FonteArquivos``.
+
+    Para testar concorrência e novas tentativas sem rede: ``latencia``
+    (segundos) atrasa cada chamada e ``falhas`` (``{ticker: n}``) faz as
+    primeiras ``n`` chamadas de um ticker levantarem ``ErroTransitorio``.
+    ``chamadas`` conta as chamadas por ticker. Tickers sem arquivo devolvem
+    um DataFrame vazio.
+    """
+
+    def __init__(self, diretorio, latencia=0.0, falhas=None):
+        self._arquivos = FonteArquivos(diretorio)
+        self.latencia = latencia
+        self.falhas = dict(falhas or {})
+        self.chamadas = {}
+
+    async def baixar(self, ticker, inicio, fim):
+        self.chamadas[ticker] = self.chamadas.get(ticker, 0) + 1
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        if self.chamadas[ticker] <= self.falhas.get(ticker, 0):
+            raise ErroTransitorio(f'{ticker}: falha simulada')
+        dados = self._arquivos._ler(ticker)
+        if dados is None:
+            return pd.DataFrame()
+        return dados.loc[(dados.index >= pd.Timestamp(inicio)) & (dados.index < pd.Timestamp(fim))]
+
+
+class FonteConcorrente:
+    """Fonte de ``dados`` que busca os tickers ao mesmo tempo a partir de um ``provedor``.
+
+    - ``concorrencia``: downloads simultâneos;
+    - ``taxa``/``capacidade``: requisições por segundo e rajada (``None`` sem limite);
+    - ``tentativas``: chamadas por ticker, com espera ``espera_inicial * 2**k``
+      (até ``espera_maxima``) multiplicada por um fator aleatório em [0.5, 1];
+    - ``repetir``: exceções que levam a uma nova tentativa; as demais não são repetidas.
+
+    O limite de taxa vale para a fonte inteira, somando todas as chamadas,
+    mesmo simultâneas. Tickers que esgotam as tentativas ficam fora do
+    resultado (e viram colunas de NaN em ``carregar_precos``); o erro de cada
+    um vai para o dicionário ``falhas`` passado à chamada.
+    """
+
+    def __init__(self, provedor=None, concorrencia=8, taxa=None, capacidade=None, tentativas=4,
+                 espera_inicial=0.5, espera_maxima=30.0, repetir=(ErroTransitorio, OSError),
+                 seed=None):
+        if concorrencia < 1 or tentativas < 1:
+            raise ValueError('concorrencia e tentativas devem ser ao menos 1')
+        self.provedor = ProvedorSincrono() if provedor is None else provedor
+        self.concorrencia = concorrencia
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.repetir = tuple(repetir)
+        self._aleatorio = random.Random(seed)
+        self._limite = None if taxa is None else LimiteTaxa(taxa, capacidade)
+
+    def _espera(self, tentativa):
+        base = min(self.espera_maxima, self.espera_inicial * 2 ** tentativa)
+        return base * self._aleatorio.uniform(0.5, 1.0)
+
+    async def _baixar(self, ticker, inicio, fim, semaforo, limite):
+        for tentativa in range(self.tentativas):
+            async with semaforo:
+                if limite is not None:
+                    await limite.adquirir()
+                try:
+                    return await self.provedor.baixar(ticker, inicio, fim)
+                except self.repetir:
+                    if tentativa == self.tentativas - 1:
+                        raise
+            # A espera acontece fora do semáforo, liberando a vaga para outro ticker
+            await asyncio.sleep(self._espera(tentativa))
+
+    async def baixar_todos(self, tickers, inicio, fim):
+        """``({ticker: DataFrame}, {ticker: exceção})``, buscando os tickers em paralelo."""
+        tickers = list(dict.fromkeys(tickers))
+        semaforo = asyncio.Semaphore(self.concorrencia)
+        resultados = await asyncio.gather(
+            *[self._baixar(t, inicio, fim, semaforo, self._limite) for t in tickers],
+            return_exceptions=True)
+        saida, falhas = {}, {}
+        for ticker, resultado in zip(tickers, resultados):
+            if isinstance(resultado, BaseException):
+                if not isinstance(resultado, Exception):
+                    raise resultado
+                falhas[ticker] = resultado
+            else:
+                saida[ticker] = resultado
+        return saida, falhas
+
+    async def series_async(self, tickers, inicio, fim, campo='Adj Close', falhas=None):
+        tabelas, erros = await self.baixar_todos(tickers, inicio, fim)
+        if falhas is not None:
+            falhas.update(erros)
+        return {t: dados[campo].dropna() for t, dados in tabelas.items() if campo in dados.columns}
+
+    @medido('dados.busca')
+    def series(self, tickers, inicio, fim, campo='Adj Close', falhas=None):
+        """Versão síncrona de ``series_async``, para ``carregar_precos``.
+
+        ``falhas``, se informado, recebe ``{ticker: exceção}`` desta chamada.
+        Dentro de um laço de eventos já em execução (ex.: no Jupyter), a busca
+        roda em um laço próprio em outra thread.
+        """
+        corrotina = self.series_async(tickers, inicio, fim, campo, falhas)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(corrotina)
+        resultado = {}
+
+        def executar():
+            try:
+                resultado['valor'] = asyncio.run(corrotina)
+            except BaseException as erro:  # noqa: BLE001 - repassado para a thread que chamou
+                resultado['erro'] = erro
+
+        thread = threading.Thread(target=executar)
+        thread.start()
+        thread.join()
+        if 'erro' in resultado:
+            raise resultado['erro']
+        return resultado['valor']
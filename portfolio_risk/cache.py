@@ -0,0 +1,245 @@
+"""Cache local de preços em Parquet com atualização incremental.
+
+Cada par (ticker, campo) vira um arquivo Parquet com o histórico já baixado e
+um registro dos intervalos de datas cobertos. Uma consulta só vai à fonte
+(Yahoo Finance por padrão) para os pedaços do intervalo que ainda não estão
+em disco; as execuções seguintes leem direto do Parquet. Se o ``Adj Close``
+de datas já gravadas mudar na fonte (novo provento), o histórico do ticker é
+baixado de novo por inteiro em vez de emendar séries com bases diferentes.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+
+# Dias já gravados pedidos de novo a cada atualização, para conferir a base de ajuste
+_DIAS_SOBREPOSICAO = 7
+_TOLERANCIA = 1e-6
+_CAMPO_AJUSTADO = 'Adj Close'
+# yf.download guarda o resultado em estado global do módulo: uma chamada por vez
+_TRAVA_YAHOO = threading.Lock()
+# Uma trava por pasta de ticker, compartilhada por todos os CachePrecos do processo
+_TRAVAS = {}
+_TRAVA_TRAVAS = threading.Lock()
+
+
+def baixar_yahoo(ticker, inicio, fim):
+    """Baixa todas as colunas (Open, High, ..., Adj Close) de um ticker no Yahoo Finance."""
+    import yfinance as yf
+
+    with _TRAVA_YAHOO:
+        dados = yf.download(ticker, start=inicio, end=fim, auto_adjust=False, progress=False)
+    # Versões recentes do yfinance devolvem colunas MultiIndex (campo, ticker)
+    if isinstance(dados.columns, pd.MultiIndex):
+        dados.columns = dados.columns.get_level_values(0)
+    return dados
+
+
+def _nome_arquivo(texto):
+    return re.sub(r'[^0-9A-Za-z._-]', '_', texto)
+
+
+def _hoje():
+    return pd.Timestamp.today().normalize()
+
+
+def _trava(pasta):
+    with _TRAVA_TRAVAS:
+        return _TRAVAS.setdefault(os.path.abspath(pasta), threading.Lock())
+
+
+def _gravar_atomico(caminho, escrever):
+    # Nome temporário único na mesma pasta: gravações simultâneas não se atropelam
+    pasta, nome = os.path.split(caminho)
+    descritor, temporario = tempfile.mkstemp(prefix=nome + '.', suffix='.tmp', dir=pasta)
+    os.close(descritor)
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def _juntar_intervalos(intervalos):
+    # Intervalos semiabertos [inicio, fim) ordenados e sem sobreposição
+    juntos = []
+    for inicio, fim in sorted(intervalos):
+        if juntos and inicio <= juntos[-1][1]:
+            juntos[-1][1] = max(juntos[-1][1], fim)
+        else:
+            juntos.append([inicio, fim])
+    return [tuple(i) for i in juntos]
+
+
+class CachePrecos:
+    """Armazém de preços em disco indexado por (ticker, campo, intervalo de datas).
+
+    ``baixar`` é qualquer função ``baixar(ticker, inicio, fim)`` que devolva um
+    DataFrame indexado por data com uma coluna por campo, como ``baixar_yahoo``.
+    """
+
+    def __init__(self, diretorio, baixar=baixar_yahoo):
+        self.diretorio = str(diretorio)
+        self.baixar = baixar
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _pasta(self, ticker):
+        return os.path.join(self.diretorio, _nome_arquivo(ticker))
+
+    def _arquivo(self, ticker, campo):
+        return os.path.join(self._pasta(ticker), _nome_arquivo(campo) + '.parquet')
+
+    def _arquivo_cobertura(self, ticker):
+        return os.path.join(self._pasta(ticker), 'cobertura.json')
+
+    def _ler_cobertura(self, ticker):
+        caminho = self._arquivo_cobertura(ticker)
+        if not os.path.exists(caminho):
+            return {}
+        with open(caminho) as f:
+            bruto = json.load(f)
+        return {campo: [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in intervalos]
+                for campo, intervalos in bruto.items()}
+
+    def _gravar_cobertura(self, ticker, cobertura):
+        bruto = {campo: [[a.strftime('%Y-%m-%d'), b.strftime('%Y-%m-%d')] for a, b in intervalos]
+                 for campo, intervalos in cobertura.items()}
+
+        def escrever(temporario):
+            with open(temporario, 'w') as f:
+                json.dump(bruto, f)
+        _gravar_atomico(self._arquivo_cobertura(ticker), escrever)
+
+    def _ler_serie(self, ticker, campo):
+        caminho = self._arquivo(ticker, campo)
+        if not os.path.exists(caminho):
+            return pd.Series(dtype='float64', name=campo, index=pd.DatetimeIndex([], name='Date'))
+        return pd.read_parquet(caminho)[campo]
+
+    def _gravar_serie(self, ticker, campo, serie):
+        _gravar_atomico(self._arquivo(ticker, campo), serie.to_frame(campo).to_parquet)
+
+    def cobertura(self, ticker, campo='Adj Close'):
+        """Intervalos [inicio, fim) já presentes em disco para (ticker, campo)."""
+        return self._ler_cobertura(ticker).get(campo, [])
+
+    def faltantes(self, ticker, inicio, fim, campo='Adj Close'):
+        """Pedaços de [inicio, fim) que ainda precisam ser baixados."""
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        faltam = []
+        cursor = inicio
+        for a, b in self.cobertura(ticker, campo):
+            if b <= cursor:
+                continue
+            if a >= fim:
+                break
+            if a > cursor:
+                faltam.append((cursor, a))
+            cursor = max(cursor, b)
+        if cursor < fim:
+            faltam.append((cursor, fim))
+        return faltam
+
+    def _base_mudou(self, ticker, dados, cobertura):
+        # Datas já cobertas que voltaram no download precisam ter o mesmo Adj
+        # Close: se não têm, o Yahoo reajustou o histórico (dividendo ou
+        # desdobramento). Os demais campos (ex.: Volume) e o pregão do dia,
+        # gravado mas nunca coberto, podem mudar sem afetar o ajuste
+        if _CAMPO_AJUSTADO not in dados.columns:
+            return False
+        novo = dados[_CAMPO_AJUSTADO].dropna()
+        atual = self._ler_serie(ticker, _CAMPO_AJUSTADO)
+        comuns = atual.index.intersection(novo.index)
+        cobertas = np.zeros(len(comuns), dtype=bool)
+        for a, b in cobertura.get(_CAMPO_AJUSTADO, []):
+            cobertas |= (comuns >= a) & (comuns < b)
+        comuns = comuns[cobertas]
+        return bool(len(comuns)) and not np.allclose(novo.loc[comuns].astype('float64'),
+                                                     atual.loc[comuns], rtol=_TOLERANCIA, atol=0.0)
+
+    def _baixar_pedaco(self, ticker, inicio, fim):
+        dados = self.baixar(ticker, inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d'))
+        if dados is None:
+            return pd.DataFrame()
+        return dados.loc[:, dados.notna().any()]
+
+    def _recarregar(self, ticker, inicio, fim, hoje):
+        # Troca o histórico inteiro por um download único, na base de ajuste atual
+        cobertura = self._ler_cobertura(ticker)
+        extremos = [(a, b) for intervalos in cobertura.values() for a, b in intervalos]
+        inicio = min([inicio] + [a for a, _ in extremos])
+        fim = max([fim] + [b for _, b in extremos])
+        dados = self._baixar_pedaco(ticker, inicio, fim)
+        if dados.empty:
+            return
+        fim_coberto = min(fim, hoje)
+        for c in set(cobertura) - set(dados.columns):
+            if os.path.exists(self._arquivo(ticker, c)):
+                os.remove(self._arquivo(ticker, c))
+        for c in dados.columns:
+            serie = dados[c].dropna().astype('float64').sort_index()
+            serie.index.name = 'Date'
+            self._gravar_serie(ticker, c, serie.rename(c))
+        self._gravar_cobertura(ticker, {c: [(inicio, fim_coberto)] if inicio < fim_coberto else []
+                                        for c in dados.columns})
+
+    def atualizar(self, ticker, inicio, fim, campo='Adj Close'):
+        """Baixa só os intervalos faltantes e grava todos os campos recebidos.
+
+        Só os campos que vieram com dados são marcados como cobertos: uma
+        resposta vazia (falha passageira da fonte) é tentada de novo na
+        próxima consulta. Cada pedaço é pedido a partir de alguns dias antes,
+        e se essas datas já gravadas vierem com outro valor, o ajuste por
+        proventos mudou desde o último download e todo o histórico do ticker
+        é baixado de novo, para não misturar bases de ajuste na mesma série.
+
+        Chamadas simultâneas para o mesmo ticker (threads do serviço ou da
+        busca concorrente) são serializadas: a segunda encontra o intervalo
+        já coberto e não baixa de novo.
+        """
+        if not self.faltantes(ticker, inicio, fim, campo):
+            return
+        os.makedirs(self._pasta(ticker), exist_ok=True)
+        with _trava(self._pasta(ticker)):
+            self._atualizar(ticker, inicio, fim, campo)
+
+    def _atualizar(self, ticker, inicio, fim, campo):
+        faltam = self.faltantes(ticker, inicio, fim, campo)
+        if not faltam:
+            return
+        cobertura = self._ler_cobertura(ticker)
+        # O pregão de hoje ainda pode mudar, então ele nunca é marcado como coberto
+        hoje = _hoje()
+        novos = {}
+        for a, b in faltam:
+            sobreposicao = a - pd.Timedelta(days=_DIAS_SOBREPOSICAO) if cobertura else a
+            dados = self._baixar_pedaco(ticker, sobreposicao, b)
+            if cobertura and self._base_mudou(ticker, dados, cobertura):
+                self._recarregar(ticker, pd.Timestamp(inicio), pd.Timestamp(fim), hoje)
+                return
+            fim_coberto = min(b, hoje)
+            for c in dados.columns:
+                novos.setdefault(c, []).append(dados[c].dropna().astype('float64'))
+                if a < fim_coberto:
+                    cobertura.setdefault(c, []).append((a, fim_coberto))
+        for c, pedacos in novos.items():
+            serie = pd.concat([self._ler_serie(ticker, c)] + pedacos)
+            serie = serie[~serie.index.duplicated(keep='last')].sort_index()
+            serie.index.name = 'Date'
+            self._gravar_serie(ticker, c, serie.rename(c))
+        self._gravar_cobertura(ticker, {c: _juntar_intervalos(i) for c, i in cobertura.items()})
+
+    @medido('dados.cache')
+    def precos(self, ticker, inicio, fim, campo='Adj Close'):
+        """Série de preços de ``ticker`` em [inicio, fim), baixando só o que faltar."""
+        self.atualizar(ticker, inicio, fim, campo)
+        serie = self._ler_serie(ticker, campo)
+        return serie.loc[(serie.index >= pd.Timestamp(inicio)) & (serie.index < pd.Timestamp(fim))]
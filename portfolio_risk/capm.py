@@ -0,0 +1,93 @@
+"""Regressão CAPM (beta, alfa, R² e erros-padrão) para todos os ativos de uma vez.
+
+Substitui o ``sm.OLS(endog, exog).fit()`` por ativo do notebook (In[58]): como
+o regressor (o retorno do mercado) é o mesmo para todos os ativos, a solução de
+mínimos quadrados de cada coluna sai das mesmas somas de produtos, calculadas
+para a matriz (datas x ativos) inteira em poucas operações vetorizadas.
+"""
+
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .janelas import _soma_movel
+
+COLUNAS = ['alpha', 'beta', 'r2', 'erro_alpha', 'erro_beta', 'n']
+
+
+def _estatisticas(n, s_m, s_r, s_mm, s_mr, s_rr, constante, centro_m=0.0):
+    # Mínimos quadrados de r = alpha + beta * m a partir das somas (elemento a elemento).
+    # ``centro_m`` é o que foi subtraído de m antes das somas: o erro do alpha
+    # depende da média do mercado sem esse deslocamento
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if constante:
+            media_m, media_r = s_m / n, s_r / n
+            sxx = s_mm - n * media_m * media_m
+            sxy = s_mr - n * media_m * media_r
+            syy = s_rr - n * media_r * media_r
+            beta = sxy / sxx
+            alpha = media_r - beta * media_m
+            residuo = np.maximum(syy - beta * sxy, 0.0)
+            s2 = residuo / (n - 2)
+            erro_beta = np.sqrt(s2 / sxx)
+            media_bruta = media_m + centro_m
+            erro_alpha = np.sqrt(s2 * (1 / n + media_bruta * media_bruta / sxx))
+            r2 = 1 - residuo / syy
+        else:
+            # Sem constante, como o sm.OLS(endog, exog) do notebook (R² não centrado)
+            beta = s_mr / s_mm
+            alpha = np.zeros_like(beta)
+            residuo = np.maximum(s_rr - beta * s_mr, 0.0)
+            s2 = residuo / (n - 1)
+            erro_beta = np.sqrt(s2 / s_mm)
+            erro_alpha = np.full_like(beta, np.nan)
+            r2 = 1 - residuo / s_rr
+    return {'alpha': alpha, 'beta': beta, 'r2': r2,
+            'erro_alpha': erro_alpha, 'erro_beta': erro_beta, 'n': n}
+
+
+@medido('risco.capm')
+def regressao_capm(retornos, mercado, taxa_livre=0.0, constante=True, janela=None):
+    """Regressão de cada coluna de ``retornos`` contra o retorno do ``mercado``.
+
+    ``taxa_livre`` (por período, ex.: ``selic_diaria``) é subtraída dos dois
+    lados, dando a regressão do CAPM em excesso de retorno. Cada ativo usa as
+    datas em que ele e o mercado têm retorno. ``constante=False`` reproduz o
+    ``sm.OLS(endog, exog)`` do notebook, sem intercepto.
+
+    Sem ``janela`` devolve uma linha por ativo com as colunas de ``COLUNAS``;
+    com ``janela`` (em pregões) devolve a regressão móvel indexada por (data, ativo).
+    """
+    retornos = pd.DataFrame(retornos)
+    r = retornos.to_numpy(dtype='float64') - taxa_livre
+    m = pd.Series(mercado).reindex(retornos.index).to_numpy(dtype='float64')[:, None] - taxa_livre
+    validos = ~np.isnan(r) & ~np.isnan(m)
+
+    # Com intercepto a regressão é invariante a deslocamentos: centralizar
+    # pela média global reduz o erro numérico das somas
+    centro_r = np.nanmean(r, axis=0) if constante else np.zeros(r.shape[1])
+    centro_m = np.nanmean(m) if constante else 0.0
+    r = np.where(validos, r - centro_r, 0.0)
+    m = np.where(validos, m - centro_m, 0.0)
+
+    somar = partial(np.sum, axis=0) if janela is None else partial(_soma_movel, janela=janela)
+    n = somar(validos.astype('float64'))
+    resultado = _estatisticas(n, somar(m), somar(r), somar(m * m), somar(m * r), somar(r * r), constante,
+                              centro_m)
+    if constante:
+        resultado['alpha'] = resultado['alpha'] + centro_r - resultado['beta'] * centro_m
+
+    if janela is None:
+        return pd.DataFrame(resultado, index=retornos.columns)[COLUNAS]
+
+    inicio = min(janela - 1, len(retornos))
+    completo = (n >= janela)[inicio:]
+    datas, N = retornos.index[inicio:], retornos.shape[1]
+    indice = pd.MultiIndex(
+        levels=[datas, retornos.columns],
+        codes=[np.repeat(np.arange(len(datas)), N), np.tile(np.arange(N), len(datas))],
+        names=['Date', 'ativo'], verify_integrity=False)
+    dados = {nome: np.where(completo, resultado[nome][inicio:], np.nan).ravel() for nome in COLUNAS}
+    return pd.DataFrame(dados, index=indice)
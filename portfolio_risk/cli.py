@@ -0,0 +1,191 @@
+"""Linha de comando ``portfolio-risk``, sem tela e sem ``fig.show()``.
+
+Ex.::
+
+    portfolio-risk report --tickers ITUB3.SA BBDC3.SA --start 2017-01-01 --end 2024-01-01
+    portfolio-risk report --tickers ITUB3.SA BBDC3.SA --start 2017-01-01 --end 2024-01-01 \\
+        --fonte cache dados/precos --objetivo max_sharpe --saida relatorio.json
+    portfolio-risk batch --config carteiras.json --saida relatorios/ --fonte cache dados/precos
+    portfolio-risk serve --porta 8000 --fonte cache dados/precos --ttl 300
+
+Só ``argparse`` é importado na partida; pandas, numpy e as dependências
+opcionais (yfinance, PyPortfolioOpt, plotly) são carregados depois da leitura
+dos argumentos e apenas se o relatório precisar deles.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+FONTES = ('yahoo', 'arquivos', 'cache')
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='portfolio-risk',
+                                     description='Análise de risco e otimização de portfólio.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    report = sub.add_parser('report', help='relatório de risco por ativo e da carteira')
+    report.add_argument('--tickers', nargs='+', required=True)
+    report.add_argument('--start', required=True, help='data inicial (AAAA-MM-DD)')
+    report.add_argument('--end', required=True, help='data final, exclusiva (AAAA-MM-DD)')
+    report.add_argument('--mercado', default='^BVSP',
+                        help="índice para o beta (padrão ^BVSP; '' desliga)")
+    report.add_argument('--fonte', nargs='+', default=['yahoo'], metavar=('FONTE', 'DIR'),
+                        help="yahoo, 'arquivos DIR' ou 'cache DIR'")
+    report.add_argument('--niveis', nargs='+', type=float, default=[0.90, 0.95, 0.99])
+    report.add_argument('--monte-carlo', type=int, default=0, metavar='CAMINHOS',
+                        help='caminhos para o VaR de Monte Carlo (0 desliga)')
+    report.add_argument('--seed', type=int, default=None)
+    report.add_argument('--objetivo', default=None,
+                        help='otimiza a carteira: min_volatility, max_sharpe, ...')
+    report.add_argument('--taxa-livre', type=float, default=0.0)
+    report.add_argument('--graficos', default=None, metavar='DIR',
+                        help='grava os gráficos em HTML neste diretório')
+    report.add_argument('--saida', default=None,
+                        help='arquivo .json ou .csv (padrão: JSON na saída padrão)')
+    report.add_argument('--perfil', default=None, metavar='ARQUIVO',
+                        help='grava a medição das etapas em JSON Lines')
+
+    batch = sub.add_parser('batch', help='relatórios de todas as carteiras de um arquivo JSON')
+    batch.add_argument('--config', required=True, help='arquivo JSON com as carteiras')
+    batch.add_argument('--saida', required=True, metavar='DIR',
+                       help='diretório de resumo.csv, pesos.csv e relatorios.json')
+    batch.add_argument('--fonte', nargs='+', default=['yahoo'], metavar=('FONTE', 'DIR'),
+                       help="yahoo, 'arquivos DIR' ou 'cache DIR'")
+    batch.add_argument('--cache-estimativas', default=None, metavar='DIR',
+                       help='guarda os retornos esperados em disco entre execuções')
+    batch.add_argument('--perfil', default=None, metavar='ARQUIVO',
+                       help='grava a medição das etapas em JSON Lines')
+
+    serve = sub.add_parser('serve', help='serviço HTTP local com VaR, beta, drawdown e otimização')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--porta', type=int, default=8000)
+    serve.add_argument('--fonte', nargs='+', default=['yahoo'], metavar=('FONTE', 'DIR'),
+                       help="yahoo, 'arquivos DIR' ou 'cache DIR'")
+    serve.add_argument('--ttl', type=float, default=300.0,
+                       help='validade, em segundos, dos resultados em cache')
+    serve.add_argument('--processos', type=int, default=None,
+                       help='processos para otimização e Monte Carlo (0: usa threads)')
+    serve.add_argument('--perfil', default=None, metavar='ARQUIVO',
+                       help='grava a medição das etapas em JSON Lines')
+    return parser
+
+
+def _fonte(argumentos):
+    from . import dados
+
+    nome, *resto = argumentos
+    if nome not in FONTES or (nome != 'yahoo') != bool(resto):
+        raise SystemExit(f"--fonte deve ser 'yahoo', 'arquivos DIR' ou 'cache DIR', recebido {argumentos}")
+    if nome == 'yahoo':
+        return dados.FonteYahoo()
+    if nome == 'arquivos':
+        return dados.FonteArquivos(resto[0])
+    from .cache import CachePrecos
+
+    return dados.FonteCache(CachePrecos(resto[0]))
+
+
+def _graficos(diretorio, precos):
+    from .dados import calcular_retornos
+    from .drawdown import serie_drawdown
+    from .graficos import grafico_drawdown, grafico_retornos
+    from .instrumentacao import etapa
+
+    os.makedirs(diretorio, exist_ok=True)
+    with etapa('grafico.retornos'):
+        grafico_retornos(calcular_retornos(precos, log=True), 'Retornos logarítmicos').write_html(
+            os.path.join(diretorio, 'retornos.html'), include_plotlyjs='cdn')
+    with etapa('grafico.drawdown'):
+        grafico_drawdown(serie_drawdown(precos)).write_html(
+            os.path.join(diretorio, 'drawdown.html'), include_plotlyjs='cdn')
+
+
+def _report(args):
+    from .dados import carregar_precos
+    from .relatorio import otimizar, relatorio_ativos
+
+    fonte = _fonte(args.fonte)
+    ativos = list(dict.fromkeys(args.tickers))
+    todos = ativos + [args.mercado] if args.mercado else ativos
+    precos = carregar_precos(todos, args.start, args.end, fonte=fonte)
+    faltando = [t for t in ativos if precos[t].isna().all()]
+    if faltando:
+        raise SystemExit(f'sem preços para {", ".join(faltando)}')
+    mercado = precos[args.mercado] if args.mercado else None
+    if mercado is not None and mercado.isna().all():
+        print(f'aviso: sem preços para o mercado {args.mercado}; beta omitido', file=sys.stderr)
+        mercado = None
+    precos = precos[ativos].dropna(how='all')
+
+    tabela = relatorio_ativos(precos, mercado, args.niveis, args.monte_carlo, args.seed)
+    carteira = None
+    if args.objetivo:
+        carteira = otimizar(precos, args.objetivo, mercado, args.taxa_livre)
+
+    if args.saida and args.saida.endswith('.csv'):
+        tabela.to_csv(args.saida, index_label='ativo')
+    else:
+        _escrever_json(args.saida, precos, tabela, carteira)
+    if args.graficos:
+        _graficos(args.graficos, precos)
+
+
+def _escrever_json(saida, precos, tabela, carteira):
+    texto = json.dumps({
+        'inicio': str(precos.index[0].date()),
+        'fim': str(precos.index[-1].date()),
+        'ativos': json.loads(tabela.to_json(orient='index')),
+        'carteira': carteira,
+    }, indent=2, ensure_ascii=False)
+    if saida:
+        with open(saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+
+def _batch(args):
+    from .lote import gravar_relatorios, ler_configuracao, relatorios_lote
+
+    cache = None
+    if args.cache_estimativas:
+        from .memo import CacheEstimativas
+
+        cache = CacheEstimativas(diretorio=args.cache_estimativas)
+    resumo, pesos = relatorios_lote(ler_configuracao(args.config), _fonte(args.fonte), cache)
+    gravar_relatorios(resumo, pesos, args.saida)
+
+
+def _serve(args):
+    import asyncio
+
+    from .servico import servir
+
+    print(f'servindo em http://{args.host}:{args.porta}', file=sys.stderr)
+    try:
+        asyncio.run(servir(args.host, args.porta, fonte=_fonte(args.fonte), ttl=args.ttl,
+                           n_processos=args.processos))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    if args.perfil:
+        from . import instrumentacao
+
+        instrumentacao.ativar(args.perfil)
+    if args.comando == 'report':
+        _report(args)
+    elif args.comando == 'batch':
+        _batch(args)
+    else:
+        _serve(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
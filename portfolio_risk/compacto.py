@@ -0,0 +1,182 @@
+"""Modo compacto: retornos em float32 contíguo, processados em blocos de colunas.
+
+No notebook cada passo cria um novo objeto pandas float64 (``itau_returns``,
+``itau_log_returns``, ``retorno``, ``df``) e várias células copiam a tabela
+inteira (``drop``, ``pd.DataFrame(drawdown)``, ``rename``). Aqui os retornos
+ficam em um único array float32 em ordem de colunas (cada ativo contíguo na
+memória), com as datas e os tickers à parte. Os retornos são calculados no
+próprio array de preços, e as métricas percorrem os ativos em blocos de
+colunas cujo tamanho respeita um orçamento de memória para os temporários.
+
+Ex.: 20 anos de pregões (≈ 5000 datas) x 5000 tickers ocupam cerca de 100 MB
+em float32, contra 200 MB por cópia em float64::
+
+    precos = carregar_precos(tickers, '2004-01-01', '2024-01-01', dtype='float32')
+    compactos = RetornosCompactos.de_precos(precos, orcamento=256 << 20)
+    tabela = compactos.metricas(mercado=retornos_ibov)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .capm import regressao_capm
+from .instrumentacao import etapa, medido
+from .var import NIVEIS, var_es_matriz
+
+# Pico estimado de bytes temporários por célula de um bloco em metricas()
+# (cópia particionada em float32, riqueza e máximo acumulado em float64, somas da regressão)
+_BYTES_POR_CELULA = 64
+
+
+class RetornosCompactos:
+    """Matriz (datas x ativos) de retornos float32 em ordem de colunas.
+
+    ``orcamento`` é o limite, em bytes, dos temporários de cada bloco de
+    colunas; ``None`` processa todos os ativos de uma vez. Os valores podem
+    ser um ``np.memmap`` (ver ``carregar``), e então só o bloco em uso é lido.
+    ``log`` indica que os valores são retornos logarítmicos.
+    """
+
+    def __init__(self, valores, datas, tickers, orcamento=256 << 20, log=False):
+        self.valores = np.asarray(valores)
+        if self.valores.ndim != 2 or self.valores.shape != (len(datas), len(tickers)):
+            raise ValueError('valores deve ter forma (len(datas), len(tickers))')
+        self.datas = pd.DatetimeIndex(datas, name='Date')
+        self.tickers = list(tickers)
+        self.orcamento = orcamento
+        self.log = log
+
+    @classmethod
+    @medido('compacto.de_precos')
+    def de_precos(cls, precos, log=False, dtype='float32', orcamento=256 << 20):
+        """Retornos a partir de uma matriz de preços, calculados no próprio array.
+
+        ``precos`` é um DataFrame (datas x ativos); a única cópia é a conversão
+        para ``dtype`` em ordem de colunas, e a primeira linha (sem retorno) é
+        descartada por fatiamento, sem cópia.
+        """
+        precos = pd.DataFrame(precos)
+        valores = np.asfortranarray(precos.to_numpy(dtype=dtype, copy=True))
+        compactos = cls(valores, precos.index, precos.columns, orcamento, log)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for bloco in compactos._fatias():
+                p = valores[:, bloco]
+                if log:
+                    np.log(p, out=p)
+                    # Com a sobreposição o NumPy copia as linhas anteriores, só deste bloco
+                    p[1:] -= p[:-1]
+                else:
+                    p[1:] /= p[:-1]
+                    p -= 1
+        compactos.valores = valores[1:]
+        compactos.datas = compactos.datas[1:]
+        return compactos
+
+    @property
+    def forma(self):
+        return self.valores.shape
+
+    @property
+    def nbytes(self):
+        return self.valores.nbytes
+
+    def _fatias(self, bytes_por_celula=_BYTES_POR_CELULA):
+        T, N = self.valores.shape
+        if self.orcamento is None:
+            largura = max(N, 1)
+        else:
+            largura = max(1, self.orcamento // max(T * bytes_por_celula, 1))
+        return [slice(inicio, min(inicio + largura, N)) for inicio in range(0, N, largura)]
+
+    def blocos(self):
+        """Gera ``(tickers, bloco)`` com visões de blocos de colunas dentro do orçamento."""
+        for fatia in self._fatias():
+            yield self.tickers[fatia], self.valores[:, fatia]
+
+    def para_pandas(self):
+        """DataFrame sobre os mesmos dados (sem cópia quando possível)."""
+        return pd.DataFrame(self.valores, index=self.datas, columns=self.tickers, copy=False)
+
+    def retornos_carteira(self, pesos):
+        """Retorno diário (float64) de uma carteira ou de uma matriz de pesos (ativos x carteiras).
+
+        Retornos ausentes contam como zero, como em ``drawdown.riqueza``.
+        """
+        pesos = np.asarray(pesos.reindex(self.tickers).fillna(0) if isinstance(pesos, pd.Series)
+                           else pesos, dtype='float64')
+        saida = np.zeros((self.valores.shape[0],) + pesos.shape[1:])
+        for fatia in self._fatias(bytes_por_celula=8):
+            bloco = np.nan_to_num(self.valores[:, fatia].astype('float64'))
+            saida += bloco @ pesos[fatia]
+        return saida
+
+    @medido('compacto.metricas')
+    def metricas(self, niveis=NIVEIS, mercado=None):
+        """Volatilidade, semidesvio, VaR/ES histórico, drawdown máximo e beta por ativo.
+
+        Mesmas definições de ``relatorio.relatorio_ativos`` (VaR e ES de
+        ``var.var_es_matriz``), calculadas bloco a bloco com acumulação em
+        float64. ``mercado`` é a Series de retornos do índice.
+        """
+        niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+        partes = []
+        for tickers, bloco in self.blocos():
+            with etapa('compacto.bloco', ativos=len(tickers)):
+                partes.append(self._metricas_bloco(tickers, bloco, niveis, mercado))
+        return pd.concat(partes)
+
+    def _metricas_bloco(self, tickers, bloco, niveis, mercado):
+        validos = ~np.isnan(bloco)
+        n = validos.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.nansum(bloco, axis=0, dtype='float64') / n
+            desvio = np.sqrt(np.nansum(np.square(bloco - media.astype(bloco.dtype)), axis=0,
+                                       dtype='float64') / n)
+            negativos = np.minimum(bloco, 0)
+            semidesvio = np.sqrt(np.nansum(np.square(negativos), axis=0, dtype='float64') / n)
+        del negativos
+        colunas = {'volatilidade_diaria': desvio, 'volatilidade_anual': desvio * np.sqrt(252),
+                   'semidesvio': semidesvio}
+
+        # VaR e ES: uma partição por coluna do bloco, em float32
+        historico = var_es_matriz(bloco, niveis)
+        for nivel in niveis:
+            sufixo = str(round(nivel * 100))
+            colunas[f'var_historico_{sufixo}'] = historico['VaR'][nivel].to_numpy()
+            colunas[f'es_historico_{sufixo}'] = historico['ES'][nivel].to_numpy()
+
+        # Drawdown máximo sobre a riqueza em log, acumulada em float64
+        if self.log:
+            riqueza = np.nan_to_num(bloco.astype('float64'), copy=False)
+        else:
+            riqueza = np.log1p(np.nan_to_num(bloco), dtype='float64')
+        np.cumsum(riqueza, axis=0, out=riqueza)
+        maximo = np.maximum.accumulate(np.maximum(riqueza, 0), axis=0)
+        riqueza -= maximo
+        colunas['max_drawdown'] = np.expm1(riqueza.min(axis=0))
+        del riqueza, maximo
+
+        if mercado is not None:
+            capm = regressao_capm(pd.DataFrame(bloco, index=self.datas, columns=tickers, copy=False),
+                                  mercado)
+            colunas['beta'] = capm['beta'].to_numpy()
+        return pd.DataFrame(colunas, index=pd.Index(tickers, name='ativo'))
+
+    def salvar(self, caminho):
+        """Grava em ``caminho`` (diretório): ``valores.npy`` e ``indices.npz`` (datas, tickers e ``log``)."""
+        os.makedirs(caminho, exist_ok=True)
+        np.save(os.path.join(caminho, 'valores.npy'), self.valores)
+        np.savez(os.path.join(caminho, 'indices.npz'), datas=self.datas.values.astype('int64'),
+                 tickers=np.array(self.tickers, dtype=str), log=np.array(self.log))
+
+    @classmethod
+    def carregar(cls, caminho, mmap=True, orcamento=256 << 20):
+        """Lê o que ``salvar`` gravou; com ``mmap=True`` os valores ficam em disco (``np.memmap``)."""
+        valores = np.load(os.path.join(caminho, 'valores.npy'), mmap_mode='r' if mmap else None)
+        with np.load(os.path.join(caminho, 'indices.npz')) as indices:
+            datas = pd.to_datetime(indices['datas'])
+            tickers = indices['tickers'].tolist()
+            log = bool(indices['log']) if 'log' in indices.files else False
+        return cls(valores, datas, tickers, orcamento, log)
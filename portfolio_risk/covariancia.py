@@ -0,0 +1,180 @@
+"""Covariância e encolhimento de Ledoit-Wolf atualizados um pregão por vez.
+
+``risk_models.CovarianceShrinkage(df).ledoit_wolf()`` (In[94]) refaz tudo a
+partir do histórico completo, O(T·N²). ``CovarianciaIncremental`` guarda somas
+e produtos cruzados dos retornos; cada novo dia é uma atualização de posto 1,
+O(N²), e a janela deslizante descarta o dia mais antigo da mesma forma. O
+estado pode ser salvo em disco e restaurado na execução seguinte.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+
+
+class CovarianciaIncremental:
+    """Estado incremental da covariância dos retornos diários de ``tickers``.
+
+    - ``janela``: mantém só os últimos ``janela`` retornos (janela deslizante);
+    - ``decaimento``: em vez da janela, pondera exponencialmente os retornos
+      (ex.: 0.94), multiplicando o estado a cada dia. Nesse caso o encolhimento
+      de Ledoit-Wolf usa os pesos como contagens, uma aproximação.
+
+    Os resultados seguem o PyPortfolioOpt: retornos simples, anualizados por
+    ``frequencia`` e dias com algum retorno ausente descartados.
+    """
+
+    def __init__(self, tickers, janela=None, decaimento=None, frequencia=252):
+        if janela is not None and decaimento is not None:
+            raise ValueError('use janela ou decaimento, não os dois')
+        self.tickers = list(tickers)
+        self.janela = janela
+        self.decaimento = decaimento
+        self.frequencia = frequencia
+        N = len(self.tickers)
+        # Somas (ponderadas) de 1, x, x xᵀ, |x|² x e |x|⁴ dos retornos x
+        self.n = 0.0
+        self.soma = np.zeros(N)
+        self.produto = np.zeros((N, N))
+        self.soma_norma_x = np.zeros(N)
+        self.soma_norma4 = 0.0
+        self.ultimo_preco = None
+        self._janela = deque()
+        self.intensidade = None
+
+    def _acumular(self, x, sinal):
+        norma2 = x @ x
+        self.n += sinal
+        self.soma += sinal * x
+        # Atualização de posto 1 no próprio buffer
+        self.produto += sinal * np.outer(x, x)
+        self.soma_norma_x += sinal * norma2 * x
+        self.soma_norma4 += sinal * norma2 * norma2
+
+    def atualizar(self, retorno):
+        """Incorpora o retorno de um novo pregão (vetor na ordem de ``tickers``)."""
+        x = np.asarray(retorno.reindex(self.tickers) if isinstance(retorno, pd.Series) else retorno,
+                       dtype='float64')
+        if np.isnan(x).any():
+            return self
+        if self.decaimento is not None:
+            self.n *= self.decaimento
+            self.soma *= self.decaimento
+            self.produto *= self.decaimento
+            self.soma_norma_x *= self.decaimento
+            self.soma_norma4 *= self.decaimento
+        self._acumular(x, 1.0)
+        if self.janela is not None:
+            self._janela.append(x)
+            if len(self._janela) > self.janela:
+                self._acumular(self._janela.popleft(), -1.0)
+        return self
+
+    def atualizar_precos(self, precos):
+        """Incorpora os preços de fechamento de um novo pregão, calculando o retorno."""
+        p = np.asarray(precos.reindex(self.tickers) if isinstance(precos, pd.Series) else precos,
+                       dtype='float64')
+        if self.ultimo_preco is not None:
+            self.atualizar(p / self.ultimo_preco - 1)
+        self.ultimo_preco = p
+        return self
+
+    @classmethod
+    def de_precos(cls, precos, janela=None, decaimento=None, frequencia=252):
+        """Estado inicial a partir de um histórico de preços (como o ``df`` do notebook)."""
+        precos = pd.DataFrame(precos)
+        estado = cls(precos.columns, janela, decaimento, frequencia)
+        retornos = precos.pct_change().iloc[1:].dropna()
+        if decaimento is None:
+            x = retornos.to_numpy(dtype='float64')
+            if janela is not None:
+                x = x[-janela:]
+                estado._janela.extend(x)
+            # Carga inicial vetorizada: as mesmas somas do modo incremental
+            norma2 = np.einsum('ij,ij->i', x, x)
+            estado.n = float(len(x))
+            estado.soma = x.sum(axis=0)
+            estado.produto = x.T @ x
+            estado.soma_norma_x = norma2 @ x
+            estado.soma_norma4 = float(norma2 @ norma2)
+        else:
+            for linha in retornos.to_numpy(dtype='float64'):
+                estado.atualizar(linha)
+        estado.ultimo_preco = precos.iloc[-1].to_numpy(dtype='float64')
+        return estado
+
+    def _momentos(self):
+        if self.n < 2:
+            raise ValueError('são necessários pelo menos dois retornos')
+        media = self.soma / self.n
+        # Covariância viesada (÷n) dos retornos centrados
+        S = self.produto / self.n - np.outer(media, media)
+        return media, S
+
+    @medido('covariancia.amostral')
+    def amostral(self):
+        """Covariância amostral anualizada, como ``risk_models.sample_cov``."""
+        _, S = self._momentos()
+        cov = S * self.n / (self.n - 1) * self.frequencia
+        return pd.DataFrame(cov, index=self.tickers, columns=self.tickers)
+
+    @medido('covariancia.ledoit_wolf')
+    def ledoit_wolf(self):
+        """Covariância encolhida de Ledoit-Wolf anualizada, como ``CovarianceShrinkage.ledoit_wolf``.
+
+        A intensidade de encolhimento fica em ``self.intensidade``.
+        """
+        media, S = self._momentos()
+        N, n = len(self.tickers), self.n
+        mu = np.trace(S) / N
+        delta = ((S - mu * np.eye(N)) ** 2).sum() / N
+
+        # Soma de |x - m|⁴ expandida em função das somas guardadas no estado
+        c = media @ media
+        soma_norma2 = np.trace(self.produto)
+        soma_y4 = (self.soma_norma4 + 4 * media @ self.produto @ media + n * c * c
+                   - 4 * media @ self.soma_norma_x + 2 * c * soma_norma2 - 4 * c * (media @ self.soma))
+        beta = (soma_y4 / n - (S ** 2).sum()) / (N * n)
+        beta = min(max(beta, 0.0), delta)
+        self.intensidade = 0.0 if beta == 0 else beta / delta
+
+        encolhida = (1 - self.intensidade) * S + self.intensidade * mu * np.eye(N)
+        return pd.DataFrame(encolhida * self.frequencia, index=self.tickers, columns=self.tickers)
+
+    def salvar(self, caminho):
+        """Grava o estado no formato ``.npz`` (os tickers são gravados como texto).
+
+        O arquivo fica exatamente em ``caminho``, com ou sem a extensão ``.npz``,
+        que é o que ``carregar`` lê.
+        """
+        # Por um arquivo aberto, np.savez não acrescenta ``.npz`` ao nome
+        with open(caminho, 'wb') as arquivo:
+            np.savez(arquivo, tickers=np.array(self.tickers, dtype=str),
+                     parametros=np.array([np.nan if self.janela is None else self.janela,
+                                          np.nan if self.decaimento is None else self.decaimento,
+                                          self.frequencia, self.n, self.soma_norma4]),
+                     soma=self.soma, produto=self.produto, soma_norma_x=self.soma_norma_x,
+                     janela=np.array(self._janela).reshape(-1, len(self.tickers)),
+                     ultimo_preco=(np.full(len(self.tickers), np.nan) if self.ultimo_preco is None
+                                   else self.ultimo_preco))
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Restaura um estado gravado por ``salvar``."""
+        with np.load(caminho) as dados:
+            janela, decaimento, frequencia, n, soma_norma4 = dados['parametros']
+            estado = cls(dados['tickers'].tolist(),
+                         None if np.isnan(janela) else int(janela),
+                         None if np.isnan(decaimento) else float(decaimento),
+                         int(frequencia))
+            estado.n, estado.soma_norma4 = float(n), float(soma_norma4)
+            estado.soma = dados['soma']
+            estado.produto = dados['produto']
+            estado.soma_norma_x = dados['soma_norma_x']
+            estado._janela.extend(dados['janela'])
+            ultimo = dados['ultimo_preco']
+            estado.ultimo_preco = None if np.isnan(ultimo).all() else ultimo
+        return estado
@@ -0,0 +1,154 @@
+"""Carregamento em lote dos preços de vários ativos em uma única matriz alinhada.
+
+Substitui o padrão do notebook de preencher um DataFrame vazio coluna a
+coluna (``df[t] = yf.download(t, ...)['Adj Close']``): as séries de todos os
+ativos são lidas da fonte, o calendário é montado uma vez e a matriz
+(datas x ativos) é alocada uma única vez em float64.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import _nome_arquivo
+from .instrumentacao import medido
+
+ALINHAMENTOS = ('uniao', 'intersecao')
+PREENCHIMENTOS = (None, 'ffill')
+
+
+class FonteYahoo:
+    """Baixa todos os tickers do Yahoo Finance em uma única chamada ``yf.download``."""
+
+    def series(self, tickers, inicio, fim, campo='Adj Close'):
+        import yfinance as yf
+
+        dados = yf.download(list(tickers), start=inicio, end=fim, auto_adjust=False,
+                            progress=False, group_by='column')
+        if isinstance(dados.columns, pd.MultiIndex):
+            dados = dados[campo]
+        else:
+            dados = dados[[campo]].set_axis(list(tickers), axis=1)
+        return {t: dados[t].dropna() for t in tickers if t in dados.columns}
+
+
+class FonteArquivos:
+    """Lê um arquivo por ticker (``<ticker>.parquet`` ou ``<ticker>.csv``) de um diretório local.
+
+    Cada arquivo tem as datas no índice (ou na coluna ``Date``) e uma coluna por
+    campo, no mesmo formato devolvido pelo ``yf.download``.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = str(diretorio)
+
+    def _ler(self, ticker):
+        base = os.path.join(self.diretorio, _nome_arquivo(ticker))
+        if os.path.exists(base + '.parquet'):
+            return pd.read_parquet(base + '.parquet')
+        if os.path.exists(base + '.csv'):
+            return pd.read_csv(base + '.csv', index_col='Date', parse_dates=True)
+        return None
+
+    def series(self, tickers, inicio, fim, campo='Adj Close'):
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        saida = {}
+        for t in tickers:
+            dados = self._ler(t)
+            if dados is None or campo not in dados.columns:
+                continue
+            serie = dados[campo]
+            saida[t] = serie.loc[(serie.index >= inicio) & (serie.index < fim)].dropna()
+        return saida
+
+
+class FonteCache:
+    """Usa um ``CachePrecos`` como fonte, baixando apenas o que ainda não está em disco."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def series(self, tickers, inicio, fim, campo='Adj Close'):
+        return {t: self.cache.precos(t, inicio, fim, campo).dropna() for t in tickers}
+
+
+def _ffill(matriz, limite=None):
+    # Forward fill vetorizado: para cada célula, a posição da última observação válida
+    linhas = np.arange(matriz.shape[0])[:, None]
+    ultima = np.where(np.isnan(matriz), -1, linhas)
+    np.maximum.accumulate(ultima, axis=0, out=ultima)
+    preenchivel = ultima >= 0
+    if limite is not None:
+        preenchivel &= (linhas - ultima) <= limite
+    colunas = np.broadcast_to(np.arange(matriz.shape[1]), matriz.shape)
+    return np.where(preenchivel, matriz[np.maximum(ultima, 0), colunas], np.nan)
+
+
+def alinhar(series, tickers=None, alinhamento='uniao', preenchimento=None, limite=None,
+            dtype='float64'):
+    """Monta a matriz (datas x ativos) a partir de um dicionário ``{ticker: Series}``.
+
+    - ``alinhamento='uniao'`` usa a união dos calendários de negociação;
+      ``'intersecao'`` mantém apenas as datas em que todos os ativos negociaram.
+    - ``preenchimento='ffill'`` repete o último preço válido nas datas sem
+      negociação (no máximo ``limite`` pregões seguidos); ``None`` deixa NaN.
+
+    Tickers sem dados permanecem como colunas inteiras de NaN e não entram na
+    interseção dos calendários. ``dtype='float32'`` aloca a matriz com metade
+    da memória (ver ``compacto``).
+    """
+    if alinhamento not in ALINHAMENTOS:
+        raise ValueError(f'alinhamento deve ser um de {ALINHAMENTOS}, recebido {alinhamento!r}')
+    if preenchimento not in PREENCHIMENTOS:
+        raise ValueError(f'preenchimento deve ser um de {PREENCHIMENTOS}, recebido {preenchimento!r}')
+    tickers = list(series) if tickers is None else list(tickers)
+
+    presentes = [series[t] for t in tickers if t in series and len(series[t])]
+    if presentes:
+        datas = np.unique(np.concatenate([s.index.values for s in presentes]))
+    else:
+        datas = np.array([], dtype='datetime64[ns]')
+
+    matriz = np.full((len(datas), len(tickers)), np.nan, dtype=dtype)
+    for j, t in enumerate(tickers):
+        serie = series.get(t)
+        if serie is None or not len(serie):
+            continue
+        matriz[np.searchsorted(datas, serie.index.values), j] = serie.to_numpy(dtype=dtype)
+
+    if alinhamento == 'intersecao':
+        com_dados = [j for j, t in enumerate(tickers) if t in series and len(series[t])]
+        completas = ~np.isnan(matriz[:, com_dados]).any(axis=1)
+        matriz, datas = matriz[completas], datas[completas]
+    if preenchimento == 'ffill':
+        matriz = _ffill(matriz, limite)
+
+    return pd.DataFrame(matriz, index=pd.DatetimeIndex(datas, name='Date'), columns=tickers)
+
+
+@medido('dados.carregar_precos')
+def carregar_precos(ativos, inicio, fim, fonte=None, campo='Adj Close',
+                    alinhamento='uniao', preenchimento=None, limite=None, dtype='float64'):
+    """Preços de todos os ``ativos`` em uma matriz (datas x ativos), float64 por padrão.
+
+    Equivale ao loop do notebook::
+
+        df = carregar_precos(ativos, '2018-01-01', '2020-01-01')
+
+    ``fonte`` é qualquer objeto com o método ``series(tickers, inicio, fim, campo)``
+    (``FonteYahoo``, ``FonteArquivos``, ``FonteCache``); o padrão é o Yahoo Finance.
+    """
+    fonte = FonteYahoo() if fonte is None else fonte
+    series = fonte.series(ativos, inicio, fim, campo)
+    return alinhar(series, ativos, alinhamento, preenchimento, limite, dtype)
+
+
+@medido('dados.retornos')
+def calcular_retornos(precos, log=False):
+    """Retornos diários (como ``pct_change``) ou logarítmicos, sem a primeira linha (NaN)."""
+    precos = pd.DataFrame(precos)
+    p = precos.to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.log(p[1:] / p[:-1]) if log else p[1:] / p[:-1] - 1
+    return pd.DataFrame(r, index=precos.index[1:], columns=precos.columns)
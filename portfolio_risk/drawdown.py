@@ -0,0 +1,88 @@
+"""Drawdown de todo o universo de ativos em uma única passada vetorizada.
+
+Diferente do passo a passo do notebook (In[31]–In[34]), que aplica
+``np.maximum.accumulate`` sobre log-retornos multiplicados por 100, aqui o
+drawdown é medido sobre a curva de patrimônio (preços ou riqueza acumulada):
+``drawdown = patrimonio / maximo_historico - 1``, para todas as colunas de uma vez.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+
+
+def riqueza(retornos, log=False, base=1.0):
+    """Curva de patrimônio acumulado a partir de retornos simples ou logarítmicos.
+
+    Retornos ausentes (como o NaN da primeira linha do ``pct_change``) contam como zero.
+    """
+    retornos = pd.DataFrame(retornos)
+    r = np.nan_to_num(retornos.to_numpy(dtype='float64'))
+    acumulado = np.exp(np.cumsum(r, axis=0)) if log else np.cumprod(1 + r, axis=0)
+    return pd.DataFrame(base * acumulado, index=retornos.index, columns=retornos.columns)
+
+
+def serie_drawdown(precos):
+    """Drawdown em cada data para cada coluna de uma matriz de preços ou patrimônio."""
+    precos = pd.DataFrame(precos)
+    p = precos.to_numpy(dtype='float64')
+    # fmax ignora NaN: datas sem preço não derrubam o máximo histórico
+    maximo = np.fmax.accumulate(p, axis=0)
+    return pd.DataFrame(p / maximo - 1, index=precos.index, columns=precos.columns)
+
+
+@medido('risco.drawdown')
+def estatisticas_drawdown(precos):
+    """Drawdown máximo e suas datas e durações para todas as colunas.
+
+    Colunas do resultado (uma linha por ativo):
+
+    - ``max_drawdown``: maior queda em relação ao máximo anterior (negativo);
+    - ``pico``, ``vale``, ``recuperacao``: datas do topo anterior, do fundo e
+      da volta ao topo (NaT se ainda não recuperou);
+    - ``duracao``: pregões do pico até a recuperação (ou até a última data);
+    - ``duracao_maxima``: maior sequência de pregões abaixo do máximo histórico.
+    """
+    precos = pd.DataFrame(precos)
+    if precos.empty:
+        raise ValueError('matriz de preços vazia')
+    p = precos.to_numpy(dtype='float64')
+    T, N = p.shape
+    datas = precos.index
+    colunas = np.arange(N)
+    linhas = np.arange(T)[:, None]
+
+    maximo = np.fmax.accumulate(p, axis=0)
+    dd = p / maximo - 1
+    # Posição do último máximo histórico em cada data
+    ultimo_pico = np.where(p >= maximo, linhas, -1)
+    np.maximum.accumulate(ultimo_pico, axis=0, out=ultimo_pico)
+
+    com_dados = ~np.isnan(dd).all(axis=0)
+    dd_sem_nan = np.where(np.isnan(dd), np.inf, dd)
+    vale = np.argmin(dd_sem_nan, axis=0)
+    max_dd = np.where(com_dados, dd_sem_nan[vale, colunas], np.nan)
+    pico = ultimo_pico[vale, colunas]
+
+    recuperado = (dd >= 0) & (linhas > vale)
+    tem_recuperacao = recuperado.any(axis=0) & (max_dd < 0)
+    recuperacao = np.where(tem_recuperacao, recuperado.argmax(axis=0), -1)
+
+    fim = np.where(tem_recuperacao, recuperacao, T - 1)
+    duracao = np.where(com_dados & (max_dd < 0), fim - pico, 0)
+    submerso = np.where(dd < 0, linhas - ultimo_pico, 0)
+    duracao_maxima = submerso.max(axis=0)
+
+    def _datas(posicoes, valido):
+        return pd.Series(datas.take(np.where(valido, posicoes, 0)), index=precos.columns).where(valido)
+
+    houve_queda = com_dados & (max_dd < 0)
+    return pd.DataFrame({
+        'max_drawdown': max_dd,
+        'pico': _datas(pico, houve_queda),
+        'vale': _datas(vale, houve_queda),
+        'recuperacao': _datas(recuperacao, tem_recuperacao),
+        'duracao': duracao,
+        'duracao_maxima': duracao_maxima,
+    }, index=precos.columns)
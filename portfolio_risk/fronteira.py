@@ -0,0 +1,114 @@
+"""Varredura da fronteira eficiente com um único problema cvxpy parametrizado.
+
+No notebook cada ``efficient_risk``/``efficient_return`` cria um novo
+``EfficientFrontier`` (In[115] e In[120]), que monta e canonicaliza o problema
+do zero. Aqui o alvo é um ``cp.Parameter``: o problema é montado e compilado
+uma vez, e cada ponto da fronteira só troca o valor do parâmetro e parte da
+solução anterior (``warm_start``).
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .restricoes import limites_ativos
+
+
+def _variavel_pesos(tickers, limites):
+    import cvxpy as cp
+
+    # Limites por ativo vão direto na variável: o custo não depende de quantos são
+    inferior, superior = limites_ativos(tickers, *limites)
+    w = cp.Variable(len(tickers), bounds=[inferior, superior])
+    return w, [cp.sum(w) == 1]
+
+
+@medido('otimizacao.varrer_fronteira')
+def varrer_fronteira(mu, cov, alvos=None, tipo='retorno', n_alvos=100, limites=(0, 1), solver=None,
+                     grupos=None):
+    """Pesos, retorno e volatilidade da carteira eficiente para cada alvo.
+
+    - ``tipo='retorno'``: mínima volatilidade com retorno >= alvo (``efficient_return``);
+    - ``tipo='volatilidade'``: máximo retorno com volatilidade <= alvo (``efficient_risk``).
+
+    ``mu`` e ``cov`` seguem a convenção do PyPortfolioOpt (anualizados), como
+    ``re`` e ``sample_cov`` do notebook. Sem ``alvos``, usa ``n_alvos`` pontos
+    igualmente espaçados entre a carteira de mínima volatilidade e a de máximo
+    retorno. Alvos inviáveis resultam em linhas NaN; se os limites e os grupos
+    não admitem carteira alguma, levanta ``ValueError``. ``limites`` é o par
+    (inferior, superior), cada um escalar, vetor ou ``{ticker: limite}``
+    (ver ``restricoes.limites_ativos``); ``grupos`` é um
+    ``restricoes.RestricoesGrupos`` com as faixas por setor/grupo.
+
+    O resultado tem uma linha por alvo com as colunas ``retorno``,
+    ``volatilidade`` e o peso de cada ativo.
+    """
+    import cvxpy as cp
+
+    if tipo not in ('retorno', 'volatilidade'):
+        raise ValueError(f"tipo deve ser 'retorno' ou 'volatilidade', recebido {tipo!r}")
+    tickers = list(cov.columns) if isinstance(cov, pd.DataFrame) else list(range(len(cov)))
+    mu_vetor = np.asarray(mu.reindex(tickers) if isinstance(mu, pd.Series) else mu, dtype='float64')
+    sigma = np.asarray(cov, dtype='float64')
+
+    w, restricoes = _variavel_pesos(tickers, limites)
+    variancia = cp.quad_form(w, cp.psd_wrap(sigma))
+    if grupos is not None:
+        if grupos.tickers != tickers:
+            raise ValueError('os tickers de grupos diferem dos da covariância')
+        if len(grupos.lado_direito):
+            restricoes.append(grupos.restricao(w))
+
+    alvo = cp.Parameter()
+    if tipo == 'retorno':
+        problema = cp.Problem(cp.Minimize(variancia), restricoes + [mu_vetor @ w >= alvo])
+    else:
+        # O parâmetro é a variância alvo: o quadrado de um parâmetro não seria DPP
+        problema = cp.Problem(cp.Maximize(mu_vetor @ w), restricoes + [variancia <= alvo])
+
+    def _resolver(problema):
+        # OSQP com warm start resolve a maioria dos alvos; perto dos extremos ele
+        # pode parar no limite de iterações, e então o alvo é refeito com Clarabel
+        tentativas = [solver] if solver is not None else [None, cp.CLARABEL]
+        for escolhido in tentativas:
+            try:
+                problema.solve(solver=escolhido, warm_start=True)
+            except cp.error.SolverError:
+                continue
+            if problema.status in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+                return np.asarray(w.value, dtype='float64')
+        return None
+
+    extremos = {}
+    if alvos is None:
+        # Extremos da fronteira: mínima volatilidade e máximo retorno. Eles entram
+        # direto no resultado, pois no limite exato o solver pode acusar inviabilidade
+        w_min = _resolver(cp.Problem(cp.Minimize(variancia), restricoes))
+        w_max = _resolver(cp.Problem(cp.Maximize(mu_vetor @ w), restricoes))
+        if w_min is None or w_max is None:
+            raise ValueError('nenhuma carteira satisfaz os limites por ativo e as restrições '
+                             'de grupo (soma dos pesos = 1); reveja limites e grupos')
+        if tipo == 'retorno':
+            inicio, fim = mu_vetor @ w_min, mu_vetor @ w_max
+        else:
+            inicio, fim = np.sqrt(w_min @ sigma @ w_min), np.sqrt(w_max @ sigma @ w_max)
+        alvos = np.linspace(inicio, fim, n_alvos)
+        extremos = {0: w_min, n_alvos - 1: w_max}
+    alvos = np.asarray(alvos, dtype='float64')
+
+    pesos = np.full((len(alvos), len(tickers)), np.nan)
+    for i, valor in enumerate(alvos):
+        if i in extremos:
+            pesos[i] = extremos[i]
+            continue
+        alvo.value = valor if tipo == 'retorno' else valor * valor
+        solucao = _resolver(problema)
+        if solucao is not None:
+            pesos[i] = solucao
+
+    retorno = pesos @ mu_vetor
+    volatilidade = np.sqrt(np.einsum('ij,jk,ik->i', pesos, sigma, pesos).clip(min=0))
+    resultado = pd.DataFrame(pesos, index=pd.Index(alvos, name='alvo'), columns=tickers)
+    resultado.insert(0, 'volatilidade', volatilidade)
+    resultado.insert(0, 'retorno', retorno)
+    return resultado
@@ -0,0 +1,183 @@
+"""Gráficos do notebook (retornos, drawdown e histograma) com poucos dados embutidos.
+
+As células In[21] e In[38] mandam todos os pontos para um ``go.Scatter``:
+com anos de dados diários de muitos tickers o HTML fica enorme e o navegador
+trava. Aqui cada série é reduzida no servidor a cerca de um ponto por pixel
+de largura, com um método que preserva a forma (LTTB ou mínimo/máximo por
+balde), e desenhada com ``go.Scattergl``. A decimação é feita para todas as
+colunas de uma vez, sobre a matriz (datas x séries).
+
+O histograma (In[11]) é agrupado em NumPy, ou em fluxo com
+``quantis.HistogramaFluxo``, e o gráfico recebe só bordas e contagens, com a
+normal ajustada e as marcas de VaR sobrepostas: o tamanho da figura não
+depende do número de amostras.
+
+As funções devolvem a ``go.Figure``; quem chama decide entre ``fig.show()``
+no notebook e ``fig.write_html(...)`` em execuções sem tela, como na CLI.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .quantis import HistogramaFluxo
+from .var import NIVEIS, var_es
+
+METODOS = ('lttb', 'minmax', None)
+
+
+def lttb(y, pontos):
+    """Posições escolhidas pelo Largest-Triangle-Three-Buckets em cada coluna de ``y``.
+
+    ``y`` é uma matriz (datas x séries) e o eixo x são as posições das linhas.
+    Devolve uma matriz de inteiros (pontos x séries), sempre com a primeira e
+    a última linha. Os baldes são percorridos em sequência, mas cada passo
+    processa todas as colunas juntas.
+    """
+    y = np.asarray(y, dtype='float64')
+    if y.ndim == 1:
+        y = y[:, None]
+    T, N = y.shape
+    if pontos >= T or pontos < 3:
+        return np.repeat(np.arange(T)[:, None], N, axis=1)
+
+    # Baldes [bordas[k], bordas[k + 1]); o último contém só a última linha
+    bordas = (np.arange(pontos - 1) * (T - 2) // (pontos - 2) + 1).astype(np.intp)
+    bordas = np.append(bordas, T)
+    valido = ~np.isnan(y)
+    soma = np.add.reduceat(np.where(valido, y, 0.0), bordas[:-1], axis=0)
+    contagem = np.add.reduceat(valido, bordas[:-1], axis=0)
+    with np.errstate(invalid='ignore'):
+        media_y = soma / contagem
+    media_x = (bordas[:-1] + bordas[1:] - 1) / 2
+
+    colunas = np.arange(N)
+    escolhidos = np.empty((pontos, N), dtype=np.intp)
+    escolhidos[0] = 0
+    escolhidos[-1] = T - 1
+    anterior = np.zeros(N, dtype=np.intp)
+    for k in range(pontos - 2):
+        inicio, fim = bordas[k], bordas[k + 1]
+        ya = y[anterior, colunas]
+        xs = np.arange(inicio, fim)[:, None]
+        # Dobro da área do triângulo (anterior, candidato, média do próximo balde)
+        area = np.abs((anterior - media_x[k + 1]) * (y[inicio:fim] - ya)
+                      - (anterior - xs) * (media_y[k + 1] - ya))
+        area[np.isnan(area)] = -1.0
+        anterior = inicio + area.argmax(axis=0)
+        escolhidos[k + 1] = anterior
+    return escolhidos
+
+
+def minmax(y, pontos):
+    """Posições do mínimo e do máximo de cada balde, em ordem, para cada coluna de ``y``.
+
+    Usa ``pontos // 2`` baldes de mesmo tamanho; picos e vales isolados (como
+    os dias de maior queda) nunca são descartados. Devolve uma matriz de
+    inteiros (pontos x séries).
+    """
+    y = np.asarray(y, dtype='float64')
+    if y.ndim == 1:
+        y = y[:, None]
+    T, N = y.shape
+    if pontos >= T or pontos < 2:
+        return np.repeat(np.arange(T)[:, None], N, axis=1)
+
+    tamanho = -(-T // (pontos // 2))
+    baldes = -(-T // tamanho)
+    blocos = np.pad(y, ((0, baldes * tamanho - T), (0, 0)),
+                    constant_values=np.nan).reshape(baldes, tamanho, N)
+    ausente = np.isnan(blocos)
+    menor = np.where(ausente, np.inf, blocos).argmin(axis=1)
+    maior = np.where(ausente, -np.inf, blocos).argmax(axis=1)
+    base = (np.arange(baldes) * tamanho)[:, None]
+    escolhidos = np.sort(np.concatenate([base + menor, base + maior]), axis=0)
+    return np.minimum(escolhidos, T - 1)
+
+
+def decimar(dados, pontos=1200, metodo='lttb'):
+    """Dicionário ``coluna -> Series`` decimada com ``metodo`` ('lttb', 'minmax' ou None)."""
+    if metodo not in METODOS:
+        raise ValueError(f'metodo deve ser um de {METODOS}, recebido {metodo!r}')
+    dados = pd.DataFrame(dados)
+    valores = dados.to_numpy(dtype='float64')
+    if metodo is None or pontos >= len(dados):
+        return {c: dados[c] for c in dados.columns}
+    escolhidos = (lttb if metodo == 'lttb' else minmax)(valores, pontos)
+    return {c: pd.Series(valores[escolhidos[:, j], j], index=dados.index[escolhidos[:, j]], name=c)
+            for j, c in enumerate(dados.columns)}
+
+
+@medido('grafico.series')
+def grafico_series(dados, titulo, eixo_y, largura=1200, metodo='lttb'):
+    """Uma linha ``Scattergl`` por coluna, com no máximo ``largura`` pontos cada."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for coluna, serie in decimar(dados, largura, metodo).items():
+        fig.add_trace(go.Scattergl(x=serie.index, y=serie.to_numpy(), mode='lines',
+                                   name=str(coluna)))
+    fig.update_layout(title=titulo, xaxis_title='Data', yaxis_title=eixo_y)
+    return fig
+
+
+def grafico_retornos(retornos, titulo='Retornos diários', largura=1200, metodo='minmax'):
+    """Uma linha por ativo com os retornos (In[21]).
+
+    O padrão é ``minmax``, que mantém os dias extremos de cada balde.
+    """
+    return grafico_series(retornos, titulo, 'Retorno', largura, metodo)
+
+
+def grafico_drawdown(drawdown, titulo='Drawdown', largura=1200, metodo='lttb'):
+    """Uma linha por ativo com o drawdown (In[38])."""
+    return grafico_series(drawdown, titulo, 'Drawdown', largura, metodo)
+
+
+@medido('grafico.distribuicao')
+def grafico_distribuicao(contagens, bordas, media=None, desvio=None, var=None,
+                         titulo='Distribuição dos retornos'):
+    """Barras de um histograma já agrupado, com normal ajustada e marcas de VaR.
+
+    ``var`` é um dicionário ou Series ``nivel -> VaR``; com ``media`` e
+    ``desvio`` a densidade normal é desenhada na escala das contagens.
+    """
+    import plotly.graph_objects as go
+
+    contagens = np.asarray(contagens)
+    bordas = np.asarray(bordas, dtype='float64')
+    larguras = np.diff(bordas)
+    fig = go.Figure(go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagens, width=larguras,
+                           name='Frequência', marker_line_width=0))
+    if media is not None and desvio:
+        x = np.linspace(bordas[0], bordas[-1], 400)
+        densidade = np.exp(-0.5 * ((x - media) / desvio) ** 2) / (desvio * np.sqrt(2 * np.pi))
+        fig.add_trace(go.Scatter(x=x, y=densidade * contagens.sum() * larguras.mean(), mode='lines',
+                                 name='Normal ajustada'))
+    for nivel, valor in ({} if var is None else dict(var)).items():
+        fig.add_vline(x=valor, line_dash='dash', annotation_text=f'VaR {nivel:.0%}')
+    fig.update_layout(title=titulo, xaxis_title='Retorno', yaxis_title='Frequência', bargap=0)
+    return fig
+
+
+def grafico_histograma(amostras, baldes=100, niveis=NIVEIS, titulo='Distribuição dos retornos',
+                       var=None):
+    """Histograma (In[11]) de um array ou de um ``HistogramaFluxo`` já alimentado.
+
+    Um array é agrupado com ``np.histogram`` e o VaR vem de ``var.var_es``;
+    para milhões de amostras simuladas, alimente um ``HistogramaFluxo`` bloco
+    a bloco (ex.: com ``montecarlo.gerar_blocos``) e passe-o no lugar do array:
+    o VaR vem do t-digest dele. ``var`` (``nivel -> VaR``) substitui as marcas
+    calculadas, por exemplo pelas de ``var_monte_carlo``.
+    """
+    if isinstance(amostras, HistogramaFluxo):
+        h = amostras
+        if var is None:
+            var = h.var_es(niveis)['VaR']
+        return grafico_distribuicao(h.contagens, h.bordas, h.media, h.desvio, var, titulo)
+    a = np.asarray(amostras, dtype='float64').ravel()
+    a = a[~np.isnan(a)]
+    contagens, bordas = np.histogram(a, bins=baldes)
+    if var is None:
+        var = var_es(a, niveis)['VaR']
+    return grafico_distribuicao(contagens, bordas, a.mean(), a.std(), var, titulo)
@@ -0,0 +1,179 @@
+"""Medição opcional do tempo e da memória de cada etapa do pipeline.
+
+Desligada por padrão: ``etapa`` devolve um contexto vazio e ``medido`` chama a
+função direto, então o custo é só o teste de uma variável. Ligada (com
+``ativar`` ou a variável de ambiente ``PORTFOLIO_RISK_PERFIL``), cada etapa
+registra tempo de parede, tempo de CPU, pico de memória (``tracemalloc``) e os
+tamanhos dos arrays envolvidos, exportáveis em JSON ou JSON Lines.
+
+Ex.: medir a otimização e o gráfico do notebook::
+
+    from portfolio_risk import instrumentacao as inst
+
+    inst.ativar('perfil.jsonl')
+    with inst.etapa('otimizacao.max_sharpe', ativos=len(re)):
+        msharpe.max_sharpe(risk_free_rate=selic_aa)
+    with inst.etapa('grafico.drawdown'):
+        fig.show()
+
+A pilha de etapas abertas fica em uma ``ContextVar``: cada tarefa asyncio (e
+cada ``asyncio.to_thread``) tem a sua, então etapas que atravessam um
+``await`` em tarefas simultâneas registram o pai certo. O pico de memória vem
+do ``tracemalloc``, que é do processo inteiro: com etapas simultâneas ele
+inclui as alocações das outras tarefas.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+_ATIVO = False
+_DESTINO = None
+_REGISTROS = []
+_PILHA = contextvars.ContextVar('portfolio_risk_etapas', default=())
+_VAZIO = nullcontext()
+
+
+def ativar(destino=None):
+    """Liga a medição; com ``destino`` cada etapa é anexada ao arquivo JSON Lines."""
+    global _ATIVO, _DESTINO
+    _ATIVO, _DESTINO = True, destino
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def desativar():
+    """Desliga a medição (os registros já feitos são mantidos)."""
+    global _ATIVO
+    _ATIVO = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def ativo():
+    return _ATIVO
+
+
+def registros():
+    """Lista dos registros das etapas, na ordem em que terminaram."""
+    return list(_REGISTROS)
+
+
+def limpar():
+    _REGISTROS.clear()
+
+
+def tamanho(obj):
+    """Forma e bytes de arrays, DataFrames e Series; ``None`` para outros objetos."""
+    forma = getattr(obj, 'shape', None)
+    if forma is None:
+        return None
+    nbytes = getattr(obj, 'nbytes', None)
+    if nbytes is None and hasattr(obj, 'memory_usage'):
+        nbytes = int(obj.memory_usage(index=False, deep=False).sum())
+    return {'forma': list(forma), 'bytes': None if nbytes is None else int(nbytes)}
+
+
+class _Etapa:
+    def __init__(self, nome, info):
+        self.nome = nome
+        self.info = info
+        self.tamanhos = {}
+        self.pico_filhos = 0
+
+    def registrar(self, rotulo, obj):
+        """Anota o tamanho de um array usado ou produzido pela etapa."""
+        medida = tamanho(obj)
+        if medida is not None:
+            self.tamanhos[rotulo] = medida
+
+    def __enter__(self):
+        atual, pico = tracemalloc.get_traced_memory()
+        pilha = _PILHA.get()
+        if pilha:
+            # reset_peak apaga o pico da etapa externa: ele é repassado antes
+            pilha[-1].pico_filhos = max(pilha[-1].pico_filhos, pico)
+        tracemalloc.reset_peak()
+        self.memoria_inicial = atual
+        self.nivel = len(pilha)
+        self.pai = pilha[-1].nome if pilha else None
+        self._ficha = _PILHA.set(pilha + (self,))
+        self.inicio = time.time()
+        self.cpu = time.process_time()
+        self.parede = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        parede = time.perf_counter() - self.parede
+        cpu = time.process_time() - self.cpu
+        _, pico = tracemalloc.get_traced_memory()
+        pico = max(pico, self.pico_filhos)
+        _PILHA.reset(self._ficha)
+        pilha = _PILHA.get()
+        if pilha:
+            pilha[-1].pico_filhos = max(pilha[-1].pico_filhos, pico)
+        registro = {
+            'etapa': self.nome,
+            'inicio': self.inicio,
+            'tempo_parede': parede,
+            'tempo_cpu': cpu,
+            'pico_memoria': max(pico - self.memoria_inicial, 0),
+            'tamanhos': self.tamanhos,
+            'pai': self.pai,
+            'nivel': self.nivel,
+            'erro': erro[0].__name__ if erro[0] is not None else None,
+            **self.info,
+        }
+        _REGISTROS.append(registro)
+        if _DESTINO:
+            with open(_DESTINO, 'a') as f:
+                f.write(json.dumps(registro, default=str) + '\n')
+        return False
+
+
+def etapa(nome, **info):
+    """Contexto que mede o bloco como a etapa ``nome``; ``info`` vai junto no registro."""
+    if not _ATIVO:
+        return _VAZIO
+    return _Etapa(nome, info)
+
+
+def medido(nome):
+    """Decorador que mede cada chamada da função como a etapa ``nome``.
+
+    Os tamanhos do primeiro argumento posicional e do resultado são anotados.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def embrulho(*args, **kwargs):
+            if not _ATIVO:
+                return funcao(*args, **kwargs)
+            with _Etapa(nome, {}) as medicao:
+                if args:
+                    medicao.registrar('entrada', args[0])
+                resultado = funcao(*args, **kwargs)
+                medicao.registrar('saida', resultado)
+            return resultado
+        return embrulho
+    return decorador
+
+
+def exportar_json(caminho):
+    """Grava todos os registros em um único arquivo JSON."""
+    with open(caminho, 'w') as f:
+        json.dump(_REGISTROS, f, indent=1, default=str)
+
+
+def exportar_jsonl(caminho):
+    """Grava todos os registros em JSON Lines, um por linha."""
+    with open(caminho, 'w') as f:
+        for registro in _REGISTROS:
+            f.write(json.dumps(registro, default=str) + '\n')
+
+
+if os.environ.get('PORTFOLIO_RISK_PERFIL'):
+    ativar(os.environ['PORTFOLIO_RISK_PERFIL'])
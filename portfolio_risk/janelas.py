@@ -0,0 +1,100 @@
+"""Métricas de risco em janelas móveis para todo o universo de ativos.
+
+Volatilidade, VaR paramétrico, semidesvio e beta são calculados para cada
+data a partir de somas acumuladas (``np.cumsum``): a soma de uma janela é a
+diferença entre duas somas acumuladas, então cada passo custa O(1) e o total
+é O(T·N) por métrica, independente do tamanho da janela.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .var import NIVEIS
+
+
+def _soma_movel(x, janela):
+    # Soma de cada janela como diferença de somas acumuladas, ao longo das linhas
+    acumulada = np.cumsum(x, axis=0)
+    acumulada[janela:] -= acumulada[:-janela].copy()
+    return acumulada
+
+
+def _momentos(r, validos, janela, ddof):
+    n = _soma_movel(validos.astype('float64'), janela)
+    s1 = _soma_movel(r, janela)
+    s2 = _soma_movel(r * r, janela)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = s1 / n
+        variancia = (s2 - n * media * media) / (n - ddof)
+    # Erros de arredondamento podem deixar a variância levemente negativa
+    np.maximum(variancia, 0.0, out=variancia)
+    return n, media, variancia
+
+
+@medido('risco.metricas_moveis')
+def metricas_moveis(retornos, janelas=(63, 252), mercado=None, niveis=NIVEIS, ddof=0):
+    """Painel das métricas de risco em janelas móveis para todas as colunas de ``retornos``.
+
+    - ``volatilidade``: desvio-padrão dos retornos (``ddof=0`` como ``np.std``);
+    - ``semidesvio``: raiz da média dos quadrados dos retornos negativos;
+    - ``var_90``, ``var_95``, ...: VaR paramétrico normal ``media + z * volatilidade``;
+    - ``beta``: cov(ativo, mercado) / var(mercado), se ``mercado`` for informado.
+
+    Uma janela só é calculada quando todas as suas observações existem.
+    O resultado tem uma linha por (janela, data, ativo) e uma coluna por métrica.
+    """
+    from scipy.stats import norm
+
+    retornos = pd.DataFrame(retornos)
+    r = retornos.to_numpy(dtype='float64', copy=True)
+    validos = ~np.isnan(r)
+    # Centralizar antes das somas acumuladas reduz o cancelamento numérico
+    centro = np.nanmean(r, axis=0)
+    r -= centro
+    r[~validos] = 0.0
+    negativos = np.minimum(r + centro, 0.0)
+    negativos[~validos] = 0.0
+
+    if mercado is not None:
+        m = pd.Series(mercado).reindex(retornos.index).to_numpy(dtype='float64')
+        m_validos = ~np.isnan(m)
+        m = np.where(m_validos, m - np.nanmean(m), 0.0)[:, None]
+        pares = validos & m_validos[:, None]
+        rm = np.where(pares, r, 0.0)
+        mm = np.where(pares, m, 0.0)
+
+    z = norm.ppf(1 - np.asarray(niveis))
+    T, N = r.shape
+    paineis = []
+    for janela in janelas:
+        n, media, variancia = _momentos(r, validos, janela, ddof)
+        completo = n >= janela
+        volatilidade = np.sqrt(variancia)
+        colunas = {
+            'volatilidade': volatilidade,
+            'semidesvio': np.sqrt(_soma_movel(negativos * negativos, janela) / janela),
+        }
+        for nivel, zq in zip(niveis, z):
+            colunas[f'var_{round(nivel * 100)}'] = media + centro + zq * volatilidade
+        if mercado is not None:
+            n_par = _soma_movel(pares.astype('float64'), janela)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                media_r = _soma_movel(rm, janela) / n_par
+                media_m = _soma_movel(mm, janela) / n_par
+                cov = _soma_movel(rm * mm, janela) / n_par - media_r * media_m
+                var_m = _soma_movel(mm * mm, janela) / n_par - media_m * media_m
+                colunas['beta'] = np.where(n_par >= janela, cov / var_m, np.nan)
+
+        inicio = min(janela - 1, T)
+        datas = retornos.index[inicio:]
+        # Índice montado direto pelos códigos, sem fatorar milhões de rótulos
+        indice = pd.MultiIndex(
+            levels=[[janela], datas, retornos.columns],
+            codes=[np.zeros(len(datas) * N, dtype=np.intp),
+                   np.repeat(np.arange(len(datas)), N), np.tile(np.arange(N), len(datas))],
+            names=['janela', 'Date', 'ativo'], verify_integrity=False)
+        dados = {nome: np.where(completo, valores, np.nan)[inicio:].ravel()
+                 for nome, valores in colunas.items()}
+        paineis.append(pd.DataFrame(dados, index=indice))
+    return pd.concat(paineis)
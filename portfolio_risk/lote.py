@@ -0,0 +1,248 @@
+"""Relatórios de risco em lote para centenas de carteiras definidas em arquivo.
+
+No notebook a carteira é fixa no código (``ativos = [...]`` em In[72] e o
+``sector_mapper`` em In[132]). Aqui um arquivo JSON define as carteiras; o
+universo (união dos tickers de todas) é carregado uma vez, e retornos,
+covariância, betas e retornos esperados são calculados uma única vez sobre
+ele. Cada carteira usa apenas fatias desses arrays, e as métricas de todas as
+carteiras saem de um único produto ``retornos @ pesos`` (datas x carteiras).
+
+Formato do arquivo::
+
+    {
+      "inicio": "2017-01-01", "fim": "2024-01-01", "mercado": "^BVSP",
+      "taxa_livre": 0.1, "niveis": [0.9, 0.95, 0.99],
+      "setores": {"ITUB3.SA": "Financeiro", "VALE3.SA": "Materiais"},
+      "carteiras": [
+        {"nome": "cliente_1", "pesos": {"ITUB3.SA": 0.6, "VALE3.SA": 0.4}},
+        {"nome": "cliente_2", "ativos": ["ITUB3.SA", "VALE3.SA", "WEGE3.SA"],
+         "objetivo": "max_sharpe", "limites": [0, {"VALE3.SA": 0.2, "WEGE3.SA": 0.3}],
+         "setor_min": {"Financeiro": 0.1}, "setor_max": {"Materiais": 0.3}}
+      ]
+    }
+
+``setores`` pode ficar no topo (compartilhado) ou em cada carteira. Em
+``limites`` (inferior, superior) cada lado é um número ou ``{ticker: limite}``
+(os demais ativos ficam entre 0 e 1). A
+covariância (``"covariancia"``: ``ledoit_wolf`` ou ``amostral``) é estimada
+para o universo e fatiada por carteira; no Ledoit-Wolf a intensidade de
+encolhimento é, portanto, a do universo, e não a de cada carteira isolada.
+
+Como o Ledoit-Wolf usa só os dias em que todo o universo tem retorno, um
+ticker sem preços (ou listado no meio do período) encurtaria o histórico de
+todas as carteiras. Por isso tickers com preço em menos de
+``"cobertura_minima"`` (fração dos dias, padrão 0.9) ficam fora do universo, e
+as carteiras que os usam saem do relatório com NaN nas métricas e o motivo
+na coluna ``erro``. O mesmo vale para uma carteira cuja otimização falha
+(limites ou faixas setoriais inviáveis): as demais seguem normalmente.
+"""
+
+import json
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .capm import regressao_capm
+from .covariancia import CovarianciaIncremental
+from .dados import calcular_retornos, carregar_precos
+from .drawdown import estatisticas_drawdown, riqueza
+from .instrumentacao import etapa, medido
+from .relatorio import OBJETIVOS, _sufixo, otimizar_estimativas
+from .restricoes import RestricoesGrupos
+from .var import NIVEIS, retornos_carteiras, var_es_matriz
+
+COVARIANCIAS = ('ledoit_wolf', 'amostral')
+COBERTURA_MINIMA = 0.9
+_COM_ALVO = ('efficient_risk', 'efficient_return')
+
+
+def ler_configuracao(caminho):
+    """Lê e valida o arquivo JSON de carteiras."""
+    with open(caminho) as f:
+        config = json.load(f)
+    for chave in ('inicio', 'fim', 'carteiras'):
+        if chave not in config:
+            raise ValueError(f'configuração sem {chave!r}')
+    nomes = set()
+    for i, carteira in enumerate(config['carteiras']):
+        nome = carteira.setdefault('nome', f'carteira_{i}')
+        if nome in nomes:
+            raise ValueError(f'carteira repetida: {nome!r}')
+        nomes.add(nome)
+        if ('pesos' in carteira) == ('objetivo' in carteira):
+            raise ValueError(f'carteira {nome!r}: informe pesos ou objetivo (um dos dois)')
+        if 'objetivo' in carteira:
+            if carteira['objetivo'] not in OBJETIVOS:
+                raise ValueError(f'carteira {nome!r}: objetivo deve ser um de {OBJETIVOS}')
+            if not carteira.get('ativos'):
+                raise ValueError(f'carteira {nome!r}: objetivo sem lista de ativos')
+            alvo = carteira.get('alvo')
+            if carteira['objetivo'] in _COM_ALVO and (
+                    not isinstance(alvo, (int, float)) or isinstance(alvo, bool)):
+                raise ValueError(f"carteira {nome!r}: {carteira['objetivo']} requer alvo numérico")
+    if config.get('covariancia', 'ledoit_wolf') not in COVARIANCIAS:
+        raise ValueError(f'covariancia deve ser uma de {COVARIANCIAS}')
+    return config
+
+
+def _tickers(carteira):
+    return list(carteira['pesos']) if 'pesos' in carteira else list(carteira['ativos'])
+
+
+def _sem_cobertura(precos, carteiras, minimo):
+    # {nome da carteira: motivo} das carteiras com algum ticker sem preços suficientes
+    cobertura = precos.notna().mean().fillna(0.0)
+    erros = {}
+    for carteira in carteiras:
+        faltam = [t for t in _tickers(carteira) if cobertura[t] < minimo]
+        if faltam:
+            erros[carteira['nome']] = 'preços insuficientes: ' + ', '.join(
+                f'{t} ({cobertura[t]:.0%} dos dias)' for t in faltam)
+    return erros
+
+
+def _covariancia(precos, retornos, estimador):
+    if estimador == 'amostral':
+        # Covariância par a par, como risk_models.sample_cov (tolera históricos de tamanhos diferentes)
+        return retornos.cov() * 252
+    # Ledoit-Wolf sobre os dias em que todo o universo tem retorno
+    return CovarianciaIncremental.de_precos(precos).ledoit_wolf()
+
+
+def _restricoes_setoriais(setores, minimo, maximo):
+    def restricoes(ef):
+        RestricoesGrupos({'setor': setores}, ef.tickers, {'setor': minimo}, {'setor': maximo}).aplicar(ef)
+    return restricoes
+
+
+def _retornos_esperados(precos, mercado, taxa_livre, cache):
+    parametros = {'market_prices': None if mercado is None else mercado.to_frame(),
+                  'risk_free_rate': taxa_livre}
+    if cache is not None:
+        return cache.estimar('capm_return', precos, **parametros)
+    from pypfopt import expected_returns
+
+    with etapa('estimativas.capm_return'):
+        return expected_returns.capm_return(precos, **parametros)
+
+
+@medido('lote.relatorios')
+def relatorios_lote(config, fonte=None, cache=None):
+    """Relatório de risco de todas as carteiras de ``config`` em uma execução.
+
+    ``config`` é o dicionário de ``ler_configuracao``; ``fonte`` é repassada a
+    ``carregar_precos`` e ``cache`` (um ``CacheEstimativas``) memoriza os
+    retornos esperados entre execuções. Devolve ``(resumo, pesos)``: uma
+    linha por carteira com as métricas de risco e a matriz de pesos
+    (carteiras x ativos do universo). Carteiras com tickers sem preços
+    suficientes ou cuja otimização falha ficam com NaN e o motivo em
+    ``erro``; se nenhuma sobra, a execução termina com ``ValueError``.
+    """
+    todas = config['carteiras']
+    niveis = tuple(config.get('niveis', NIVEIS))
+    taxa_livre = config.get('taxa_livre', 0.0)
+    nome_mercado = config.get('mercado')
+    universo = list(dict.fromkeys(t for c in todas for t in _tickers(c)))
+
+    # Etapas compartilhadas: uma vez para o universo inteiro
+    todos = universo + [nome_mercado] if nome_mercado else universo
+    precos = carregar_precos(todos, config['inicio'], config['fim'], fonte=fonte)
+    mercado = precos[nome_mercado] if nome_mercado else None
+    erros = _sem_cobertura(precos[universo], todas, config.get('cobertura_minima', COBERTURA_MINIMA))
+    carteiras = [c for c in todas if c['nome'] not in erros]
+    if not carteiras:
+        raise ValueError('nenhuma carteira com preços suficientes: ' + '; '.join(
+            f'{nome}: {motivo}' for nome, motivo in erros.items()))
+    universo = list(dict.fromkeys(t for c in carteiras for t in _tickers(c)))
+    posicao = {t: i for i, t in enumerate(universo)}
+    precos = precos[universo]
+    retornos = calcular_retornos(precos)
+    R = retornos.to_numpy()
+    cov = _covariancia(precos, retornos, config.get('covariancia', 'ledoit_wolf')).to_numpy()
+    betas = None
+    if mercado is not None:
+        betas = regressao_capm(retornos, calcular_retornos(mercado.to_frame()).iloc[:, 0])['beta']
+        betas = betas.to_numpy()
+    re = None
+    if any('objetivo' in c for c in carteiras):
+        re = _retornos_esperados(precos, mercado, taxa_livre, cache)
+        import cvxpy as cp
+        from pypfopt.exceptions import OptimizationError
+
+        falhas_otimizacao = (ValueError, OptimizationError, cp.error.SolverError)
+
+    W = np.zeros((len(universo), len(carteiras)))
+    for j, carteira in enumerate(carteiras):
+        tickers = _tickers(carteira)
+        indices = [posicao[t] for t in tickers]
+        if 'pesos' in carteira:
+            W[indices, j] = [carteira['pesos'][t] for t in tickers]
+            continue
+        setores = carteira.get('setores', config.get('setores'))
+        restricoes = None
+        if setores and (carteira.get('setor_min') or carteira.get('setor_max')):
+            restricoes = _restricoes_setoriais(setores, carteira.get('setor_min', {}),
+                                               carteira.get('setor_max', {}))
+        try:
+            otima = otimizar_estimativas(
+                re.iloc[indices],
+                pd.DataFrame(cov[np.ix_(indices, indices)], index=tickers, columns=tickers),
+                carteira['objetivo'], taxa_livre, carteira.get('alvo'),
+                carteira.get('limites', (0, 1)), restricoes)
+        except falhas_otimizacao as erro:
+            # Limites ou faixas setoriais inviáveis afetam só esta carteira
+            erros[carteira['nome']] = f'otimização falhou: {type(erro).__name__}: {erro}'
+            continue
+        W[indices, j] = [otima['pesos'][t] for t in tickers]
+    otimizadas = [j for j, c in enumerate(carteiras) if c['nome'] not in erros]
+    if not otimizadas:
+        raise ValueError('nenhuma carteira pôde ser avaliada: ' + '; '.join(
+            f'{nome}: {motivo}' for nome, motivo in erros.items()))
+    carteiras, W = [carteiras[j] for j in otimizadas], W[:, otimizadas]
+
+    with etapa('lote.metricas', carteiras=len(carteiras), ativos=len(universo)):
+        # Retornos de todas as carteiras de uma vez; a data fica ausente se
+        # algum ativo com peso na carteira não tem retorno naquele dia
+        Rp = retornos_carteiras(R, W)
+        nomes = [c['nome'] for c in carteiras]
+        media = np.nanmean(Rp, axis=0)
+        volatilidade = np.sqrt(((cov @ W) * W).sum(axis=0))
+        colunas = {
+            'objetivo': [c.get('objetivo') for c in carteiras],
+            'n_ativos': (W != 0).sum(axis=0),
+            'retorno_anual': media * 252,
+            'volatilidade_anual': volatilidade,
+            'sharpe': (media * 252 - taxa_livre) / volatilidade,
+        }
+        historico = var_es_matriz(Rp, niveis)
+        for nivel in niveis:
+            colunas[f'var_historico_{_sufixo(nivel)}'] = historico['VaR'][nivel].to_numpy()
+            colunas[f'es_historico_{_sufixo(nivel)}'] = historico['ES'][nivel].to_numpy()
+            z = NormalDist().inv_cdf(1 - nivel)
+            colunas[f'var_parametrico_{_sufixo(nivel)}'] = media + z * volatilidade / np.sqrt(252)
+        if betas is not None:
+            colunas['beta'] = np.nan_to_num(betas) @ W
+        patrimonio = riqueza(pd.DataFrame(Rp, index=retornos.index, columns=nomes))
+        colunas['max_drawdown'] = estatisticas_drawdown(patrimonio)['max_drawdown'].to_numpy()
+
+    resumo = pd.DataFrame(colunas, index=pd.Index(nomes, name='carteira'))
+    pesos = pd.DataFrame(W.T, index=resumo.index, columns=universo)
+    indice = pd.Index([c['nome'] for c in todas], name='carteira')
+    resumo = resumo.reindex(indice)
+    resumo['objetivo'] = [c.get('objetivo') for c in todas]
+    resumo['erro'] = pd.Series(erros, dtype='object').reindex(indice)
+    return resumo, pesos.reindex(indice, fill_value=0.0)
+
+
+def gravar_relatorios(resumo, pesos, diretorio):
+    """Grava ``resumo.csv``, ``pesos.csv`` e ``relatorios.json`` (um objeto por carteira)."""
+    os.makedirs(diretorio, exist_ok=True)
+    resumo.to_csv(os.path.join(diretorio, 'resumo.csv'))
+    pesos.to_csv(os.path.join(diretorio, 'pesos.csv'))
+    relatorios = json.loads(resumo.to_json(orient='index'))
+    for nome, linha in pesos.iterrows():
+        relatorios[nome]['pesos'] = {t: p for t, p in linha.items() if p != 0}
+    with open(os.path.join(diretorio, 'relatorios.json'), 'w') as f:
+        json.dump(relatorios, f, indent=1, ensure_ascii=False)
@@ -0,0 +1,164 @@
+"""Memoização das estimativas de retorno esperado e covariância.
+
+``expected_returns.capm_return`` e ``CovarianceShrinkage(df).ledoit_wolf()``
+(In[92] e In[94]) são recalculados a cada execução a partir dos mesmos preços.
+``CacheEstimativas`` guarda o resultado sob uma chave derivada do conteúdo:
+o hash da matriz de preços, o nome do estimador e os parâmetros. Há um LRU em
+memória e, opcionalmente, um armazenamento em disco com limite de tamanho.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import etapa
+
+
+def hash_dados(obj):
+    """Hash do conteúdo de um DataFrame/Series/array (valores, índice e colunas)."""
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        valores = obj.to_numpy()
+        if valores.dtype == object:
+            # tobytes() de um array de objetos teria só os ponteiros
+            valores = pd.util.hash_pandas_object(obj, index=False).to_numpy()
+        h.update(np.ascontiguousarray(valores).tobytes())
+        h.update(pd.util.hash_pandas_object(obj.index, index=False).to_numpy().tobytes())
+        nomes = obj.columns if isinstance(obj, pd.DataFrame) else [obj.name]
+        h.update(repr(list(nomes)).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode() + str(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    else:
+        h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+def _estimadores():
+    from pypfopt import expected_returns, risk_models
+
+    return {
+        'mean_historical_return': expected_returns.mean_historical_return,
+        'ema_historical_return': expected_returns.ema_historical_return,
+        'capm_return': expected_returns.capm_return,
+        'sample_cov': risk_models.sample_cov,
+        'semicovariance': risk_models.semicovariance,
+        'exp_cov': risk_models.exp_cov,
+        'ledoit_wolf': lambda precos, **kw: risk_models.CovarianceShrinkage(precos, **kw).ledoit_wolf(),
+    }
+
+
+class CacheEstimativas:
+    """Cache das estimativas indexado pelo conteúdo dos preços, estimador e parâmetros.
+
+    ``tamanho_maximo`` é o número de resultados mantidos em memória (LRU).
+    Com ``diretorio``, os resultados também são gravados em disco e os mais
+    antigos são apagados quando o total passa de ``limite_disco`` bytes.
+
+    Ex.: no lugar de In[92] e In[94]::
+
+        cache = CacheEstimativas()
+        re = cache.estimar('capm_return', df, market_prices=ibov, risk_free_rate=selic_diaria)
+        sample_cov = cache.estimar('ledoit_wolf', df)
+    """
+
+    def __init__(self, tamanho_maximo=128, diretorio=None, limite_disco=1 << 30):
+        self.tamanho_maximo = tamanho_maximo
+        self.diretorio = None if diretorio is None else str(diretorio)
+        self.limite_disco = limite_disco
+        self.estimadores = {}
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok=True)
+
+    def registrar(self, nome, funcao):
+        """Adiciona um estimador ``funcao(precos, **parametros)`` ao cache."""
+        self.estimadores[nome] = funcao
+
+    def _funcao(self, nome):
+        if nome not in self.estimadores:
+            self.estimadores.update({k: v for k, v in _estimadores().items()
+                                     if k not in self.estimadores})
+        if nome not in self.estimadores:
+            raise KeyError(f'estimador desconhecido: {nome!r}')
+        return self.estimadores[nome]
+
+    def chave(self, nome, precos, **parametros):
+        """Chave do resultado: hash dos preços + nome do estimador + parâmetros."""
+        partes = [nome, hash_dados(precos)]
+        partes += [f'{k}={hash_dados(v)}' for k, v in sorted(parametros.items())]
+        return hashlib.blake2b('|'.join(partes).encode(), digest_size=20).hexdigest()
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + '.pkl')
+
+    def _ler_disco(self, chave):
+        if not self.diretorio or not os.path.exists(self._arquivo(chave)):
+            return None
+        with open(self._arquivo(chave), 'rb') as f:
+            valor = pickle.load(f)
+        # A data de modificação marca o último uso para a remoção dos mais antigos
+        os.utime(self._arquivo(chave))
+        return valor
+
+    def _gravar_disco(self, chave, valor):
+        caminho = self._arquivo(chave)
+        with open(caminho + '.tmp', 'wb') as f:
+            pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho + '.tmp', caminho)
+
+        arquivos = [os.path.join(self.diretorio, a) for a in os.listdir(self.diretorio)
+                    if a.endswith('.pkl')]
+        info = sorted((os.stat(a).st_mtime, os.stat(a).st_size, a) for a in arquivos)
+        total = sum(tamanho for _, tamanho, _ in info)
+        for _, tamanho, arquivo in info:
+            if total <= self.limite_disco or arquivo == caminho:
+                break
+            os.remove(arquivo)
+            total -= tamanho
+
+    def _guardar_memoria(self, chave, valor):
+        self._memoria[chave] = valor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.tamanho_maximo:
+            self._memoria.popitem(last=False)
+
+    def estimar(self, nome, precos, **parametros):
+        """Resultado de ``nome(precos, **parametros)``, calculado só na primeira vez."""
+        chave = self.chave(nome, precos, **parametros)
+        with self._lock:
+            valor = self._memoria.get(chave)
+            if valor is not None:
+                self._memoria.move_to_end(chave)
+            else:
+                valor = self._ler_disco(chave)
+                if valor is not None:
+                    self._guardar_memoria(chave, valor)
+        if valor is None:
+            self.falhas += 1
+            with etapa('estimativas.' + nome) as medicao:
+                valor = self._funcao(nome)(precos, **parametros)
+                if medicao is not None:
+                    medicao.registrar('precos', precos)
+            with self._lock:
+                self._guardar_memoria(chave, valor)
+                if self.diretorio:
+                    self._gravar_disco(chave, valor)
+        else:
+            self.acertos += 1
+        # Cópia para que alterações do chamador não contaminem o cache
+        return valor.copy() if hasattr(valor, 'copy') else valor
+
+    def limpar(self):
+        """Esvazia o cache em memória (o disco é mantido)."""
+        with self._lock:
+            self._memoria.clear()
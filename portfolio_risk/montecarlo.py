@@ -0,0 +1,195 @@
+"""Simulação de Monte Carlo aplicada ao VaR.
+
+Versão vetorizada do loop do notebook (In[65]–In[69]): os caminhos são
+gerados em blocos de tamanho fixo (caminhos x dias) com ``numpy.random.Generator``
+e cada bloco é reduzido ao retorno acumulado de cada caminho no próprio buffer,
+de modo que a memória fica limitada a ``tamanho_bloco * horizonte`` números
+mais um retorno por caminho.
+
+Para carteiras, os choques de todos os ativos são correlacionados pelo fator
+(Cholesky ou autovetores) da matriz de covariância de Ledoit-Wolf e os blocos
+são distribuídos em um pool de processos.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .quantis import TDigest, var_es_fluxo
+from .var import NIVEIS, var_es
+
+
+def gerar_blocos(media, volatilidade, horizonte=1, n_caminhos=100_000,
+                 tamanho_bloco=50_000, seed=None, composto=True):
+    """Gera, bloco a bloco, o retorno acumulado no ``horizonte`` de cada caminho.
+
+    Os retornos diários seguem uma normal(``media``, ``volatilidade``), como no
+    notebook. Com ``composto=True`` o retorno do caminho é ``prod(1 + r) - 1``;
+    caso contrário é a soma dos retornos diários (adequado para log-retornos).
+    O array devolvido é reaproveitado entre blocos: copie-o se precisar guardá-lo.
+    """
+    rng = np.random.default_rng(seed)
+    bloco = np.empty((min(tamanho_bloco, n_caminhos), horizonte))
+    saida = np.empty(bloco.shape[0])
+    for inicio in range(0, n_caminhos, bloco.shape[0]):
+        n = min(bloco.shape[0], n_caminhos - inicio)
+        buf, acumulado = bloco[:n], saida[:n]
+        rng.standard_normal(out=buf)
+        buf *= volatilidade
+        buf += media
+        if composto:
+            # Perda máxima de 100% por dia; soma dos log(1 + r) evita o produto
+            np.maximum(buf, -1.0, out=buf)
+            np.log1p(buf, out=buf)
+        buf.sum(axis=1, out=acumulado)
+        if composto:
+            np.expm1(acumulado, out=acumulado)
+        yield acumulado
+
+
+def simular_retornos(media, volatilidade, horizonte=1, n_caminhos=100_000,
+                     tamanho_bloco=50_000, seed=None, composto=True):
+    """Retorno acumulado no ``horizonte`` (em pregões) de todos os caminhos simulados."""
+    blocos = gerar_blocos(media, volatilidade, horizonte, n_caminhos, tamanho_bloco, seed, composto)
+    return np.concatenate([b.copy() for b in blocos]) if n_caminhos else np.empty(0)
+
+
+@medido('risco.monte_carlo')
+def var_monte_carlo(media, volatilidade, horizonte=1, n_caminhos=100_000, niveis=NIVEIS,
+                    tamanho_bloco=50_000, seed=None, composto=True, exato=True):
+    """VaR e ES por simulação de Monte Carlo para vários níveis de confiança.
+
+    Equivalente ao cálculo do notebook com ``media`` e ``volatilidade_diaria``::
+
+        var_monte_carlo(media, volatilidade_diaria, horizonte=1, n_caminhos=1_000_000)
+
+    Com ``exato=False`` os blocos alimentam um t-digest e nenhum retorno
+    simulado é guardado: a memória não cresce com ``n_caminhos``.
+    """
+    if not exato:
+        return var_es_fluxo(gerar_blocos(media, volatilidade, horizonte, n_caminhos,
+                                         tamanho_bloco, seed, composto), niveis)
+    retornos = simular_retornos(media, volatilidade, horizonte, n_caminhos,
+                                tamanho_bloco, seed, composto)
+    return var_es(retornos, niveis, sobrescrever=True)
+
+
+def fator_covariancia(cov):
+    """Matriz ``L`` com ``L @ L.T == cov``: Cholesky, ou autovetores se ``cov`` não for positiva definida."""
+    cov = np.asarray(cov, dtype='float64')
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        autovalores, autovetores = np.linalg.eigh(cov)
+        return autovetores * np.sqrt(np.clip(autovalores, 0, None))
+
+
+def _vetor_media(media, tickers, n_ativos):
+    # Série alinhada aos tickers da covariância; um ticker sem média tornaria tudo NaN
+    if tickers is not None and isinstance(media, pd.Series):
+        media = media.reindex(tickers)
+        ausentes = list(media.index[media.isna()])
+        if ausentes:
+            raise ValueError(f'média ausente para tickers da covariância: {ausentes}')
+    return np.broadcast_to(np.asarray(media, dtype='float64'), (n_ativos,)).copy()
+
+
+def _vetor_pesos(pesos, tickers, n_ativos):
+    # Aceita o dicionário de clean_weights() ou um vetor na ordem da covariância
+    if isinstance(pesos, pd.Series):
+        pesos = pesos.fillna(0.0).to_dict()
+    if isinstance(pesos, dict):
+        if tickers is None:
+            raise ValueError('pesos por ticker (dict ou Series) exigem cov em um DataFrame '
+                             'com os tickers nas colunas')
+        desconhecidos = sorted(set(pesos) - set(tickers), key=str)
+        if desconhecidos:
+            raise ValueError(f'pesos de tickers fora da covariância: {desconhecidos}')
+        return np.array([pesos.get(t, 0.0) for t in tickers], dtype='float64')
+    vetor = np.asarray(pesos, dtype='float64')
+    if vetor.shape != (n_ativos,):
+        raise ValueError(f'esperado um peso por ativo ({n_ativos}), recebido forma {vetor.shape}')
+    return vetor
+
+
+def _bloco_carteira(media, fator, pesos, horizonte, n, semente, composto):
+    # Um bloco de caminhos da carteira; roda dentro de um processo do pool
+    rng = np.random.default_rng(semente)
+    acumulado = np.zeros((n, len(media)))
+    choques = np.empty_like(acumulado)
+    for _ in range(horizonte):
+        rng.standard_normal(out=choques)
+        diario = choques @ fator.T
+        diario += media
+        if composto:
+            np.maximum(diario, -1.0, out=diario)
+            np.log1p(diario, out=diario)
+        acumulado += diario
+    if composto:
+        # Buy-and-hold: cada ativo compõe seu retorno e a carteira pondera o resultado
+        np.expm1(acumulado, out=acumulado)
+    return acumulado @ pesos
+
+
+def _digest_carteira(*argumentos):
+    return TDigest().adicionar(_bloco_carteira(*argumentos))
+
+
+def _executar_carteira(tarefa, media, cov, pesos, horizonte, n_caminhos, tamanho_bloco,
+                       seed, composto, n_processos):
+    # Divide os caminhos em blocos fixos, cada um com sua semente, e roda ``tarefa`` em cada bloco
+    tickers = list(cov.columns) if isinstance(cov, pd.DataFrame) else None
+    media_vetor = _vetor_media(media, tickers, np.shape(cov)[0])
+    fator = fator_covariancia(cov)
+    pesos = _vetor_pesos(pesos, tickers, len(media_vetor))
+
+    tamanhos = [min(tamanho_bloco, n_caminhos - i) for i in range(0, n_caminhos, tamanho_bloco)]
+    sementes = np.random.SeedSequence(seed).spawn(len(tamanhos))
+    argumentos = [(media_vetor, fator, pesos, horizonte, n, s, composto)
+                  for n, s in zip(tamanhos, sementes)]
+
+    if n_processos == 1:
+        return [tarefa(*a) for a in argumentos]
+    with ProcessPoolExecutor(max_workers=n_processos) as pool:
+        return list(pool.map(tarefa, *zip(*argumentos)))
+
+
+def simular_retornos_carteira(media, cov, pesos, horizonte=1, n_caminhos=100_000,
+                              tamanho_bloco=20_000, seed=None, composto=True, n_processos=None):
+    """Retorno acumulado da carteira no ``horizonte`` para cada caminho simulado.
+
+    ``media`` e ``cov`` são diários (ex.: ``re / 252`` e ``sample_cov / 252``
+    para as estimativas anualizadas do PyPortfolioOpt) e ``pesos`` pode ser o
+    dicionário devolvido por ``clean_weights()``.
+
+    Cada bloco de ``tamanho_bloco`` caminhos recebe sua própria semente de
+    ``SeedSequence(seed).spawn``, então o resultado não depende de
+    ``n_processos``. ``n_processos=1`` roda tudo no processo atual.
+    """
+    blocos = _executar_carteira(_bloco_carteira, media, cov, pesos, horizonte, n_caminhos,
+                                tamanho_bloco, seed, composto, n_processos)
+    return np.concatenate(blocos) if blocos else np.empty(0)
+
+
+@medido('risco.monte_carlo_carteira')
+def var_monte_carlo_carteira(media, cov, pesos, horizonte=1, n_caminhos=100_000, niveis=NIVEIS,
+                             tamanho_bloco=20_000, seed=None, composto=True, n_processos=None,
+                             exato=True):
+    """VaR e ES da carteira por Monte Carlo com choques correlacionados.
+
+    Ex.: com ``re``, ``sample_cov`` e ``pesos_vol`` do notebook::
+
+        var_monte_carlo_carteira(re / 252, sample_cov / 252, pesos_vol, n_caminhos=5_000_000)
+
+    Com ``exato=False`` cada processo devolve só o t-digest do seu bloco e os
+    digests são mesclados, sem trafegar nem guardar os retornos simulados.
+    """
+    if not exato:
+        digests = _executar_carteira(_digest_carteira, media, cov, pesos, horizonte, n_caminhos,
+                                     tamanho_bloco, seed, composto, n_processos)
+        return TDigest().mesclar(*digests).var_es(niveis)
+    retornos = simular_retornos_carteira(media, cov, pesos, horizonte, n_caminhos,
+                                         tamanho_bloco, seed, composto, n_processos)
+    return var_es(retornos, niveis, sobrescrever=True)
@@ -0,0 +1,166 @@
+"""VaR e ES paramétricos (normal, Cornish-Fisher e t de Student) para todo o universo.
+
+O notebook calcula ``norm.ppf(conf, media, volatilidade_diaria)`` uma vez por
+nível para um ativo (In[62]–In[63]). Aqui média, desvio, assimetria e curtose
+de todas as colunas saem de uma única passada sobre a matriz de retornos
+(``momentos``), e o VaR e o ES de cada distribuição são calculados por
+broadcasting (níveis x ativos): os quantis dependem só dos níveis, e a única
+chamada ao scipy (t de Student) é uma ufunc sobre a matriz inteira.
+
+Convenção de ``var``: o VaR é um retorno (negativo) e o ES é a média dos
+retornos iguais ou piores que o VaR.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .var import NIVEIS
+
+DISTRIBUICOES = ('normal', 'cornish_fisher', 't')
+
+
+@medido('risco.momentos')
+def momentos(retornos):
+    """Observações, média, desvio, assimetria e excesso de curtose de cada coluna.
+
+    Definições populacionais (``ddof=0``, como ``np.std`` e o ``bias=True`` de
+    ``scipy.stats.skew``/``kurtosis``); NaN é ignorado coluna a coluna.
+    """
+    nomes = getattr(retornos, 'columns', None)
+    r = np.asarray(retornos, dtype='float64')
+    if r.ndim == 1:
+        r = r[:, None]
+    validos = ~np.isnan(r)
+    n = validos.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.nansum(r, axis=0) / n
+        # Uma passada sobre os desvios dá os momentos centrais de ordem 2, 3 e 4
+        d = r - media
+        d[~validos] = 0.0
+        d2 = d * d
+        m2 = d2.sum(axis=0) / n
+        m3 = np.einsum('ij,ij->j', d2, d) / n
+        m4 = np.einsum('ij,ij->j', d2, d2) / n
+        tabela = {'n': n, 'media': media, 'desvio': np.sqrt(m2),
+                  'assimetria': m3 / m2 ** 1.5, 'curtose': m4 / (m2 * m2) - 3}
+    return pd.DataFrame(tabela, index=pd.Index(range(r.shape[1]) if nomes is None else nomes,
+                                               name='ativo'))
+
+
+def _normal(niveis):
+    # Quantil e densidade da normal padrão na cauda esquerda, um por nível
+    z = np.array([NormalDist().inv_cdf(1 - nivel) for nivel in niveis])
+    return z, np.exp(-z * z / 2) / np.sqrt(2 * np.pi)
+
+
+def _t_padronizada(niveis, gl):
+    # Quantil e ES (em unidades do desvio) da t com variância 1, níveis x ativos
+    from scipy import special
+
+    cauda = (1 - niveis)[:, None]
+    t = special.stdtrit(gl, cauda)
+    escala = np.sqrt((gl - 2) / gl)
+    densidade = np.exp(special.gammaln((gl + 1) / 2) - special.gammaln(gl / 2)
+                       - 0.5 * np.log(gl * np.pi) - (gl + 1) / 2 * np.log1p(t * t / gl))
+    es = -(gl + t * t) / (gl - 1) * densidade / cauda
+    return t * escala, es * escala
+
+
+@medido('risco.var_es_parametrico')
+def var_es_parametrico(retornos=None, niveis=NIVEIS, distribuicao='normal', estatisticas=None,
+                       graus_liberdade=None, horizonte=1):
+    """VaR e ES paramétricos de todas as colunas de ``retornos`` para vários níveis.
+
+    - ``'normal'``: ``media + z * desvio`` (In[62]) e ES ``media - desvio * φ(z) / (1 - c)``;
+    - ``'cornish_fisher'``: quantil normal corrigido pela assimetria e curtose
+      da amostra; o ES é a média exata dos quantis corrigidos na cauda;
+    - ``'t'``: t de Student com a média e o desvio da amostra e graus de
+      liberdade pela curtose (``4 + 6 / curtose``), ou ``graus_liberdade``
+      (escalar ou um por ativo).
+
+    ``estatisticas`` é a tabela de ``momentos`` já calculada, para avaliar várias
+    distribuições com uma única passada sobre os dados. ``horizonte`` (dias)
+    escala média e desvio pela regra da raiz do tempo. O formato é o de
+    ``var.var_es_matriz``: uma linha por ativo e colunas ``(medida, nivel)``.
+    """
+    if distribuicao not in DISTRIBUICOES:
+        raise ValueError(f'distribuicao deve ser uma de {DISTRIBUICOES}, recebido {distribuicao!r}')
+    if estatisticas is None:
+        if retornos is None:
+            raise ValueError('informe retornos ou estatisticas')
+        estatisticas = momentos(retornos)
+    niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+    media = estatisticas['media'].to_numpy() * horizonte
+    desvio = estatisticas['desvio'].to_numpy() * np.sqrt(horizonte)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if distribuicao == 't':
+            if graus_liberdade is None:
+                curtose = estatisticas['curtose'].to_numpy()
+                # Sem excesso de curtose a t degenera na normal (infinitos graus)
+                gl = np.where(curtose > 0, 4 + 6 / curtose, np.inf)
+            else:
+                gl = np.broadcast_to(np.asarray(graus_liberdade, dtype='float64'), media.shape)
+            if (gl <= 2).any():
+                raise ValueError('graus de liberdade devem ser maiores que 2')
+            normal = np.isinf(gl)
+            q, e = _t_padronizada(niveis, np.where(normal, 1e6, gl))
+            z, densidade = _normal(niveis)
+            q[:, normal] = z[:, None]
+            e[:, normal] = (-densidade / (1 - niveis))[:, None]
+        else:
+            z, densidade = _normal(niveis)
+            z, densidade = z[:, None], densidade[:, None]
+            cauda = (1 - niveis)[:, None]
+            if distribuicao == 'normal':
+                q = np.broadcast_to(z, (len(niveis), len(media)))
+                e = np.broadcast_to(-densidade / cauda, q.shape)
+            else:
+                s = estatisticas['assimetria'].to_numpy()
+                k = estatisticas['curtose'].to_numpy()
+                q = (z + (z * z - 1) * s / 6 + (z ** 3 - 3 * z) * k / 24
+                     - (2 * z ** 3 - 5 * z) * s * s / 36)
+                # E[Z^j ; Z <= z] da normal padrão, j = 1, 2, 3
+                i1 = -densidade
+                i2 = cauda - z * densidade
+                i3 = -(z * z + 2) * densidade
+                e = (i1 + (i2 - cauda) * s / 6 + (i3 - 3 * i1) * k / 24
+                     - (2 * i3 - 5 * i1) * s * s / 36) / cauda
+        var = media + q * desvio
+        es = media + e * desvio
+
+    colunas = pd.MultiIndex.from_product([['VaR', 'ES'], niveis], names=['medida', 'nivel'])
+    return pd.DataFrame(np.hstack([var.T, es.T]), index=estatisticas.index, columns=colunas)
+
+
+@medido('risco.var_es_parametrico_carteira')
+def var_es_parametrico_carteira(pesos, cov, media=None, niveis=NIVEIS, horizonte=1):
+    """VaR e ES normais de uma ou várias carteiras a partir da matriz de covariância.
+
+    ``pesos`` é um vetor ou uma matriz (ativos x carteiras), alinhado a
+    ``cov`` quando ambos são pandas; ``media`` é o retorno médio de cada
+    ativo (zero se omitida). ``cov`` e ``media`` são diários, como
+    ``volatilidade_diaria`` no notebook: a volatilidade da carteira é
+    ``sqrt(wᵀ Σ w)``, para todas as carteiras em um único produto.
+    """
+    tickers = getattr(cov, 'columns', None)
+    if tickers is not None and isinstance(pesos, (pd.Series, pd.DataFrame)):
+        pesos = pesos.reindex(tickers).fillna(0)
+    if tickers is not None and isinstance(media, pd.Series):
+        media = media.reindex(tickers)
+    nomes = pesos.columns if isinstance(pesos, pd.DataFrame) else None
+    W = np.asarray(pesos, dtype='float64')
+    W = W[:, None] if W.ndim == 1 else W
+    sigma = np.asarray(cov, dtype='float64')
+    if W.shape[0] != sigma.shape[0]:
+        raise ValueError(f'esperado um peso por ativo ({sigma.shape[0]}), recebido {W.shape[0]}')
+    mu = np.zeros(W.shape[0]) if media is None else np.asarray(media, dtype='float64')
+
+    volatilidade = np.sqrt(np.maximum(((sigma @ W) * W).sum(axis=0), 0.0))
+    carteiras = pd.DataFrame({'media': mu @ W, 'desvio': volatilidade},
+                             index=pd.Index(range(W.shape[1]) if nomes is None else nomes,
+                                            name='carteira'))
+    return var_es_parametrico(niveis=niveis, estatisticas=carteiras, horizonte=horizonte)
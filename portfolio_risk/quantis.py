@@ -0,0 +1,305 @@
+"""Estimadores em fluxo (t-digest e histograma) para VaR, ES e gráficos sem guardar amostras.
+
+O t-digest resume a distribuição em alguns centenas de centróides (média, peso),
+mais finos nas caudas, onde estão os quantis de VaR. Os digests podem ser
+construídos em paralelo (um por processo ou por bloco de dados) e mesclados
+depois, com o mesmo resultado de um digest único.
+
+``HistogramaFluxo`` conta as observações em baldes de largura fixa, que
+dobra quando os dados saem da faixa; serve para desenhar a distribuição de
+milhões de retornos simulados enviando ao gráfico só bordas e contagens. Os
+quantis dele vêm de um t-digest alimentado junto, e não dos baldes, que com
+caudas pesadas ficam largos demais para marcar o VaR.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+from .var import NIVEIS
+
+
+class TDigest:
+    """t-digest com função de escala k1 e compressão vetorizada.
+
+    ``compressao`` controla o número de centróides (aprox. ``compressao / 2``)
+    e, portanto, a precisão; ``buffer`` é quantos valores brutos são acumulados
+    antes de cada compressão.
+    """
+
+    def __init__(self, compressao=200, buffer=50_000):
+        self.compressao = compressao
+        self.buffer = buffer
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self._pendentes = []
+        self._n_pendentes = 0
+
+    @property
+    def n(self):
+        return float(self.pesos.sum()) + self._n_pendentes
+
+    def adicionar(self, valores):
+        """Acrescenta um array (de qualquer formato) de observações; NaNs são ignorados."""
+        valores = np.asarray(valores, dtype='float64').ravel()
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return self
+        self.minimo = min(self.minimo, valores.min())
+        self.maximo = max(self.maximo, valores.max())
+        self._pendentes.append(valores)
+        self._n_pendentes += len(valores)
+        if self._n_pendentes >= self.buffer:
+            self._comprimir()
+        return self
+
+    def _comprimir(self, medias=None, pesos=None):
+        partes_m = [self.medias] + self._pendentes + ([medias] if medias is not None else [])
+        partes_p = [self.pesos] + [np.ones(len(v)) for v in self._pendentes]
+        partes_p += [pesos] if pesos is not None else []
+        self._pendentes, self._n_pendentes = [], 0
+        m = np.concatenate(partes_m)
+        p = np.concatenate(partes_p)
+        if not len(m):
+            return
+        ordem = np.argsort(m, kind='stable')
+        m, p = m[ordem], p[ordem]
+
+        # Cada ponto vai para o centróide floor(k(q)), com q no meio do seu peso:
+        # centróides cobrem no máximo uma unidade da escala k1, que é fina nas caudas.
+        total = p.sum()
+        q = (np.cumsum(p) - p / 2) / total
+        k = self.compressao / (2 * np.pi) * np.arcsin(2 * q - 1)
+        grupo = np.floor(k)
+        inicios = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+        self.pesos = np.add.reduceat(p, inicios)
+        self.medias = np.add.reduceat(m * p, inicios) / self.pesos
+
+    def mesclar(self, *outros):
+        """Incorpora outros digests a este (ex.: os de cada processo do pool)."""
+        for outro in outros:
+            outro._comprimir()
+            self.minimo = min(self.minimo, outro.minimo)
+            self.maximo = max(self.maximo, outro.maximo)
+            self._comprimir(outro.medias, outro.pesos)
+        return self
+
+    def _pontos(self):
+        # Curva (peso acumulado, valor) para interpolar: extremos + centro de cada centróide
+        self._comprimir()
+        if not len(self.pesos):
+            raise ValueError('t-digest vazio')
+        acumulado = np.cumsum(self.pesos) - self.pesos / 2
+        x = np.r_[0.0, acumulado, self.pesos.sum()]
+        y = np.r_[self.minimo, self.medias, self.maximo]
+        return x, y
+
+    def quantil(self, q):
+        """Quantil(s) ``q`` em [0, 1] da distribuição resumida."""
+        x, y = self._pontos()
+        return np.interp(np.asarray(q, dtype='float64') * x[-1], x, y)
+
+    def media_cauda(self, q):
+        """Média das observações abaixo do quantil ``q`` (o ES da cauda esquerda)."""
+        x, y = self._pontos()
+        alvo = np.atleast_1d(np.asarray(q, dtype='float64')) * x[-1]
+        # Centróides inteiros abaixo do alvo entram com a média exata; o que fica
+        # cortado pelo alvo entra pelo valor da curva quantil no meio da fatia
+        limites = np.cumsum(self.pesos)
+        massa = np.r_[0.0, np.cumsum(self.pesos * self.medias)]
+        i = np.searchsorted(limites, alvo, side='right')
+        anterior = np.where(i > 0, limites[np.maximum(i - 1, 0)], 0.0)
+        fatia = alvo - anterior
+        soma = massa[i] + fatia * np.interp((anterior + alvo) / 2, x, y)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            es = np.where(alvo > 0, soma / alvo, self.minimo)
+        return es if np.ndim(q) else es[0]
+
+    def var_es(self, niveis=NIVEIS):
+        """VaR e ES para vários níveis de confiança, no mesmo formato de ``var.var_es``."""
+        niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+        return pd.DataFrame({'VaR': self.quantil(1 - niveis), 'ES': self.media_cauda(1 - niveis)},
+                            index=pd.Index(niveis, name='nivel'))
+
+
+class HistogramaFluxo:
+    """Histograma em fluxo com no máximo ``n_baldes`` baldes, mesclável.
+
+    As bordas ficam numa grade ancorada em zero com largura potência de 2;
+    quando uma observação cai fora da faixa, baldes vizinhos são somados aos
+    pares (a largura dobra) até a faixa caber em ``n_baldes``. Dois
+    histogramas sempre podem ser mesclados sem perder contagens. Média e
+    desvio-padrão são exatos (somas dos valores e dos quadrados).
+
+    Observações a mais de ``limite_desvios`` desvios-padrão da média (até o
+    bloco atual) são contadas nos baldes das pontas, para que poucos valores
+    extremos de uma cauda pesada não alarguem todos os baldes (``None``
+    desliga). ``quantil``, ``media_cauda`` e ``var_es`` usam um ``TDigest``
+    com ``compressao`` alimentado com os valores sem corte; com
+    ``compressao=None`` elas interpolam dentro dos baldes.
+    """
+
+    def __init__(self, n_baldes=200, limite_desvios=6.0, compressao=200):
+        if n_baldes < 4:
+            raise ValueError('n_baldes deve ser pelo menos 4')
+        self.n_baldes = n_baldes
+        self.limite_desvios = limite_desvios
+        self.digest = None if compressao is None else TDigest(compressao)
+        self.largura = None
+        self.primeiro = 0
+        self.contagens = np.zeros(0, dtype=np.int64)
+        self.n = 0
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    @property
+    def bordas(self):
+        return (self.primeiro + np.arange(len(self.contagens) + 1)) * self.largura
+
+    @property
+    def media(self):
+        return self.soma / self.n
+
+    @property
+    def desvio(self):
+        return np.sqrt(max(self.soma_quadrados / self.n - self.media ** 2, 0.0))
+
+    def _engrossar(self):
+        # Soma os baldes aos pares alinhados na grade: a largura dobra
+        c = self.contagens
+        if self.primeiro % 2:
+            c = np.r_[0, c]
+            self.primeiro -= 1
+        if len(c) % 2:
+            c = np.r_[c, 0]
+        self.contagens = c.reshape(-1, 2).sum(axis=1)
+        self.primeiro //= 2
+        self.largura *= 2
+
+    def _acomodar(self, menor, maior):
+        # Ajusta largura e faixa para cobrir os índices [menor, maior] da grade atual
+        if len(self.contagens):
+            menor = min(menor, self.primeiro)
+            maior = max(maior, self.primeiro + len(self.contagens) - 1)
+        else:
+            self.primeiro = menor
+        while maior - menor + 1 > self.n_baldes:
+            self._engrossar()
+            menor, maior = menor // 2, maior // 2
+        novo = np.zeros(maior - menor + 1, dtype=np.int64)
+        novo[self.primeiro - menor:self.primeiro - menor + len(self.contagens)] = self.contagens
+        self.contagens, self.primeiro = novo, menor
+
+    def adicionar(self, valores):
+        """Acrescenta um array (de qualquer formato) de observações; NaNs são ignorados."""
+        valores = np.asarray(valores, dtype='float64').ravel()
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return self
+        if self.digest is not None:
+            self.digest.adicionar(valores)
+        self.n += len(valores)
+        self.soma += valores.sum()
+        self.soma_quadrados += valores @ valores
+        self.minimo = min(self.minimo, valores.min())
+        self.maximo = max(self.maximo, valores.max())
+        if self.limite_desvios is not None and self.desvio > 0:
+            raio = self.limite_desvios * self.desvio
+            valores = np.clip(valores, self.media - raio, self.media + raio)
+
+        menor, maior = valores.min(), valores.max()
+        if self.largura is None:
+            # Largura inicial: a faixa do primeiro bloco ocupa metade dos baldes
+            amplitude = max(maior - menor, abs(maior) * 1e-9, 1e-300)
+            self.largura = 2.0 ** np.ceil(np.log2(amplitude / (self.n_baldes // 2)))
+        self._acomodar(int(np.floor(menor / self.largura)), int(np.floor(maior / self.largura)))
+        indices = np.floor(valores / self.largura).astype(np.int64)
+        indices -= self.primeiro
+        self.contagens += np.bincount(indices, minlength=len(self.contagens))
+        return self
+
+    def mesclar(self, *outros):
+        """Incorpora outros histogramas a este (ex.: os de cada processo do pool)."""
+        for outro in outros:
+            if outro.largura is None:
+                continue
+            outro = copy.deepcopy(outro)
+            if self.largura is None:
+                self.largura, self.primeiro = outro.largura, outro.primeiro
+            while self.largura < outro.largura:
+                self._engrossar()
+            while outro.largura < self.largura:
+                outro._engrossar()
+            self._acomodar(outro.primeiro, outro.primeiro + len(outro.contagens) - 1)
+            while outro.largura < self.largura:
+                outro._engrossar()
+            inicio = outro.primeiro - self.primeiro
+            self.contagens[inicio:inicio + len(outro.contagens)] += outro.contagens
+            self.n += outro.n
+            self.soma += outro.soma
+            self.soma_quadrados += outro.soma_quadrados
+            self.minimo = min(self.minimo, outro.minimo)
+            self.maximo = max(self.maximo, outro.maximo)
+            if self.digest is not None:
+                if outro.digest is None:
+                    # Sem as amostras do outro, o digest deixaria de representar o todo
+                    self.digest = None
+                else:
+                    self.digest.mesclar(outro.digest)
+        return self
+
+    def _curva(self):
+        if not self.n:
+            raise ValueError('histograma vazio')
+        # Distribuição acumulada linear dentro de cada balde, limitada a [mínimo, máximo]
+        x = np.r_[0.0, np.cumsum(self.contagens)]
+        y = np.clip(self.bordas, self.minimo, self.maximo)
+        return x, y
+
+    def quantil(self, q):
+        """Quantil(s) ``q`` em [0, 1], pelo t-digest ou interpolando dentro do balde."""
+        if self.digest is not None:
+            return self.digest.quantil(q)
+        x, y = self._curva()
+        return np.interp(np.asarray(q, dtype='float64') * self.n, x, y)
+
+    def media_cauda(self, q):
+        """Média das observações abaixo do quantil ``q`` (o ES da cauda esquerda)."""
+        if self.digest is not None:
+            return self.digest.media_cauda(q)
+        x, y = self._curva()
+        alvo = np.atleast_1d(np.asarray(q, dtype='float64')) * self.n
+        # Baldes inteiros entram pelo centro; o cortado, pelo meio da fatia abaixo do alvo
+        massa = np.r_[0.0, np.cumsum(self.contagens * (y[:-1] + y[1:]) / 2)]
+        i = np.searchsorted(x[1:], alvo, side='right')
+        fatia = alvo - x[i]
+        j = np.minimum(i, len(self.contagens) - 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            meio = y[j] + np.where(self.contagens[j] > 0, fatia / self.contagens[j], 0.0) * (y[j + 1] - y[j]) / 2
+            es = np.where(alvo > 0, (massa[i] + fatia * meio) / alvo, self.minimo)
+        return es if np.ndim(q) else es[0]
+
+    def var_es(self, niveis=NIVEIS):
+        """VaR e ES para vários níveis de confiança, no mesmo formato de ``var.var_es``."""
+        niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+        return pd.DataFrame({'VaR': self.quantil(1 - niveis), 'ES': self.media_cauda(1 - niveis)},
+                            index=pd.Index(niveis, name='nivel'))
+
+
+@medido('risco.var_es_fluxo')
+def var_es_fluxo(blocos, niveis=NIVEIS, compressao=200):
+    """VaR e ES de um iterável de blocos de retornos em memória constante.
+
+    ``blocos`` pode ser um gerador de arrays, como a leitura em pedaços de um
+    histórico longo ou os blocos de ``montecarlo.gerar_blocos``.
+    """
+    digest = TDigest(compressao)
+    for bloco in blocos:
+        digest.adicionar(bloco)
+    return digest.var_es(niveis)
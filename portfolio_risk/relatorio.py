@@ -0,0 +1,120 @@
+"""Relatório de risco por ativo e da carteira otimizada, como no notebook.
+
+Reúne, para cada ativo, as medidas calculadas passo a passo no notebook:
+volatilidade diária e anual, semidesvio, VaR histórico, paramétrico e por
+Monte Carlo, Expected Shortfall, beta contra o mercado e drawdown máximo.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .capm import regressao_capm
+from .dados import calcular_retornos
+from .drawdown import estatisticas_drawdown
+from .instrumentacao import etapa, medido
+from .montecarlo import var_monte_carlo
+from .restricoes import limites_ativos
+from .var import NIVEIS, var_es_matriz
+
+OBJETIVOS = ('min_volatility', 'max_sharpe', 'efficient_risk', 'efficient_return')
+
+
+def _sufixo(nivel):
+    return str(round(nivel * 100))
+
+
+@medido('relatorio.ativos')
+def relatorio_ativos(precos, mercado=None, niveis=NIVEIS, n_caminhos=0, seed=None):
+    """Tabela de risco com uma linha por ativo de ``precos``.
+
+    ``mercado`` (preços do índice, ex.: Ibovespa) acrescenta beta e R²;
+    ``n_caminhos > 0`` acrescenta o VaR de Monte Carlo de um dia.
+    """
+    retornos = calcular_retornos(precos)
+    r = retornos.to_numpy()
+    media = np.nanmean(r, axis=0)
+    volatilidade = np.nanstd(r, axis=0)
+    negativos = np.minimum(np.nan_to_num(r), 0.0)
+    colunas = {
+        'volatilidade_diaria': volatilidade,
+        'volatilidade_anual': volatilidade * np.sqrt(252),
+        'semidesvio': np.sqrt((negativos ** 2).sum(axis=0) / (~np.isnan(r)).sum(axis=0)),
+    }
+
+    historico = var_es_matriz(r, niveis)
+    for nivel in niveis:
+        colunas[f'var_historico_{_sufixo(nivel)}'] = historico['VaR'][nivel].to_numpy()
+        colunas[f'es_historico_{_sufixo(nivel)}'] = historico['ES'][nivel].to_numpy()
+        z = NormalDist().inv_cdf(1 - nivel)
+        colunas[f'var_parametrico_{_sufixo(nivel)}'] = media + z * volatilidade
+
+    if n_caminhos:
+        simulados = [var_monte_carlo(m, v, 1, n_caminhos, niveis, seed=seed)
+                     for m, v in zip(media, volatilidade)]
+        for nivel in niveis:
+            colunas[f'var_monte_carlo_{_sufixo(nivel)}'] = [s.loc[nivel, 'VaR'] for s in simulados]
+
+    if mercado is not None:
+        mercado = pd.Series(mercado).reindex(retornos.index.union(pd.Series(mercado).index))
+        capm = regressao_capm(retornos, calcular_retornos(mercado.to_frame()).iloc[:, 0])
+        colunas['beta'] = capm['beta'].to_numpy()
+        colunas['r2'] = capm['r2'].to_numpy()
+
+    colunas['max_drawdown'] = estatisticas_drawdown(precos)['max_drawdown'].to_numpy()
+    return pd.DataFrame(colunas, index=retornos.columns)
+
+
+def otimizar_estimativas(re, cov, objetivo='max_sharpe', taxa_livre=0.0, alvo=None,
+                         limites=(0, 1), restricoes=None):
+    """Pesos e desempenho da carteira a partir de retornos esperados e covariância já estimados.
+
+    ``alvo`` é a volatilidade (``efficient_risk``) ou o retorno
+    (``efficient_return``) desejado; ``limites`` é o par (inferior, superior)
+    do ``weight_bounds``, cada um escalar, vetor ou ``{ticker: limite}`` (ver
+    ``restricoes.limites_ativos``), e ``restricoes(ef)`` pode adicionar
+    restrições ao ``EfficientFrontier`` antes da otimização.
+    """
+    from pypfopt import EfficientFrontier
+
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f'objetivo deve ser um de {OBJETIVOS}, recebido {objetivo!r}')
+    inferior, superior = limites_ativos(list(re.index), *limites)
+    ef = EfficientFrontier(re, cov, weight_bounds=np.column_stack([inferior, superior]))
+    if restricoes is not None:
+        restricoes(ef)
+    with etapa('otimizacao.' + objetivo, ativos=len(re)):
+        if objetivo == 'max_sharpe':
+            ef.max_sharpe(risk_free_rate=taxa_livre)
+        elif objetivo == 'min_volatility':
+            ef.min_volatility()
+        elif objetivo == 'efficient_risk':
+            ef.efficient_risk(target_volatility=alvo)
+        else:
+            ef.efficient_return(target_return=alvo)
+    retorno, volatilidade, sharpe = ef.portfolio_performance(risk_free_rate=taxa_livre)
+    return {
+        'objetivo': objetivo,
+        'pesos': dict(ef.clean_weights()),
+        'retorno_esperado': retorno,
+        'volatilidade': volatilidade,
+        'sharpe': sharpe,
+    }
+
+
+def otimizar(precos, objetivo='max_sharpe', mercado=None, taxa_livre=0.0, alvo=None,
+             limites=(0, 1), restricoes=None):
+    """Pesos e desempenho da carteira otimizada, como nas células In[92]–In[134].
+
+    Usa retornos esperados CAPM e covariância de Ledoit-Wolf; os demais
+    argumentos são os de ``otimizar_estimativas``.
+    """
+    from pypfopt import expected_returns, risk_models
+
+    with etapa('estimativas.capm_return'):
+        mercado = None if mercado is None else pd.DataFrame(mercado)
+        re = expected_returns.capm_return(precos, market_prices=mercado, risk_free_rate=taxa_livre)
+    with etapa('estimativas.ledoit_wolf'):
+        cov = risk_models.CovarianceShrinkage(precos).ledoit_wolf()
+    return otimizar_estimativas(re, cov, objetivo, taxa_livre, alvo, limites, restricoes)
@@ -0,0 +1,180 @@
+"""Restrições de grupos (setor, subsetor, emissor...) e limites por ativo em forma matricial.
+
+O notebook limita setores com ``add_sector_constraints(sector_mapper,
+sector_lower, sector_upper)`` (In[132]), que percorre os setores em Python e
+cria duas restrições por setor. Aqui as classificações viram uma matriz
+esparsa de pertinência (ativos x grupos), com vários níveis sobrepostos, e os
+limites viram vetores: todas as faixas entram no problema como uma única
+restrição ``M @ w <= b``, montada uma vez e independente do número de grupos.
+
+Da mesma forma, o teto de um ativo (In[134],
+``add_constraint(lambda w: w[petr] <= 0.10)``) cria uma closure e uma
+restrição por ticker. ``limites_ativos`` converte limites escalares, vetores
+ou dicionários ``{ticker: limite}`` nos dois vetores de limites da variável
+de pesos, que custam o mesmo para 1 ou 1000 ativos limitados.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import etapa
+
+
+def _vetor_ativos(tickers, limite, padrao, nome):
+    if limite is None:
+        limite = padrao
+    if isinstance(limite, (dict, pd.Series)):
+        limite = pd.Series(limite, dtype='float64')
+        desconhecidos = limite.index.difference(tickers)
+        if len(desconhecidos):
+            raise KeyError(f'{nome}: tickers fora da carteira: {list(desconhecidos)}')
+        vetor = np.broadcast_to(np.asarray(padrao, dtype='float64'), (len(tickers),)).copy()
+        vetor[pd.Index(tickers).get_indexer(limite.index)] = limite.to_numpy()
+        return vetor
+    vetor = np.asarray(limite, dtype='float64')
+    if vetor.ndim and vetor.shape != (len(tickers),):
+        raise ValueError(f'{nome}: esperado um limite por ativo ({len(tickers)}), recebido {vetor.shape}')
+    return np.broadcast_to(vetor, (len(tickers),)).copy()
+
+
+def limites_ativos(tickers, inferior=None, superior=None, padrao=(0.0, 1.0)):
+    """Vetores ``(inferior, superior)`` de peso de cada ativo de ``tickers``.
+
+    Cada limite pode ser um escalar, um vetor na ordem de ``tickers`` ou um
+    dicionário/Series ``{ticker: limite}``, e os ativos ausentes dele ficam com
+    ``padrao``. Ex.: o teto de In[134] para várias ações de uma vez::
+
+        inferior, superior = limites_ativos(ef.tickers, superior={'PETR3.SA': 0.10, 'VALE3.SA': 0.15})
+    """
+    tickers = list(tickers)
+    vetor_inferior = _vetor_ativos(tickers, inferior, padrao[0], 'inferior')
+    vetor_superior = _vetor_ativos(tickers, superior, padrao[1], 'superior')
+    if (vetor_inferior > vetor_superior).any():
+        raise ValueError('limite inferior maior que o superior em algum ativo')
+    return vetor_inferior, vetor_superior
+
+
+def aplicar_limites(ef, inferior=None, superior=None):
+    """Aperta os limites de peso de um ``EfficientFrontier`` já criado.
+
+    Só os ativos com limite informado são restringidos, em duas restrições
+    vetoriais (``w[i] >= inferior`` e ``w[j] <= superior``), em vez de uma
+    closure e uma restrição por ativo. Os ``weight_bounds`` do ``ef``
+    continuam valendo como restrições próprias do PyPortfolioOpt, de modo que
+    o resultado é a interseção dos dois, sem ler nem alterar o estado privado
+    do ``EfficientFrontier``. Para um problema novo, prefira passar
+    ``np.column_stack(limites_ativos(...))`` como ``weight_bounds``.
+    """
+    novo_inferior, novo_superior = limites_ativos(ef.tickers, inferior, superior,
+                                                  padrao=(-np.inf, np.inf))
+    abaixo = np.flatnonzero(np.isfinite(novo_inferior))
+    acima = np.flatnonzero(np.isfinite(novo_superior))
+    if len(abaixo):
+        piso = novo_inferior[abaixo]
+        ef.add_constraint(lambda w: w[abaixo] >= piso)
+    if len(acima):
+        teto = novo_superior[acima]
+        ef.add_constraint(lambda w: w[acima] <= teto)
+    return ef
+
+
+def matriz_grupos(classificacoes, tickers):
+    """Matriz esparsa (ativos x grupos) de pertinência e o índice (nivel, grupo) das colunas.
+
+    ``classificacoes`` é um dicionário ``{nivel: {ticker: grupo}}`` (ex.:
+    ``{'setor': sector_mapper, 'emissor': emissores}``) ou um DataFrame com
+    os tickers no índice e uma coluna por nível. Tickers sem grupo em um
+    nível simplesmente não pertencem a nenhum grupo dele.
+    """
+    from scipy import sparse
+
+    if isinstance(classificacoes, pd.DataFrame):
+        classificacoes = {nivel: classificacoes[nivel] for nivel in classificacoes.columns}
+    tickers = list(tickers)
+    linhas, colunas, nomes = [], [], []
+    for nivel, mapa in classificacoes.items():
+        codigos, grupos = pd.factorize(pd.Series(mapa).reindex(tickers), sort=True)
+        presentes = np.flatnonzero(codigos >= 0)
+        linhas.append(presentes)
+        colunas.append(len(nomes) + codigos[presentes])
+        nomes += [(nivel, g) for g in grupos]
+    linhas = np.concatenate(linhas) if linhas else np.empty(0, dtype=np.intp)
+    colunas = np.concatenate(colunas) if colunas else np.empty(0, dtype=np.intp)
+    matriz = sparse.csr_matrix((np.ones(len(linhas)), (linhas, colunas)),
+                               shape=(len(tickers), len(nomes)))
+    return matriz, pd.MultiIndex.from_tuples(nomes, names=['nivel', 'grupo'])
+
+
+def vetor_limites(grupos, limites, padrao):
+    """Vetor alinhado a ``grupos`` a partir de ``{nivel: {grupo: limite}}``.
+
+    ``limites`` também pode ser uma Series indexada por (nivel, grupo); grupos
+    sem limite recebem ``padrao``.
+    """
+    vetor = pd.Series(padrao, index=grupos, dtype='float64')
+    if limites is None:
+        return vetor.to_numpy()
+    if not isinstance(limites, pd.Series):
+        limites = pd.Series({(nivel, g): v for nivel, mapa in limites.items() for g, v in mapa.items()},
+                            dtype='float64')
+    desconhecidos = limites.index.difference(grupos)
+    if len(desconhecidos):
+        raise KeyError(f'grupos sem nenhum ativo: {list(desconhecidos)}')
+    vetor.loc[limites.index] = limites.to_numpy()
+    return vetor.to_numpy()
+
+
+class RestricoesGrupos:
+    """Faixas de peso por grupo para os ativos ``tickers``, como uma única restrição cvxpy.
+
+    ``inferior`` e ``superior`` seguem o formato de ``classificacoes``:
+    ``{nivel: {grupo: limite}}``; grupos sem limite ficam livres.
+
+    Ex.: no lugar de In[132]::
+
+        grupos = RestricoesGrupos({'setor': sector_mapper}, ef.tickers,
+                                  {'setor': sector_lower}, {'setor': sector_upper})
+        grupos.aplicar(ef)
+    """
+
+    def __init__(self, classificacoes, tickers, inferior=None, superior=None):
+        self.tickers = list(tickers)
+        self.matriz, self.grupos = matriz_grupos(classificacoes, self.tickers)
+        self.inferior = vetor_limites(self.grupos, inferior, -np.inf)
+        self.superior = vetor_limites(self.grupos, superior, np.inf)
+        if (self.inferior > self.superior).any():
+            raise ValueError('limite inferior maior que o superior em algum grupo')
+        self._montar()
+
+    def _montar(self):
+        from scipy import sparse
+
+        # Só as faixas finitas entram: -Aᵀ w <= -inferior e Aᵀ w <= superior, empilhadas
+        with etapa('restricoes.grupos', grupos=len(self.grupos)):
+            transposta = self.matriz.T.tocsr()
+            com_inferior = np.isfinite(self.inferior)
+            com_superior = np.isfinite(self.superior)
+            self.coeficientes = sparse.vstack([-transposta[com_inferior], transposta[com_superior]],
+                                              format='csr')
+            self.lado_direito = np.concatenate([-self.inferior[com_inferior],
+                                                self.superior[com_superior]])
+
+    def restricao(self, w):
+        """Restrição ``M @ w <= b`` sobre a variável de pesos ``w`` (ou ``None`` sem faixas)."""
+        if not len(self.lado_direito):
+            return None
+        return self.coeficientes @ w <= self.lado_direito
+
+    def aplicar(self, ef):
+        """Adiciona a restrição a um ``EfficientFrontier`` com os mesmos tickers."""
+        if list(ef.tickers) != self.tickers:
+            raise ValueError('os tickers do EfficientFrontier diferem dos das restrições')
+        if len(self.lado_direito):
+            ef.add_constraint(self.restricao)
+        return ef
+
+    def exposicoes(self, pesos):
+        """Peso total de cada grupo para um vetor de pesos (Series indexada por (nivel, grupo))."""
+        pesos = np.asarray(pesos.reindex(self.tickers).fillna(0) if isinstance(pesos, pd.Series)
+                           else pesos, dtype='float64')
+        return pd.Series(self.matriz.T @ pesos, index=self.grupos, name='peso')
@@ -0,0 +1,370 @@
+"""Serviço HTTP local (asyncio) com as análises do notebook.
+
+Endpoints (GET com query string ou POST com corpo JSON), todos com
+``tickers``, ``inicio`` e ``fim`` e, opcionalmente, ``mercado`` (padrão ^BVSP):
+
+- ``/var``: VaR e ES por ativo; ``metodo`` = ``historico``, ``parametrico``
+  (com ``distribuicao`` = ``normal``, ``cornish_fisher`` ou ``t``) ou
+  ``monte_carlo`` (com ``caminhos``, ``horizonte`` e ``seed``), ``niveis``;
+- ``/beta``: regressão CAPM contra o mercado;
+- ``/drawdown``: drawdown máximo, datas e durações;
+- ``/otimizar``: objetivo do ``EfficientFrontier`` (``objetivo``,
+  ``taxa_livre``, ``alvo``) com CAPM e Ledoit-Wolf;
+- ``/saude``: contadores do cache e das requisições agrupadas.
+
+Requisições simultâneas iguais (mesmo endpoint e parâmetros) esperam uma
+única computação, e os preços de um mesmo universo e período são carregados
+uma vez para todos os endpoints. Os resultados ficam num cache com validade
+(TTL), e as etapas pesadas (otimização e Monte Carlo) vão para um pool de
+processos, sem bloquear o laço de eventos. Ex.::
+
+    portfolio-risk serve --porta 8000 --fonte cache dados/precos
+    curl 'localhost:8000/var?tickers=ITUB3.SA,BBDC3.SA&inicio=2017-01-01&fim=2024-01-01&metodo=historico'
+"""
+
+import asyncio
+import json
+import multiprocessing
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from .instrumentacao import etapa
+
+ENDPOINTS = ('var', 'beta', 'drawdown', 'otimizar')
+METODOS_VAR = ('historico', 'parametrico', 'monte_carlo')
+# Vão para o pool de processos; os demais rodam em uma thread
+_PESADOS = {('var', 'monte_carlo'), ('otimizar', None)}
+_AUSENTE = object()
+# Limites por requisição: o corpo JSON e o tamanho da simulação de Monte Carlo
+TAMANHO_MAXIMO_CORPO = 1 << 20
+MAX_CAMINHOS = 10_000_000
+MAX_HORIZONTE = 2520
+# Normais sorteadas por requisição (caminhos x dias x ativos): o custo real da simulação
+MAX_SORTEIOS = 1_000_000_000
+_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class CacheTTL:
+    """Cache LRU em que cada valor expira ``ttl`` segundos depois de guardado."""
+
+    def __init__(self, ttl=300.0, tamanho_maximo=1024):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._valores = OrderedDict()
+
+    def obter(self, chave):
+        item = self._valores.get(chave)
+        if item is None:
+            return _AUSENTE
+        validade, valor = item
+        if validade < time.monotonic():
+            del self._valores[chave]
+            return _AUSENTE
+        self._valores.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._valores[chave] = (time.monotonic() + self.ttl, valor)
+        self._valores.move_to_end(chave)
+        while len(self._valores) > self.tamanho_maximo:
+            self._valores.popitem(last=False)
+
+    def expurgar(self):
+        """Remove os itens vencidos."""
+        agora = time.monotonic()
+        for chave in [c for c, (validade, _) in self._valores.items() if validade < agora]:
+            del self._valores[chave]
+
+    def __len__(self):
+        return len(self._valores)
+
+
+def _lista(valor, tipo=str):
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = [v for v in valor.split(',') if v]
+    return tuple(tipo(v) for v in valor)
+
+
+def _inteiro(brutos, chave, padrao, maximo):
+    valor = int(brutos.get(chave, padrao))
+    if not 1 <= valor <= maximo:
+        raise ValueError(f'{chave} deve estar entre 1 e {maximo}, recebido {valor}')
+    return valor
+
+
+def _parametros(endpoint, brutos, max_caminhos=MAX_CAMINHOS, max_sorteios=MAX_SORTEIOS):
+    """Valida e normaliza os parâmetros; o resultado (ordenado) é a chave da requisição."""
+    from .parametrico import DISTRIBUICOES
+    from .relatorio import OBJETIVOS
+    from .var import NIVEIS
+
+    tickers = _lista(brutos.get('tickers'))
+    if not tickers:
+        raise ValueError('informe tickers')
+    for chave in ('inicio', 'fim'):
+        if not brutos.get(chave):
+            raise ValueError(f'informe {chave}')
+    p = {'tickers': tuple(sorted(set(tickers))), 'inicio': str(brutos['inicio']),
+         'fim': str(brutos['fim']), 'mercado': brutos.get('mercado', '^BVSP') or None}
+    if endpoint == 'var':
+        p['metodo'] = brutos.get('metodo', 'historico')
+        if p['metodo'] not in METODOS_VAR:
+            raise ValueError(f'metodo deve ser um de {METODOS_VAR}')
+        p['niveis'] = _lista(brutos.get('niveis'), float) or NIVEIS
+        if p['metodo'] == 'parametrico':
+            p['distribuicao'] = brutos.get('distribuicao', 'normal')
+            if p['distribuicao'] not in DISTRIBUICOES:
+                raise ValueError(f'distribuicao deve ser uma de {DISTRIBUICOES}')
+        if p['metodo'] == 'monte_carlo':
+            # Sem teto, cada valor distinto de caminhos seria uma simulação nova e sem limite
+            p['caminhos'] = _inteiro(brutos, 'caminhos', 100_000, max_caminhos)
+            p['horizonte'] = _inteiro(brutos, 'horizonte', 1, MAX_HORIZONTE)
+            sorteios = p['caminhos'] * p['horizonte'] * len(p['tickers'])
+            if sorteios > max_sorteios:
+                raise ValueError(f'caminhos x horizonte x tickers = {sorteios} passa do limite '
+                                 f'de {max_sorteios} sorteios por requisição')
+            p['seed'] = int(brutos.get('seed', 0))
+    elif endpoint == 'otimizar':
+        p['objetivo'] = brutos.get('objetivo', 'max_sharpe')
+        if p['objetivo'] not in OBJETIVOS:
+            raise ValueError(f'objetivo deve ser um de {OBJETIVOS}')
+        p['taxa_livre'] = float(brutos.get('taxa_livre', 0.0))
+        p['alvo'] = None if brutos.get('alvo') is None else float(brutos['alvo'])
+    return tuple(sorted(p.items()))
+
+
+def _ignorar_interrupcao():
+    # Ctrl+C é tratado pelo processo principal, que encerra o pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _tabela(df):
+    return json.loads(df.to_json(orient='index', date_format='iso'))
+
+
+def calcular(endpoint, precos, mercado, parametros):
+    """Executa um endpoint sobre preços já carregados; roda no pool ou em uma thread."""
+    from .dados import calcular_retornos
+
+    p = dict(parametros)
+    if endpoint == 'drawdown':
+        from .drawdown import estatisticas_drawdown
+
+        return _tabela(estatisticas_drawdown(precos))
+    if endpoint == 'beta':
+        from .capm import regressao_capm
+
+        if mercado is None:
+            raise ValueError('beta requer mercado')
+        return _tabela(regressao_capm(calcular_retornos(precos),
+                                      calcular_retornos(mercado.to_frame()).iloc[:, 0]))
+    if endpoint == 'otimizar':
+        from .relatorio import otimizar
+
+        return otimizar(precos, p['objetivo'], mercado, p['taxa_livre'], p['alvo'])
+
+    retornos = calcular_retornos(precos)
+    if p['metodo'] != 'monte_carlo':
+        if p['metodo'] == 'historico':
+            from .var import var_es_matriz
+
+            tabela = var_es_matriz(retornos, p['niveis'])
+        else:
+            from .parametrico import var_es_parametrico
+
+            tabela = var_es_parametrico(retornos, p['niveis'], p['distribuicao'])
+        return {ativo: _tabela(tabela.loc[ativo].unstack('medida')[['VaR', 'ES']])
+                for ativo in tabela.index}
+
+    from .montecarlo import var_monte_carlo
+
+    resultado = {}
+    for ticker in retornos.columns:
+        r = retornos[ticker].dropna().to_numpy()
+        tabela = var_monte_carlo(r.mean(), r.std(), p['horizonte'], p['caminhos'],
+                                 p['niveis'], seed=p['seed'])
+        resultado[ticker] = {str(nivel): linha for nivel, linha in _tabela(tabela).items()}
+    return resultado
+
+
+class ServicoRisco:
+    """Núcleo do serviço: coalescência, cache com TTL e despacho para o pool.
+
+    ``fonte`` é repassada a ``carregar_precos``; ``n_processos=0`` executa
+    tudo em threads (sem pool de processos). ``max_caminhos`` limita os
+    caminhos de uma requisição de Monte Carlo e ``max_sorteios`` o total de
+    normais sorteadas por ela (caminhos x horizonte x tickers).
+    """
+
+    def __init__(self, fonte=None, ttl=300.0, n_processos=None, tamanho_cache=1024,
+                 max_caminhos=MAX_CAMINHOS, max_sorteios=MAX_SORTEIOS):
+        self.fonte = fonte
+        self.max_caminhos = max_caminhos
+        self.max_sorteios = max_sorteios
+        self.cache = CacheTTL(ttl, tamanho_cache)
+        self.n_processos = n_processos
+        self._pool = None
+        self._em_andamento = {}
+        self.estatisticas = {'requisicoes': 0, 'acertos_cache': 0, 'agrupadas': 0, 'computadas': 0}
+
+    def _executor(self):
+        if self._pool is None and self.n_processos != 0:
+            # 'spawn': o laço já tem threads (to_thread), e um fork herdaria travas presas
+            self._pool = ProcessPoolExecutor(max_workers=self.n_processos,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_ignorar_interrupcao)
+        return self._pool
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _uma_vez(self, chave, fabrica):
+        # Cache, depois requisição idêntica em andamento, e só então uma nova computação
+        valor = self.cache.obter(chave)
+        if valor is not _AUSENTE:
+            self.estatisticas['acertos_cache'] += 1
+            return valor
+        futuro = self._em_andamento.get(chave)
+        if futuro is not None:
+            self.estatisticas['agrupadas'] += 1
+            return await asyncio.shield(futuro)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_andamento[chave] = futuro
+        try:
+            valor = await fabrica()
+        except BaseException as erro:
+            futuro.set_exception(erro)
+            # Marca a exceção como lida caso ninguém mais esteja esperando
+            futuro.exception()
+            raise
+        finally:
+            del self._em_andamento[chave]
+        futuro.set_result(valor)
+        self.cache.guardar(chave, valor)
+        return valor
+
+    async def _precos(self, tickers, mercado, inicio, fim):
+        from .dados import carregar_precos
+
+        async def carregar():
+            todos = list(tickers) + ([mercado] if mercado else [])
+            with etapa('servico.precos', ativos=len(todos)):
+                return await asyncio.to_thread(carregar_precos, todos, inicio, fim, self.fonte)
+
+        precos = await self._uma_vez(('precos', tickers, mercado, inicio, fim), carregar)
+        faltando = [t for t in tickers if t not in precos or precos[t].isna().all()]
+        if faltando:
+            raise ValueError(f'sem preços para {", ".join(faltando)}')
+        serie_mercado = None
+        if mercado and not precos[mercado].isna().all():
+            serie_mercado = precos[mercado]
+        return precos[list(tickers)].dropna(how='all'), serie_mercado
+
+    async def consultar(self, endpoint, brutos):
+        """Resultado (JSON serializável) de ``endpoint`` para os parâmetros ``brutos``."""
+        if endpoint not in ENDPOINTS:
+            raise KeyError(endpoint)
+        self.estatisticas['requisicoes'] += 1
+        parametros = _parametros(endpoint, brutos, self.max_caminhos, self.max_sorteios)
+        p = dict(parametros)
+
+        async def computar():
+            precos, mercado = await self._precos(p['tickers'], p['mercado'], p['inicio'], p['fim'])
+            self.estatisticas['computadas'] += 1
+            executor = None
+            if (endpoint, p.get('metodo')) in _PESADOS:
+                executor = self._executor()
+            loop = asyncio.get_running_loop()
+            with etapa('servico.' + endpoint):
+                if executor is None:
+                    return await asyncio.to_thread(calcular, endpoint, precos, mercado, parametros)
+                return await loop.run_in_executor(executor, calcular, endpoint, precos, mercado,
+                                                  parametros)
+
+        return await self._uma_vez((endpoint, parametros), computar)
+
+    def saude(self):
+        self.cache.expurgar()
+        return {**self.estatisticas, 'itens_cache': len(self.cache),
+                'em_andamento': len(self._em_andamento)}
+
+    async def atender(self, leitor, escritor):
+        """Trata uma conexão HTTP/1.1 (uma requisição por conexão)."""
+        try:
+            status, corpo = await self._responder(leitor)
+        except Exception as erro:  # noqa: BLE001 - qualquer falha vira 500 para o cliente
+            status, corpo = 500, {'erro': f'{type(erro).__name__}: {erro}'}
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode()
+        cabecalho = (f'HTTP/1.1 {status} {_STATUS[status]}\r\n'
+                     'Content-Type: application/json; charset=utf-8\r\n'
+                     f'Content-Length: {len(dados)}\r\nConnection: close\r\n\r\n')
+        escritor.write(cabecalho.encode() + dados)
+        try:
+            await escritor.drain()
+        finally:
+            escritor.close()
+
+    async def _responder(self, leitor):
+        try:
+            cabecalho = await leitor.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return 400, {'erro': 'requisição HTTP inválida'}
+        linhas = cabecalho.decode('latin-1').split('\r\n')
+        try:
+            metodo, alvo, _ = linhas[0].split(' ', 2)
+        except ValueError:
+            return 400, {'erro': 'requisição HTTP inválida'}
+        campos = dict(linha.split(':', 1) for linha in linhas[1:] if ':' in linha)
+        campos = {k.strip().lower(): v.strip() for k, v in campos.items()}
+
+        url = urlsplit(alvo)
+        brutos = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if metodo == 'POST':
+            try:
+                tamanho = int(campos['content-length'])
+            except (KeyError, ValueError):
+                return 400, {'erro': 'POST requer Content-Length inteiro'}
+            if not 0 <= tamanho <= TAMANHO_MAXIMO_CORPO:
+                return 400, {'erro': f'Content-Length deve estar entre 0 e {TAMANHO_MAXIMO_CORPO}'}
+            if tamanho:
+                try:
+                    corpo = json.loads(await leitor.readexactly(tamanho))
+                except asyncio.IncompleteReadError:
+                    return 400, {'erro': 'corpo menor que o Content-Length'}
+                except ValueError:
+                    return 400, {'erro': 'corpo JSON inválido'}
+                if not isinstance(corpo, dict):
+                    return 400, {'erro': 'o corpo JSON deve ser um objeto'}
+                brutos.update(corpo)
+        elif metodo != 'GET':
+            return 405, {'erro': f'método {metodo} não suportado'}
+
+        endpoint = url.path.strip('/')
+        if endpoint == 'saude':
+            return 200, self.saude()
+        if endpoint not in ENDPOINTS:
+            return 404, {'erro': f'endpoint desconhecido: /{endpoint}', 'endpoints': list(ENDPOINTS)}
+        try:
+            return 200, await self.consultar(endpoint, brutos)
+        except (ValueError, KeyError, TypeError) as erro:
+            return 400, {'erro': str(erro)}
+
+
+async def servir(host='127.0.0.1', porta=8000, **opcoes):
+    """Sobe o serviço e atende até ser cancelado; ``opcoes`` vão para ``ServicoRisco``."""
+    servico = ServicoRisco(**opcoes)
+    servidor = await asyncio.start_server(servico.atender, host, porta)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servico.fechar()
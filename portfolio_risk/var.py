@@ -0,0 +1,139 @@
+"""Value at Risk e Expected Shortfall.
+
+Segue a convenção do notebook: o VaR é o percentil da distribuição de retornos
+(um número negativo, ex.: -0.0286 = perda de 2,86%) e o ES é a média dos
+retornos iguais ou piores que o VaR.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrumentacao import medido
+
+# Intervalos de confiança usados no notebook (90%, 95% e 99%)
+NIVEIS = (0.90, 0.95, 0.99)
+
+
+@medido('risco.var_es')
+def var_es(amostras, niveis=NIVEIS, sobrescrever=False):
+    """VaR e ES de uma amostra de retornos para vários níveis de confiança.
+
+    Usa uma única ``np.partition`` para todos os níveis em vez de um
+    ``np.percentile`` por nível. O VaR interpola como ``np.percentile``.
+    Com ``sobrescrever=True`` a própria ``amostras`` é reordenada, sem cópia.
+    """
+    x = np.asarray(amostras, dtype='float64').ravel()
+    if not sobrescrever:
+        x = x.copy()
+    x = x[~np.isnan(x)] if np.isnan(x).any() else x
+    n = len(x)
+    if n == 0:
+        raise ValueError('amostra de retornos vazia')
+
+    niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+    posicoes = (1 - niveis) * (n - 1)
+    baixo = np.floor(posicoes).astype(int)
+    alto = np.minimum(baixo + 1, n - 1)
+    x.partition(np.unique(np.concatenate([baixo, alto])))
+
+    var = x[baixo] + (posicoes - baixo) * (x[alto] - x[baixo])
+    es = np.empty_like(var)
+    for i, (v, a) in enumerate(zip(var, alto)):
+        cauda = x[:a + 1]
+        es[i] = cauda[cauda <= v].mean()
+    return pd.DataFrame({'VaR': var, 'ES': es}, index=pd.Index(niveis, name='nivel'))
+
+
+def retornos_carteiras(retornos, pesos):
+    """Retornos diários de uma ou várias carteiras a partir da matriz (datas x ativos).
+
+    ``pesos`` é um vetor (uma carteira) ou uma matriz (ativos x carteiras); em
+    DataFrame/Series, é alinhado às colunas de ``retornos`` e os ativos ausentes
+    têm peso zero. A data fica ausente (NaN) numa carteira se algum ativo com
+    peso nela não tem retorno naquele dia.
+    """
+    colunas = getattr(retornos, 'columns', None)
+    R = np.asarray(retornos, dtype='float64')
+    if isinstance(pesos, (pd.Series, pd.DataFrame)) and colunas is not None:
+        pesos = pesos.reindex(colunas).fillna(0)
+    W = np.asarray(pesos, dtype='float64')
+    vetor = W.ndim == 1
+    W = W[:, None] if vetor else W
+    if W.shape[0] != R.shape[1]:
+        raise ValueError(f'esperado um peso por ativo ({R.shape[1]}), recebido {W.shape[0]}')
+    # Só os ativos com algum peso entram nos produtos
+    usados = (W != 0).any(axis=1)
+    R, W = R[:, usados], W[usados]
+    ausentes = np.isnan(R)
+    Rp = np.nan_to_num(R) @ W
+    if ausentes.any():
+        Rp[(ausentes.astype('float64') @ (W != 0)) > 0] = np.nan
+    return Rp[:, 0] if vetor else Rp
+
+
+def _var_es_colunas(x, n, niveis):
+    # x: cópia (colunas x datas), cada coluna contígua, com n valores válidos (NaN
+    # trocado por +inf). Uma partição por coluna separa a cauda até o nível mais
+    # extremo, e só essa cauda é ordenada; o ES segue var_es (média dos <= VaR)
+    posicoes = (1 - niveis) * (n - 1)
+    baixo = np.floor(posicoes).astype(np.intp)
+    alto = np.minimum(baixo + 1, n - 1)
+    m = alto.max() + 1
+    if m < x.shape[1]:
+        x.partition(m - 1, axis=1)
+    cauda = np.sort(x[:, :m], axis=1)
+    x_baixo = cauda[:, baixo].astype('float64')
+    x_alto = cauda[:, alto].astype('float64')
+    var = x_baixo + (posicoes - baixo) * (x_alto - x_baixo)
+    acumulado = np.cumsum(cauda, axis=1, dtype='float64')
+    contagem = baixo + 1 + ((x_alto <= var) & (alto > baixo))
+    es = np.take_along_axis(acumulado, contagem - 1, axis=1) / contagem
+    return var.T, es.T
+
+
+@medido('risco.var_es_matriz')
+def var_es_matriz(retornos, niveis=NIVEIS, pesos=None):
+    """VaR e ES históricos de todas as colunas de uma matriz (datas x ativos) e níveis.
+
+    Mesmas definições de ``var_es`` (VaR interpolado como ``np.percentile``),
+    com uma única ``np.partition`` por coluna para todos os níveis, em vez de
+    um ``np.percentile`` por nível e ativo (In[60]). NaN é ignorado coluna a
+    coluna; as colunas com o mesmo número de observações são particionadas
+    juntas. Com ``pesos`` (ver ``retornos_carteiras``) o cálculo é feito sobre
+    os retornos das carteiras. Matrizes float32 são particionadas em float32.
+
+    Devolve um DataFrame com uma linha por ativo (ou carteira) e colunas
+    ``(medida, nivel)``, ex.: ``var_es_matriz(retornos)['VaR'][0.95]``.
+    """
+    nomes = getattr(retornos, 'columns', None)
+    if pesos is not None:
+        if isinstance(pesos, pd.DataFrame):
+            nomes = pesos.columns
+        elif isinstance(pesos, pd.Series):
+            nomes = [pesos.name if pesos.name is not None else 0]
+        else:
+            nomes = None
+        retornos = retornos_carteiras(retornos, pesos)
+    R = np.asarray(retornos)
+    if R.dtype.kind != 'f':
+        R = R.astype('float64')
+    if R.ndim == 1:
+        R = R[:, None]
+    niveis = np.atleast_1d(np.asarray(niveis, dtype='float64'))
+
+    n = R.shape[0] - np.isnan(R).sum(axis=0)
+    var = np.full((len(niveis), R.shape[1]), np.nan)
+    es = np.full_like(var, np.nan)
+    for tamanho in np.unique(n[n > 0]):
+        colunas = np.flatnonzero(n == tamanho)
+        # Cópia com cada coluna contígua (uma linha por ativo) para a partição
+        bloco = R.T[colunas]
+        if tamanho < R.shape[0]:
+            bloco[np.isnan(bloco)] = np.inf
+        var[:, colunas], es[:, colunas] = _var_es_colunas(bloco, tamanho, niveis)
+
+    indice = pd.Index(range(R.shape[1]) if nomes is None else nomes, name='ativo')
+    resultado = pd.DataFrame(np.hstack([var.T, es.T]), index=indice,
+                             columns=pd.MultiIndex.from_product([['VaR', 'ES'], niveis],
+                                                                names=['medida', 'nivel']))
+    return resultado
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.busca import (ErroTransitorio, FonteConcorrente, LimiteTaxa, ProvedorArquivos,
+                                  ProvedorSincrono)
+
+TICKERS = ['A', 'B', 'C', 'D']
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    datas = pd.bdate_range('2020-01-01', '2020-03-31', name='Date')
+    for i, ticker in enumerate(TICKERS):
+        pd.DataFrame({'Adj Close': 10.0 + i + np.arange(len(datas))},
+                     index=datas).to_csv(tmp_path / f'{ticker}.csv')
+    return tmp_path
+
+
+def _fonte(provedor, **opcoes):
+    return FonteConcorrente(provedor, espera_inicial=0.001, seed=0, **opcoes)
+
+
+def test_novas_tentativas(diretorio):
+    provedor = ProvedorArquivos(diretorio, falhas={'A': 2, 'C': 10})
+    fonte = _fonte(provedor, tentativas=3)
+    falhas = {}
+    series = fonte.series(TICKERS, '2020-01-01', '2020-02-01', falhas=falhas)
+    assert sorted(series) == ['A', 'B', 'D']
+    assert provedor.chamadas == {'A': 3, 'B': 1, 'C': 3, 'D': 1}
+    assert list(falhas) == ['C'] and isinstance(falhas['C'], ErroTransitorio)
+    assert series['A'].index.max() < pd.Timestamp('2020-02-01')
+
+
+def test_erro_nao_transitorio_nao_repete():
+    chamadas = []
+
+    def baixar(ticker, inicio, fim):
+        chamadas.append(ticker)
+        raise KeyError(ticker)
+
+    fonte = _fonte(ProvedorSincrono(baixar), tentativas=4)
+    falhas = {}
+    assert fonte.series(['A'], '2020-01-01', '2020-02-01', falhas=falhas) == {}
+    assert chamadas == ['A']
+    assert isinstance(falhas['A'], KeyError)
+
+
+def test_resposta_vazia_e_transitoria(diretorio):
+    respostas = [pd.DataFrame(), None]
+    arquivos = ProvedorArquivos(diretorio)
+
+    def baixar(ticker, inicio, fim):
+        if respostas:
+            return respostas.pop()
+        return asyncio.run(arquivos.baixar(ticker, inicio, fim))
+
+    series = _fonte(ProvedorSincrono(baixar), tentativas=3).series(['B'], '2020-01-01', '2020-02-01')
+    assert not respostas and len(series['B']) > 0
+
+    vazio = ProvedorSincrono(lambda *_: pd.DataFrame(), vazio_falha=False)
+    assert asyncio.run(vazio.baixar('B', '2020-01-01', '2020-02-01')).empty
+
+
+def test_concorrencia_limitada(diretorio):
+    ativos, pico = 0, 0
+
+    class Provedor(ProvedorArquivos):
+        async def baixar(self, ticker, inicio, fim):
+            nonlocal ativos, pico
+            ativos += 1
+            pico = max(pico, ativos)
+            try:
+                return await super().baixar(ticker, inicio, fim)
+            finally:
+                ativos -= 1
+
+    fonte = _fonte(Provedor(diretorio, latencia=0.02), concorrencia=2)
+    assert len(fonte.series(TICKERS, '2020-01-01', '2020-02-01')) == 4
+    assert pico == 2
+
+
+def test_limite_de_taxa(diretorio):
+    fonte = _fonte(ProvedorArquivos(diretorio), taxa=20, capacidade=1)
+    inicio = time.perf_counter()
+    fonte.series(TICKERS, '2020-01-01', '2020-02-01')
+    # Uma ficha disponível de início e as outras três a 20 por segundo
+    assert time.perf_counter() - inicio >= 3 / 20 * 0.9
+
+
+def test_limite_de_taxa_entre_chamadas(diretorio):
+    fonte = _fonte(ProvedorArquivos(diretorio), taxa=20, capacidade=2)
+    inicio = time.perf_counter()
+    # Duas chamadas seguidas e duas simultâneas, cada uma em seu laço: o balde é um só
+    fonte.series(TICKERS[:2], '2020-01-01', '2020-02-01')
+    fonte.series(TICKERS[2:], '2020-01-01', '2020-02-01')
+    with ThreadPoolExecutor(2) as pool:
+        falhas = [{}, {}]
+        list(pool.map(lambda i: fonte.series(TICKERS, '2020-01-01', '2020-02-01',
+                                             falhas=falhas[i]), range(2)))
+    # 12 fichas com 2 de início: as outras 10 a 20 por segundo
+    assert time.perf_counter() - inicio >= 10 / 20 * 0.9
+    assert falhas == [{}, {}]
+
+
+def test_limite_taxa_valida():
+    with pytest.raises(ValueError):
+        LimiteTaxa(0)
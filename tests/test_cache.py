@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.cache import CachePrecos
+
+pytest.importorskip('pyarrow')
+
+DATAS = pd.bdate_range('2020-01-01', '2020-12-31')
+
+
+class Fonte:
+    """``baixar`` falso: registra as chamadas e devolve ``Close``/``Adj Close`` do período."""
+
+    def __init__(self, vazias=0):
+        self.fator = 1.0
+        self.provisorios = {}
+        self.vazias = vazias
+        self.chamadas = []
+
+    def __call__(self, ticker, inicio, fim):
+        self.chamadas.append((pd.Timestamp(inicio), pd.Timestamp(fim)))
+        if self.vazias:
+            self.vazias -= 1
+            return pd.DataFrame()
+        datas = DATAS[(DATAS >= pd.Timestamp(inicio)) & (DATAS < pd.Timestamp(fim))]
+        close = 10.0 + np.arange(len(DATAS))[DATAS.isin(datas)]
+        dados = pd.DataFrame({'Close': close, 'Adj Close': close * self.fator,
+                              'Volume': 1000.0 * len(self.chamadas)},
+                             index=pd.DatetimeIndex(datas, name='Date'))
+        # Barra do dia ainda aberta: o fechamento muda até o fim do pregão
+        for data, fator in self.provisorios.items():
+            if data in dados.index:
+                dados.loc[data, ['Close', 'Adj Close']] *= fator
+        return dados
+
+
+def test_baixa_so_o_que_falta(tmp_path):
+    fonte = Fonte()
+    cache = CachePrecos(tmp_path, baixar=fonte)
+    primeira = cache.precos('X', '2020-01-01', '2020-03-01')
+    assert len(fonte.chamadas) == 1
+    assert cache.precos('X', '2020-02-01', '2020-03-01').equals(primeira.loc['2020-02-01':])
+    assert len(fonte.chamadas) == 1
+
+    serie = cache.precos('X', '2020-01-01', '2020-06-01')
+    assert len(fonte.chamadas) == 2
+    # O pedaço novo é pedido a partir de alguns dias antes, para conferir o ajuste
+    assert fonte.chamadas[1][0] < pd.Timestamp('2020-03-01')
+    esperado = fonte('X', '2020-01-01', '2020-06-01')['Adj Close']
+    pd.testing.assert_series_equal(serie, esperado.rename('Adj Close'), check_freq=False)
+
+
+def test_resposta_vazia_nao_marca_cobertura(tmp_path):
+    fonte = Fonte(vazias=1)
+    cache = CachePrecos(tmp_path, baixar=fonte)
+    assert cache.precos('X', '2020-01-01', '2020-03-01').empty
+    assert cache.cobertura('X') == []
+
+    assert len(cache.precos('X', '2020-01-01', '2020-03-01')) > 0
+    assert len(fonte.chamadas) == 2
+    assert cache.cobertura('X') == [(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-01'))]
+
+
+def test_campo_ausente_nao_marca_cobertura(tmp_path):
+    cache = CachePrecos(tmp_path, baixar=Fonte())
+    assert cache.precos('X', '2020-01-01', '2020-03-01', campo='Dividends').empty
+    assert cache.cobertura('X', 'Dividends') == []
+    assert cache.cobertura('X', 'Close') != []
+
+
+def test_reajuste_baixa_todo_o_historico(tmp_path):
+    fonte = Fonte()
+    cache = CachePrecos(tmp_path, baixar=fonte)
+    cache.precos('X', '2020-01-01', '2020-03-01')
+
+    # Um provento muda o Adj Close de todo o histórico já gravado
+    fonte.fator = 0.5
+    serie = cache.precos('X', '2020-01-01', '2020-06-01')
+    assert fonte.chamadas[-1] == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-06-01'))
+    esperado = fonte('X', '2020-01-01', '2020-06-01')['Adj Close']
+    pd.testing.assert_series_equal(serie, esperado.rename('Adj Close'), check_freq=False)
+    assert cache.cobertura('X') == [(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-06-01'))]
+
+
+def test_chamadas_simultaneas_do_mesmo_ticker(tmp_path):
+    fonte = Fonte()
+
+    def lento(ticker, inicio, fim):
+        time.sleep(0.05)
+        return fonte(ticker, inicio, fim)
+
+    caches = [CachePrecos(tmp_path, baixar=lento) for _ in range(2)]
+    with ThreadPoolExecutor(8) as pool:
+        series = list(pool.map(lambda i: caches[i % 2].precos('X', '2020-01-01', '2020-03-01'),
+                               range(8)))
+    assert all(s.equals(series[0]) for s in series) and len(series[0]) > 0
+    assert len(fonte.chamadas) == 1
+    assert not list(tmp_path.glob('**/*.tmp'))
+
+
+def test_barra_do_dia_e_volume_nao_recarregam(tmp_path, monkeypatch):
+    import portfolio_risk.cache as modulo
+
+    fonte = Fonte()
+    cache = CachePrecos(tmp_path, baixar=fonte)
+    monkeypatch.setattr(modulo, '_hoje', lambda: pd.Timestamp('2020-03-02'))
+    fonte.provisorios = {pd.Timestamp('2020-03-02'): 1.01}
+    cache.precos('X', '2020-01-01', '2020-03-03')
+    assert cache.cobertura('X') == [(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-02'))]
+
+    # No dia seguinte a barra de 02/03 já é definitiva e todo o volume mudou
+    monkeypatch.setattr(modulo, '_hoje', lambda: pd.Timestamp('2020-03-10'))
+    fonte.provisorios = {}
+    serie = cache.precos('X', '2020-01-01', '2020-03-11')
+    assert fonte.chamadas[1:] == [(pd.Timestamp('2020-02-24'), pd.Timestamp('2020-03-11'))]
+    esperado = fonte('X', '2020-01-01', '2020-03-11')['Adj Close']
+    pd.testing.assert_series_equal(serie, esperado.rename('Adj Close'), check_freq=False)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.capm import COLUNAS, regressao_capm
+
+
+def _ols(y, x, constante=True):
+    # Referência: mínimos quadrados e erros-padrão pela fórmula matricial
+    X = np.column_stack([np.ones_like(x), x]) if constante else x[:, None]
+    coef, residuo, *_ = np.linalg.lstsq(X, y, rcond=None)
+    s2 = residuo[0] / (len(y) - X.shape[1])
+    erros = np.sqrt(np.diag(s2 * np.linalg.inv(X.T @ X)))
+    return coef, erros
+
+
+@pytest.fixture
+def dados():
+    rng = np.random.default_rng(7)
+    datas = pd.bdate_range('2020-01-01', periods=500)
+    # Média do mercado bem diferente de zero: é onde o erro do alpha depende dela
+    mercado = pd.Series(0.01 + 0.02 * rng.standard_normal(500), index=datas)
+    betas = np.array([0.5, 1.0, 1.5])
+    retornos = pd.DataFrame(0.002 + mercado.to_numpy()[:, None] * betas
+                            + 0.01 * rng.standard_normal((500, 3)),
+                            index=datas, columns=['A', 'B', 'C'])
+    retornos.iloc[:40, 1] = np.nan
+    return retornos, mercado
+
+
+def test_regressao_igual_ao_ols(dados):
+    retornos, mercado = dados
+    tabela = regressao_capm(retornos, mercado)
+    assert list(tabela.columns) == COLUNAS
+    for ativo in retornos.columns:
+        validos = retornos[ativo].notna()
+        (alpha, beta), (erro_alpha, erro_beta) = _ols(retornos[ativo][validos].to_numpy(),
+                                                     mercado[validos].to_numpy())
+        linha = tabela.loc[ativo]
+        np.testing.assert_allclose([linha['alpha'], linha['beta'], linha['erro_alpha'], linha['erro_beta']],
+                                   [alpha, beta, erro_alpha, erro_beta], rtol=1e-9)
+        assert linha['n'] == validos.sum()
+
+
+def test_regressao_igual_ao_statsmodels(dados):
+    sm = pytest.importorskip('statsmodels.api')
+    retornos, mercado = dados
+    tabela = regressao_capm(retornos, mercado, taxa_livre=0.0005)
+    ajuste = sm.OLS(retornos['A'] - 0.0005, sm.add_constant(mercado - 0.0005)).fit()
+    np.testing.assert_allclose(tabela.loc['A', ['alpha', 'beta']], ajuste.params, rtol=1e-9)
+    np.testing.assert_allclose(tabela.loc['A', ['erro_alpha', 'erro_beta']], ajuste.bse, rtol=1e-9)
+    assert tabela.loc['A', 'r2'] == pytest.approx(ajuste.rsquared, rel=1e-9)
+
+
+def test_regressao_sem_constante(dados):
+    retornos, mercado = dados
+    tabela = regressao_capm(retornos, mercado, constante=False)
+    (beta,), (erro_beta,) = _ols(retornos['C'].to_numpy(), mercado.to_numpy(), constante=False)
+    assert tabela.loc['C', 'beta'] == pytest.approx(beta, rel=1e-9)
+    assert tabela.loc['C', 'erro_beta'] == pytest.approx(erro_beta, rel=1e-9)
+    assert np.isnan(tabela.loc['C', 'erro_alpha'])
+
+
+def test_regressao_movel(dados):
+    retornos, mercado = dados
+    movel = regressao_capm(retornos, mercado, janela=100)
+    data = retornos.index[250]
+    fatia = slice(151, 251)
+    (alpha, beta), (erro_alpha, erro_beta) = _ols(retornos['A'].to_numpy()[fatia],
+                                                 mercado.to_numpy()[fatia])
+    linha = movel.loc[(data, 'A')]
+    np.testing.assert_allclose([linha['alpha'], linha['beta'], linha['erro_alpha'], linha['erro_beta']],
+                               [alpha, beta, erro_alpha, erro_beta], rtol=1e-8)
+    # Janelas com dados faltando ficam NaN
+    assert movel.loc[(retornos.index[120], 'B')].isna().all()
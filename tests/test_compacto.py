@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.compacto import RetornosCompactos
+from portfolio_risk.drawdown import estatisticas_drawdown
+
+
+@pytest.fixture
+def precos():
+    rng = np.random.default_rng(2)
+    datas = pd.bdate_range('2020-01-01', periods=500)
+    return pd.DataFrame(10 * np.exp(np.cumsum(0.02 * rng.standard_normal((500, 3)), axis=0)),
+                        index=datas, columns=['A', 'B', 'C'])
+
+
+@pytest.mark.parametrize('log', [False, True])
+def test_max_drawdown_igual_ao_dos_precos(tmp_path, precos, log):
+    esperado = estatisticas_drawdown(precos)['max_drawdown'].to_numpy()
+    compactos = RetornosCompactos.de_precos(precos, log=log, dtype='float64', orcamento=1000)
+    np.testing.assert_allclose(compactos.metricas()['max_drawdown'], esperado, rtol=1e-9)
+
+    compactos.salvar(tmp_path / 'retornos')
+    lidos = RetornosCompactos.carregar(tmp_path / 'retornos')
+    assert lidos.log is log
+    np.testing.assert_allclose(lidos.metricas()['max_drawdown'], esperado, rtol=1e-9)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.covariancia import CovarianciaIncremental
+
+
+@pytest.fixture
+def precos():
+    rng = np.random.default_rng(11)
+    datas = pd.bdate_range('2020-01-01', periods=300)
+    return pd.DataFrame(10 * np.exp(np.cumsum(0.01 * rng.standard_normal((300, 3)), axis=0)),
+                        index=datas, columns=['A', 'B', 'C'])
+
+
+@pytest.mark.parametrize('nome', ['estado.npz', 'estado', 'estado.bin'])
+@pytest.mark.parametrize('janela', [None, 60])
+def test_salvar_e_carregar(tmp_path, precos, nome, janela):
+    estado = CovarianciaIncremental.de_precos(precos.iloc[:200], janela=janela)
+    caminho = tmp_path / nome
+    estado.salvar(caminho)
+    assert [p.name for p in tmp_path.iterdir()] == [nome]
+
+    restaurado = CovarianciaIncremental.carregar(caminho)
+    pd.testing.assert_frame_equal(restaurado.ledoit_wolf(), estado.ledoit_wolf())
+    # O estado restaurado continua a atualização de onde parou
+    for _, linha in precos.iloc[200:].iterrows():
+        restaurado.atualizar_precos(linha)
+    completo = CovarianciaIncremental.de_precos(precos, janela=janela)
+    pd.testing.assert_frame_equal(restaurado.amostral(), completo.amostral())
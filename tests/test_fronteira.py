@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.fronteira import varrer_fronteira
+
+pytest.importorskip('cvxpy')
+
+TICKERS = ['A', 'B', 'C']
+
+
+@pytest.fixture
+def estimativas():
+    mu = pd.Series([0.08, 0.12, 0.16], index=TICKERS)
+    vol = np.array([0.15, 0.2, 0.3])
+    correlacao = np.array([[1, 0.3, 0.2], [0.3, 1, 0.4], [0.2, 0.4, 1]])
+    return mu, pd.DataFrame(correlacao * np.outer(vol, vol), index=TICKERS, columns=TICKERS)
+
+
+@pytest.mark.parametrize('tipo', ['retorno', 'volatilidade'])
+def test_fronteira(estimativas, tipo):
+    mu, cov = estimativas
+    fronteira = varrer_fronteira(mu, cov, tipo=tipo, n_alvos=10)
+    assert not fronteira.isna().any().any()
+    np.testing.assert_allclose(fronteira[TICKERS].sum(axis=1), 1, atol=1e-4)
+    assert fronteira['retorno'].is_monotonic_increasing
+    assert fronteira['retorno'].iloc[-1] == pytest.approx(0.16, abs=1e-4)
+
+
+def test_alvo_inviavel_vira_nan(estimativas):
+    mu, cov = estimativas
+    fronteira = varrer_fronteira(mu, cov, alvos=[0.1, 0.5])
+    assert fronteira.iloc[0].notna().all() and fronteira.iloc[1].isna().all()
+
+
+def test_limites_inviaveis(estimativas):
+    mu, cov = estimativas
+    with pytest.raises(ValueError, match='limites'):
+        varrer_fronteira(mu, cov, limites=(0, 0.2))
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.dados import FonteArquivos
+from portfolio_risk.lote import ler_configuracao, relatorios_lote
+
+
+@pytest.fixture
+def fonte(tmp_path):
+    rng = np.random.default_rng(5)
+    datas = pd.bdate_range('2020-01-01', '2021-12-31', name='Date')
+    for ticker in ('A', 'B', 'C', 'M'):
+        precos = 10 * np.exp(np.cumsum(0.01 * rng.standard_normal(len(datas))))
+        pd.DataFrame({'Adj Close': precos}, index=datas).to_csv(tmp_path / f'{ticker}.csv')
+    # Listado no meio do período: só tem o último ano
+    tardio = pd.DataFrame({'Adj Close': np.linspace(10, 12, len(datas))}, index=datas)
+    tardio.loc[:'2020-12-31'] = np.nan
+    tardio.to_csv(tmp_path / 'TARDIO.csv')
+    return FonteArquivos(tmp_path)
+
+
+def _config(*carteiras):
+    return {'inicio': '2020-01-01', 'fim': '2022-01-01', 'mercado': 'M',
+            'carteiras': [{'nome': nome, 'pesos': pesos} for nome, pesos in carteiras]}
+
+
+def test_ticker_sem_precos_nao_contamina_o_lote(fonte):
+    completo, _ = relatorios_lote(_config(('ab', {'A': 0.5, 'B': 0.5}), ('c', {'C': 1.0})),
+                                  fonte=fonte)
+    resumo, pesos = relatorios_lote(_config(('ab', {'A': 0.5, 'B': 0.5}), ('c', {'C': 1.0}),
+                                            ('desconhecido', {'A': 0.5, 'XYZ': 0.5}),
+                                            ('tardio', {'B': 0.5, 'TARDIO': 0.5})), fonte=fonte)
+    assert list(resumo.index) == ['ab', 'c', 'desconhecido', 'tardio']
+    assert 'XYZ (0% dos dias)' in resumo.loc['desconhecido', 'erro']
+    assert 'TARDIO' in resumo.loc['tardio', 'erro']
+    assert resumo.loc[['desconhecido', 'tardio'], 'volatilidade_anual'].isna().all()
+    assert (pesos.loc[['desconhecido', 'tardio']] == 0).all().all()
+    # As demais carteiras usam o histórico inteiro, como se os outros tickers não existissem
+    assert resumo.loc[['ab', 'c'], 'erro'].isna().all()
+    pd.testing.assert_frame_equal(resumo.loc[['ab', 'c']].drop(columns='erro'),
+                                  completo.drop(columns='erro'), check_dtype=False)
+
+
+def test_cobertura_minima_configuravel(fonte):
+    config = _config(('tardio', {'B': 0.5, 'TARDIO': 0.5}))
+    config['cobertura_minima'] = 0.4
+    resumo, _ = relatorios_lote(config, fonte=fonte)
+    assert pd.isna(resumo.loc['tardio', 'erro'])
+    assert np.isfinite(resumo.loc['tardio', 'volatilidade_anual'])
+
+
+def test_nenhuma_carteira_com_precos(fonte):
+    with pytest.raises(ValueError, match='XYZ'):
+        relatorios_lote(_config(('x', {'XYZ': 1.0})), fonte=fonte)
+
+
+def test_otimizacao_inviavel_nao_interrompe_o_lote(fonte):
+    pytest.importorskip('pypfopt')
+    config = _config(('ab', {'A': 0.5, 'B': 0.5}))
+    config['carteiras'] += [
+        {'nome': 'minima', 'ativos': ['A', 'B', 'C'], 'objetivo': 'min_volatility'},
+        {'nome': 'limites', 'ativos': ['A', 'B'], 'objetivo': 'min_volatility', 'limites': [0, 0.2]},
+        {'nome': 'setores', 'ativos': ['A', 'B', 'C'], 'objetivo': 'max_sharpe',
+         'setores': {'A': 'x', 'B': 'y', 'C': 'y'}, 'setor_max': {'x': 0.4, 'y': 0.4}},
+    ]
+    resumo, pesos = relatorios_lote(config, fonte=fonte)
+    assert list(resumo.index) == ['ab', 'minima', 'limites', 'setores']
+    assert resumo.loc[['ab', 'minima'], 'erro'].isna().all()
+    assert np.isfinite(resumo.loc['minima', 'volatilidade_anual'])
+    for nome in ('limites', 'setores'):
+        assert resumo.loc[nome, 'erro'].startswith('otimização falhou')
+        assert np.isnan(resumo.loc[nome, 'volatilidade_anual'])
+        assert (pesos.loc[nome] == 0).all()
+
+
+@pytest.mark.parametrize('alvo', [None, 'alto'])
+def test_configuracao_exige_alvo(tmp_path, alvo):
+    carteira = {'nome': 'r', 'ativos': ['A', 'B'], 'objetivo': 'efficient_risk'}
+    if alvo is not None:
+        carteira['alvo'] = alvo
+    caminho = tmp_path / 'carteiras.json'
+    caminho.write_text(json.dumps({'inicio': '2020-01-01', 'fim': '2022-01-01',
+                                   'carteiras': [carteira]}))
+    with pytest.raises(ValueError, match='alvo'):
+        ler_configuracao(caminho)
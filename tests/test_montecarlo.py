@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.montecarlo import simular_retornos_carteira
+
+TICKERS = ['A', 'B']
+
+
+@pytest.fixture
+def estimativas():
+    cov = np.array([[1e-4, 2e-5], [2e-5, 4e-4]])
+    return pd.Series([5e-4, 1e-3], index=TICKERS), pd.DataFrame(cov, index=TICKERS, columns=TICKERS)
+
+
+def _simular(media, cov, pesos):
+    return simular_retornos_carteira(media, cov, pesos, n_caminhos=1000, seed=1, n_processos=1)
+
+
+def test_pesos_por_ticker_e_vetor(estimativas):
+    media, cov = estimativas
+    vetor = _simular(media, cov, [0.3, 0.7])
+    np.testing.assert_array_equal(_simular(media, cov, {'B': 0.7, 'A': 0.3}), vetor)
+    np.testing.assert_array_equal(_simular(media, cov, pd.Series({'B': 0.7, 'A': 0.3})), vetor)
+    np.testing.assert_array_equal(_simular(media.to_numpy(), cov.to_numpy(), [0.3, 0.7]), vetor)
+
+
+def test_pesos_por_ticker_sem_tickers_na_covariancia(estimativas):
+    media, cov = estimativas
+    with pytest.raises(ValueError, match='DataFrame'):
+        _simular(media.to_numpy(), cov.to_numpy(), {'A': 0.3, 'B': 0.7})
+
+
+def test_pesos_invalidos(estimativas):
+    media, cov = estimativas
+    with pytest.raises(ValueError, match='C'):
+        _simular(media, cov, {'A': 0.3, 'C': 0.7})
+    with pytest.raises(ValueError, match='um peso por ativo'):
+        _simular(media, cov, [0.2, 0.3, 0.5])
+
+
+def test_media_ausente_para_ticker(estimativas):
+    media, cov = estimativas
+    with pytest.raises(ValueError, match="'B'"):
+        _simular(media.drop('B'), cov, [0.3, 0.7])
+    with pytest.raises(ValueError, match="'A'"):
+        _simular(media.rename({'A': 'X'}), cov, [0.3, 0.7])
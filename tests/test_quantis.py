@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from portfolio_risk.quantis import HistogramaFluxo, TDigest
+from portfolio_risk.var import var_es
+
+
+@pytest.fixture(scope='module')
+def blocos():
+    # Caudas pesadas: t de Student com 4 graus de liberdade
+    rng = np.random.default_rng(0)
+    return [0.01 * rng.standard_t(4, 100_000) for _ in range(20)]
+
+
+def test_var_do_histograma_com_caudas_pesadas(blocos):
+    h = HistogramaFluxo()
+    for bloco in blocos:
+        h.adicionar(bloco)
+    exato = var_es(np.concatenate(blocos), [0.95, 0.99])
+    np.testing.assert_allclose(h.var_es([0.95, 0.99]).to_numpy(), exato.to_numpy(), rtol=0.01)
+    # Os extremos vão para as pontas: a largura fica na escala do corpo da distribuição
+    assert h.contagens.sum() == h.n == 2_000_000
+    assert h.largura <= 0.002
+    assert h.bordas[0] > h.minimo and h.bordas[-1] < h.maximo
+
+
+def test_mesclar_histogramas(blocos):
+    partes = [HistogramaFluxo().adicionar(b) for b in blocos[:4]]
+    unico = HistogramaFluxo()
+    for b in blocos[:4]:
+        unico.adicionar(b)
+    mesclado = partes[0].mesclar(*partes[1:])
+    assert mesclado.n == unico.n and mesclado.contagens.sum() == unico.n
+    np.testing.assert_allclose(mesclado.quantil([0.01, 0.05]), unico.quantil([0.01, 0.05]),
+                               rtol=0.01)
+
+
+def test_sem_digest_interpola_nos_baldes(blocos):
+    h = HistogramaFluxo(limite_desvios=None, compressao=None).adicionar(blocos[0])
+    assert h.digest is None
+    assert h.minimo <= h.quantil(0.05) <= h.maximo
+    assert h.bordas[0] <= h.minimo and h.bordas[-1] >= h.maximo
+
+
+def test_tdigest_igual_ao_exato(blocos):
+    digest = TDigest().adicionar(blocos[0]).mesclar(TDigest().adicionar(blocos[1]))
+    exato = var_es(np.concatenate(blocos[:2]), [0.95, 0.99])
+    np.testing.assert_allclose(digest.var_es([0.95, 0.99]).to_numpy(), exato.to_numpy(), rtol=0.01)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk.restricoes import aplicar_limites, limites_ativos
+
+TICKERS = ['A', 'B', 'C']
+
+
+def test_limites_ativos():
+    inferior, superior = limites_ativos(TICKERS, 0.05, {'C': 0.1})
+    np.testing.assert_array_equal(inferior, [0.05, 0.05, 0.05])
+    np.testing.assert_array_equal(superior, [1.0, 1.0, 0.1])
+    with pytest.raises(KeyError):
+        limites_ativos(TICKERS, superior={'X': 0.1})
+    with pytest.raises(ValueError):
+        limites_ativos(TICKERS, 0.5, {'A': 0.2})
+
+
+@pytest.mark.parametrize('objetivo', ['max_sharpe', 'min_volatility'])
+def test_aplicar_limites_intersecta_weight_bounds(objetivo):
+    pypfopt = pytest.importorskip('pypfopt')
+    mu = pd.Series([0.08, 0.12, 0.16], index=TICKERS)
+    vol = np.array([0.15, 0.2, 0.3])
+    correlacao = np.array([[1, 0.3, 0.2], [0.3, 1, 0.4], [0.2, 0.4, 1]])
+    cov = pd.DataFrame(correlacao * np.outer(vol, vol), index=TICKERS, columns=TICKERS)
+    ef = pypfopt.EfficientFrontier(mu, cov, weight_bounds=(0, 0.6))
+    limites = ef._lower_bounds.copy(), ef._upper_bounds.copy()
+    aplicar_limites(ef, inferior={'A': 0.45}, superior={'C': 0.1})
+    pesos = pd.Series(getattr(ef, objetivo)())
+    assert pesos['A'] >= 0.45 - 1e-6 and pesos['C'] <= 0.1 + 1e-6
+    assert (pesos <= 0.6 + 1e-6).all()
+    # O estado interno do EfficientFrontier não é alterado
+    np.testing.assert_array_equal(ef._lower_bounds, limites[0])
+    np.testing.assert_array_equal(ef._upper_bounds, limites[1])
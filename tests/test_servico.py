@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk import instrumentacao
+from portfolio_risk.dados import FonteArquivos
+from portfolio_risk.servico import ServicoRisco
+
+CONSULTA = 'tickers=A,B&inicio=2020-01-01&fim=2021-01-01&mercado=M'
+
+
+class Escritor:
+    """Substitui o ``StreamWriter``: guarda a resposta escrita."""
+
+    def __init__(self):
+        self.dados = b''
+
+    def write(self, dados):
+        self.dados += dados
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def servico(tmp_path):
+    rng = np.random.default_rng(3)
+    datas = pd.bdate_range('2020-01-01', '2020-12-31', name='Date')
+    for ticker in ('A', 'B', 'M'):
+        precos = 10 * np.exp(np.cumsum(0.01 * rng.standard_normal(len(datas))))
+        pd.DataFrame({'Adj Close': precos}, index=datas).to_csv(tmp_path / f'{ticker}.csv')
+    servico = ServicoRisco(FonteArquivos(tmp_path), n_processos=0, max_caminhos=1000,
+                           max_sorteios=20_000)
+    yield servico
+    servico.fechar()
+
+
+def _requisicao(servico, bruto):
+    async def enviar():
+        leitor = asyncio.StreamReader()
+        leitor.feed_data(bruto)
+        leitor.feed_eof()
+        escritor = Escritor()
+        await servico.atender(leitor, escritor)
+        return escritor.dados
+
+    resposta = asyncio.run(enviar())
+    cabecalho, corpo = resposta.split(b'\r\n\r\n', 1)
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+
+def _post(servico, corpo, cabecalhos=None):
+    if cabecalhos is None:
+        cabecalhos = f'Content-Length: {len(corpo)}\r\n'
+    return _requisicao(servico, b'POST /var HTTP/1.1\r\n' + cabecalhos.encode() + b'\r\n' + corpo)
+
+
+def test_get_e_post(servico):
+    status, corpo = _requisicao(servico, f'GET /var?{CONSULTA} HTTP/1.1\r\n\r\n'.encode())
+    assert status == 200 and set(corpo) == {'A', 'B'}
+    parametros = {'tickers': ['A', 'B'], 'inicio': '2020-01-01', 'fim': '2021-01-01',
+                  'mercado': 'M'}
+    assert _post(servico, json.dumps(parametros).encode()) == (200, corpo)
+    assert servico.estatisticas['acertos_cache'] == 1
+
+
+@pytest.mark.parametrize('cabecalhos', ['', 'Content-Length: abc\r\n', 'Content-Length: -5\r\n',
+                                        'Content-Length: 99999999999\r\n',
+                                        'Content-Length: 10\r\n'])
+def test_content_length_invalido(servico, cabecalhos):
+    status, corpo = _post(servico, b'{}', cabecalhos)
+    assert status == 400 and 'erro' in corpo
+
+
+@pytest.mark.parametrize('corpo', [b'[1, 2]', b'"texto"', b'3', b'{nao json'])
+def test_corpo_nao_objeto(servico, corpo):
+    status, resposta = _post(servico, corpo)
+    assert status == 400 and 'erro' in resposta
+
+
+def test_caminhos_limitados(servico):
+    status, corpo = _requisicao(
+        servico, f'GET /var?{CONSULTA}&metodo=monte_carlo&caminhos=1001 HTTP/1.1\r\n\r\n'.encode())
+    assert status == 400 and 'caminhos' in corpo['erro']
+    status, _ = _requisicao(
+        servico, f'GET /var?{CONSULTA}&metodo=monte_carlo&caminhos=1000 HTTP/1.1\r\n\r\n'.encode())
+    assert status == 200
+
+
+def test_sorteios_limitados(servico):
+    # 1000 caminhos x 10 dias x 2 tickers = 20 mil sorteios, no limite; 11 dias passam dele
+    consulta = f'GET /var?{CONSULTA}&metodo=monte_carlo&caminhos=1000&horizonte=%d HTTP/1.1\r\n\r\n'
+    assert _requisicao(servico, (consulta % 10).encode())[0] == 200
+    status, corpo = _requisicao(servico, (consulta % 11).encode())
+    assert status == 400 and 'sorteios' in corpo['erro']
+
+
+def test_erros_de_rota(servico):
+    assert _requisicao(servico, b'DELETE /var HTTP/1.1\r\n\r\n')[0] == 405
+    assert _requisicao(servico, b'GET /nada HTTP/1.1\r\n\r\n')[0] == 404
+    assert _requisicao(servico, b'GET /var?tickers=X HTTP/1.1\r\n\r\n')[0] == 400
+    assert _requisicao(servico, b'lixo')[0] == 400
+
+
+def test_requisicoes_iguais_agrupadas(servico):
+    async def varias():
+        brutos = dict(p.split('=') for p in CONSULTA.split('&'))
+        return await asyncio.gather(*[servico.consultar('drawdown', brutos) for _ in range(5)])
+
+    resultados = asyncio.run(varias())
+    assert all(r == resultados[0] for r in resultados)
+    assert servico.estatisticas['computadas'] == 1
+    assert servico.estatisticas['agrupadas'] == 4
+
+
+def test_perfil_com_requisicoes_simultaneas(servico):
+    instrumentacao.limpar()
+    instrumentacao.ativar()
+    try:
+        async def varias():
+            brutos = dict(p.split('=') for p in CONSULTA.split('&'))
+            await asyncio.gather(servico.consultar('drawdown', brutos),
+                                 servico.consultar('var', brutos),
+                                 servico.consultar('beta', brutos))
+        asyncio.run(varias())
+    finally:
+        instrumentacao.desativar()
+    pais = {r['etapa']: r['pai'] for r in instrumentacao.registros()}
+    instrumentacao.limpar()
+    # Cada etapa do serviço é raiz da sua tarefa, mesmo atravessando awaits simultâneos
+    assert pais['servico.precos'] is None
+    assert pais['servico.drawdown'] is None
+    assert pais['servico.var'] is None
+    assert pais['dados.carregar_precos'] == 'servico.precos'